@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+easytrader 热点路径的 microbenchmark
+
+运行全部 benchmark 并与基线比较::
+
+    python -m benchmarks --baseline benchmarks/baseline.json
+
+更新基线::
+
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+"""
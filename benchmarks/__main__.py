@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import argparse
+import sys
+
+from . import harness
+from . import bench_captcha, bench_follower, bench_parsing, bench_pretrade, bench_rpc  # noqa: F401 注册 benchmark
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("-k", dest="patterns", action="append", help="只运行名称匹配的 benchmark，支持通配符")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮最少耗时，单位为秒")
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--baseline", help="用于比较的基线 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.3, help="允许的变慢比例")
+    parser.add_argument("--stat", default="min", choices=["min", "median", "mean"], help="用于比较的统计值")
+    parser.add_argument("--save-baseline", help="将结果保存为基线")
+    args = parser.parse_args(argv)
+
+    results = harness.run(args.patterns, rounds=args.rounds, min_time=args.min_time)
+    if args.output:
+        harness.dump(results, args.output)
+    if args.save_baseline:
+        harness.dump(results, args.save_baseline)
+    if args.baseline:
+        regressions = harness.compare(
+            results, harness.load(args.baseline), args.threshold, args.stat
+        )
+        if regressions:
+            print("性能回退: {}".format(", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
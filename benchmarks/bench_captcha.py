@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from easytrader.utils import captcha
+from easytrader.utils.captcha import DigitRecognizer
+
+from .harness import benchmark
+
+
+def make_captcha(text, seed=0):
+    """浅色噪点背景上的深色数字"""
+    rnd = random.Random(seed)
+    font = ImageFont.load_default(size=14)
+    image = Image.new("RGB", (72, 24), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        draw.point(
+            (rnd.randrange(72), rnd.randrange(24)),
+            fill=tuple(rnd.randrange(210, 256) for _ in range(3)),
+        )
+    x = 4
+    for char in text:
+        color = tuple(rnd.randrange(40) for _ in range(3))
+        draw.text((x, 2 + rnd.randrange(3)), char, fill=color, font=font)
+        x += 15 + rnd.randrange(2)
+    return image
+
+
+def make_corpus(n, seed=0):
+    rnd = random.Random(seed)
+    texts = ["".join(rnd.choice("0123456789") for _ in range(4)) for _ in range(n)]
+    return [(make_captcha(text, seed + i), text) for i, text in enumerate(texts)]
+
+
+@benchmark("captcha.recognize", params=[100])
+def recognize(n):
+    # 不缓存，每张图片都完整识别
+    recognizer = DigitRecognizer(cache_size=0)
+    for image, text in make_corpus(10, seed=10000):
+        recognizer.train(image, text)
+    images = [image for image, _ in make_corpus(n)]
+
+    def run():
+        for image in images:
+            recognizer.recognize(image)
+
+    return run
+
+
+@benchmark("captcha.preprocess", params=["gf", "ths"])
+def preprocess(profile):
+    images = [image for image, _ in make_corpus(20)]
+
+    def run():
+        for image in images:
+            captcha.preprocess(image, profile)
+
+    return run
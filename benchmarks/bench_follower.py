@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import atexit
+import datetime
+import os
+import queue
+import random
+import tempfile
+
+from easytrader.follower import BaseFollower
+
+from .harness import benchmark
+
+COMMANDS = [1000, 10000]
+
+
+class _Follower(BaseFollower):
+    def __init__(self, cache_file):
+        super().__init__()
+        self.CMD_CACHE_FILE = cache_file
+
+
+class _User:
+    """只记录调用次数的交易对象"""
+
+    def __init__(self):
+        self.count = 0
+
+    def buy(self, security, price, amount, entrust_prop):
+        self.count += 1
+        return {"entrust_no": self.count}
+
+    sell = buy
+
+
+def make_commands(n, seed=0):
+    rnd = random.Random(seed)
+    now = datetime.datetime.now()
+    return [
+        {
+            "strategy": "ZH000001",
+            "strategy_name": "bench",
+            "action": rnd.choice(["buy", "sell"]),
+            "stock_code": "{:06d}".format(rnd.randrange(10 ** 6)),
+            "amount": rnd.randrange(1, 100) * 100,
+            "price": round(rnd.uniform(1, 100), 2),
+            "datetime": now + datetime.timedelta(seconds=i),
+        }
+        for i in range(n)
+    ]
+
+
+def _cache_file():
+    fd, path = tempfile.mkstemp(suffix=".pk")
+    os.close(fd)
+    atexit.register(os.remove, path)
+    return path
+
+
+@benchmark("follower.ingest", params=COMMANDS, rounds=1)
+def ingest(n):
+    """
+    与 track_strategy_worker 相同的去重入队流程，每条指令重复出现一次，
+    add_cmd_to_expired_cmds 每次都重写整个缓存文件，耗时随指令数平方增长，因此只计时一轮
+    """
+    commands = make_commands(n)
+    cache_file = _cache_file()
+
+    def run():
+        follower = _Follower(cache_file)
+        for cmd in commands:
+            for _ in range(2):
+                if follower.is_cmd_expired(cmd):
+                    continue
+                follower.trade_queue.put(cmd)
+                follower.add_cmd_to_expired_cmds(cmd)
+
+    return run
+
+
+@benchmark("follower.dispatch", params=COMMANDS)
+def dispatch(n):
+    commands = make_commands(n)
+    follower = _Follower(_cache_file())
+    users = [_User()]
+
+    def run():
+        trade_queue = queue.Queue()
+        for cmd in commands:
+            trade_queue.put(cmd)
+        while not trade_queue.empty():
+            follower._execute_trade_cmd(trade_queue.get(), users, 120, "limit", 0)
+
+    return run
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import random
+import tempfile
+import types
+
+from easytrader.config import client
+from easytrader.utils.stock import get_stock_type
+
+from .harness import benchmark
+
+try:
+    from easytrader import grid_strategies
+except ImportError:
+    # 非 Windows 环境使用模拟的 pywinauto
+    from easytrader import fake_client
+
+    fake_client.install()
+    from easytrader import grid_strategies
+
+GRID_ROWS = [10, 100, 1000, 10000]
+
+GRID_COLUMNS = [
+    "委托日期", "委托时间", "证券代码", "证券名称", "操作", "备注",
+    "委托数量", "成交数量", "委托价格", "成交均价", "合同编号", "股东代码",
+]
+
+
+def make_codes(n, seed=0):
+    rnd = random.Random(seed)
+    prefixes = ["000", "002", "300", "600", "601", "688", "510", "159", "110", "128"]
+    return ["{}{:03d}".format(rnd.choice(prefixes), rnd.randrange(1000)) for _ in range(n)]
+
+
+def make_grid(rows, seed=0):
+    """生成与客户端复制结果格式一致的 tab 分隔文本"""
+    rnd = random.Random(seed)
+    lines = ["\t".join(GRID_COLUMNS)]
+    for i, code in enumerate(make_codes(rows, seed)):
+        price = round(rnd.uniform(1, 100), 2)
+        amount = rnd.randrange(1, 100) * 100
+        lines.append(
+            "\t".join(
+                [
+                    "20261018",
+                    "09:{:02d}:{:02d}".format(i // 60 % 60, i % 60),
+                    code,
+                    "股票{}".format(code),
+                    rnd.choice(["买入", "卖出"]),
+                    rnd.choice(["已成", "未成交", "已撤"]),
+                    str(amount),
+                    str(rnd.choice([0, amount])),
+                    "{:.3f}".format(price),
+                    "{:.3f}".format(price),
+                    str(100000 + i),
+                    "A{:09d}".format(rnd.randrange(10 ** 9)),
+                ]
+            )
+        )
+    return "\n".join(lines)
+
+
+def _trader():
+    return types.SimpleNamespace(config=client.CommonConfig)
+
+
+@benchmark("grid.copy_format", params=GRID_ROWS)
+def copy_format(rows):
+    strategy = grid_strategies.Copy()
+    strategy.set_trader(_trader())
+    data = make_grid(rows)
+    return lambda: strategy._format_grid_data(data)
+
+
+@benchmark("grid.xls_format", params=GRID_ROWS)
+def xls_format(rows):
+    strategy = grid_strategies.Xls()
+    strategy.set_trader(_trader())
+    fd, path = tempfile.mkstemp(suffix=".xls")
+    with os.fdopen(fd, "w", encoding="gbk") as f:
+        f.write(make_grid(rows))
+    atexit.register(os.remove, path)
+    return lambda: strategy._format_grid_data(path)
+
+
+@benchmark("stock.get_stock_type", params=[100000])
+def stock_type(n):
+    codes = make_codes(n) + ["sh600000", "sz000001"]
+
+    def run():
+        for code in codes:
+            get_stock_type(code)
+
+    return run
+
+
+@benchmark("webtrader.format_response_data_type", params=[1000])
+def format_response(rows):
+    from easytrader.xqtrader import XueQiuTrader
+
+    trader = XueQiuTrader()
+    rnd = random.Random(0)
+    template = [
+        {
+            "证券代码": code,
+            "证券名称": "股票{}".format(code),
+            "当前持仓": str(rnd.randrange(1, 100) * 100),
+            "股份可用": str(rnd.randrange(1, 100) * 100),
+            "参考成本价": "{:.3f}".format(rnd.uniform(1, 100)),
+            "市价": "{:.3f}".format(rnd.uniform(1, 100)),
+            "参考盈亏": "{:.2f}".format(rnd.uniform(-1000, 1000)),
+        }
+        for code in make_codes(rows)
+    ]
+
+    # list 会被原样返回，使用 tuple 走类型转换的路径；转换是原地修改，每次使用新的副本
+    return lambda: trader.format_response_data_type(tuple(dict(row) for row in template))
+
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import random
+
+from easytrader.pretrade import PreTradeChecker
+
+from .bench_parsing import make_codes
+from .harness import benchmark
+
+
+def _checker():
+    codes = make_codes(1000)
+    checker = PreTradeChecker(reference_prices={code: 10.0 for code in codes})
+    checker.load_snapshot(
+        {"可用金额": 1e9}, [{"证券代码": code, "可用余额": 10 ** 6} for code in codes]
+    )
+    return checker, codes
+
+
+@benchmark("pretrade.check")
+def check():
+    checker, _ = _checker()
+    return lambda: checker.check("buy", "600000", 10.5, 1000)
+
+
+@benchmark("pretrade.check_basket", params=[100, 1000])
+def check_basket(n):
+    checker, codes = _checker()
+    rnd = random.Random(0)
+    orders = [
+        (rnd.choice(["buy", "sell"]), rnd.choice(codes), round(rnd.uniform(9.5, 10.5), 2), 1000)
+        for _ in range(n)
+    ]
+    return lambda: checker.check_basket(orders)
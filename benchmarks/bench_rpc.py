@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import atexit
+import socket
+
+from .harness import Skip, benchmark
+
+PAYLOAD_ROWS = [1, 100]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start():
+    try:
+        from easytrader import rpc
+    except ImportError as e:
+        raise Skip(e)
+
+    class Server(rpc.RpcServer):
+        def __init__(self):
+            super().__init__()
+            self.register(echo)
+
+    class Client(rpc.RpcClient):
+        def callback(self, topic, data):
+            pass
+
+    def echo(data):
+        return data
+
+    rep = "tcp://127.0.0.1:{}".format(_free_port())
+    pub = "tcp://127.0.0.1:{}".format(_free_port())
+    server = Server()
+    server.start(rep, pub)
+    client = Client()
+    client.subscribe_topic("")
+    client.start(rep, pub)
+
+    def shutdown():
+        client.stop()
+        # 唤醒阻塞在订阅套接字上的客户端线程
+        server.publish("bench", None)
+        client.join()
+        server.stop()
+        server.join()
+
+    atexit.register(shutdown)
+    return client
+
+
+_client = None
+
+
+@benchmark("rpc.round_trip", params=PAYLOAD_ROWS)
+def round_trip(rows):
+    global _client
+    if _client is None:
+        _client = _start()
+    payload = [
+        {"证券代码": "600000", "证券名称": "浦发银行", "股票余额": 1000, "成本价": 10.5}
+    ] * rows
+    return lambda: _client.echo(payload)
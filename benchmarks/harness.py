@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import datetime
+import fnmatch
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+RESULT_VERSION = 1
+
+# 已注册的 benchmark: (名称, 工厂函数, 参数)
+_registry: List = []
+
+
+class Skip(Exception):
+    """benchmark 依赖的模块不可用"""
+
+
+def benchmark(name: str, params: Optional[Iterable] = None, rounds: Optional[int] = None):
+    """
+    注册 benchmark
+    被装饰的函数完成准备工作后返回无参的计时函数，准备工作不计入耗时
+    :param name: benchmark 名称
+    :param params: 参数列表，每个参数注册为 name[param]
+    :param rounds: 固定的计时轮数，用于单次耗时较长的 benchmark，每轮只执行一次
+    """
+
+    def decorator(factory: Callable):
+        for param in params if params is not None else [None]:
+            full_name = name if param is None else "{}[{}]".format(name, param)
+            _registry.append((full_name, factory, param, rounds))
+        return factory
+
+    return decorator
+
+
+def _time_once(fn, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return (time.perf_counter() - start) / loops
+
+
+def _calibrate(fn, min_time):
+    loops = 1
+    while True:
+        elapsed = _time_once(fn, loops) * loops
+        if elapsed >= min_time or loops >= 1 << 20:
+            return loops
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+
+def run(
+    patterns: Optional[List[str]] = None,
+    rounds: int = 5,
+    min_time: float = 0.05,
+    out=sys.stdout,
+) -> Dict:
+    """
+    :param patterns: 只运行名称匹配的 benchmark，支持 fnmatch 通配符
+    :param rounds: 计时轮数，取各轮单次耗时的统计值
+    :param min_time: 每轮最少耗时，单位为秒，用于确定每轮循环次数
+    :return: 可写入 JSON 的结果
+    """
+    logger = logging.getLogger("easytrader")
+    level = logger.level
+    # 避免日志输出影响计时
+    logger.setLevel(logging.ERROR)
+    results = {}
+    try:
+        for name, factory, param, fixed_rounds in _registry:
+            if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            try:
+                fn = factory() if param is None else factory(param)
+            except Skip as e:
+                out.write("{:<48} skipped: {}\n".format(name, e))
+                continue
+            if fixed_rounds is not None:
+                loops, n_rounds = 1, fixed_rounds
+            else:
+                loops, n_rounds = _calibrate(fn, min_time), rounds
+            timings = [_time_once(fn, loops) for _ in range(n_rounds)]
+            results[name] = {
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "mean": statistics.mean(timings),
+                "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+                "rounds": n_rounds,
+                "loops": loops,
+            }
+            out.write(
+                "{:<48} median {:>12.3f} us  min {:>12.3f} us\n".format(
+                    name, results[name]["median"] * 1e6, results[name]["min"] * 1e6
+                )
+            )
+    finally:
+        logger.setLevel(level)
+    return {
+        "version": RESULT_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(
+    current: Dict, baseline: Dict, threshold: float = 0.3, stat: str = "min", out=sys.stdout
+) -> List[str]:
+    """
+    与基线比较
+    :param threshold: 允许的变慢比例，超过视为性能回退
+    :param stat: 用于比较的统计值，min 受机器负载的影响最小
+    :return: 性能回退的 benchmark 名称
+    """
+    regressions = []
+    base = baseline.get("benchmarks", {})
+    for name, result in current["benchmarks"].items():
+        if name not in base:
+            continue
+        ratio = result[stat] / base[name][stat] if base[name][stat] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        out.write("{:<48} {:>7.2f}x {}\n".format(name, ratio, flag))
+    return regressions
+
+
+def load(path) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dump(results: Dict, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
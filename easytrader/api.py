@@ -14,10 +14,11 @@ if sys.version_info <= (3, 5):
     raise TypeError("不支持 Python3.5 及以下版本，请升级")
 
 
-def use(broker, debug=False, **kwargs):
+def use(broker, debug=False, async_=False, **kwargs):
     """用于生成特定的券商对象
     :param broker:券商名支持 ['yh_client', '银河客户端'] ['ht_client', '华泰客户端']
     :param debug: 控制 debug 日志的显示, 默认为 True
+    :param async_: [客户端参数] 返回 asyncio 封装的 AsyncClientTrader, 默认为 False
     :param initial_assets: [雪球参数] 控制雪球初始资金，默认为一百万
     :return the class of trader
 
@@ -27,6 +28,11 @@ def use(broker, debug=False, **kwargs):
         >>> user = easytrader.use('xq')
         >>> user.prepare('xq.json')
     """
+    if async_:
+        from .async_trader import AsyncClientTrader
+
+        return AsyncClientTrader(use(broker, debug=debug, **kwargs))
+
     if debug:
         logger.setLevel(logging.DEBUG)
 
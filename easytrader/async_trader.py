@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from . import clienttrader
+
+
+class AsyncClientTrader:
+    """
+    客户端交易对象的 asyncio 封装
+
+    所有操作都提交到客户端交易对象的 GUI 执行线程中执行，不会阻塞事件循环。
+    尚未开始执行的操作可以通过取消 task 或者 asyncio.wait_for 超时取消
+
+    Usage::
+
+        >>> user = easytrader.use('ths', async_=True)
+        >>> await user.connect(r'c:\\htzqzyb2\\xiadan.exe')
+        >>> position = await user.position
+        >>> result = await asyncio.wait_for(user.buy('162411', 0.55, 100), 5)
+    """
+
+    def __init__(self, trader: "clienttrader.ClientTrader"):
+        if not callable(getattr(type(trader), "submit", None)):
+            raise TypeError("{} 不是客户端交易对象".format(type(trader).__name__))
+        self._trader = trader
+
+    @property
+    def trader(self) -> "clienttrader.ClientTrader":
+        return self._trader
+
+    def _call(self, name, *args, **kwargs) -> asyncio.Future:
+        return asyncio.wrap_future(self._trader.submit(name, *args, **kwargs))
+
+    async def connect(self, exe_path=None, **kwargs):
+        return await self._call("connect", exe_path, **kwargs)
+
+    async def prepare(self, *args, **kwargs):
+        return await self._call("prepare", *args, **kwargs)
+
+    @property
+    def balance(self) -> asyncio.Future:
+        return self._call("balance")
+
+    @property
+    def position(self) -> asyncio.Future:
+        return self._call("position")
+
+    @property
+    def today_entrusts(self) -> asyncio.Future:
+        return self._call("today_entrusts")
+
+    @property
+    def today_trades(self) -> asyncio.Future:
+        return self._call("today_trades")
+
+    @property
+    def cancel_entrusts(self) -> asyncio.Future:
+        return self._call("cancel_entrusts")
+
+    async def query(self, name, max_age=None, result_format=None):
+        return await self._call(
+            "query", name, max_age=max_age, result_format=result_format
+        )
+
+    async def snapshot(self, *args, **kwargs):
+        return await self._call("snapshot", *args, **kwargs)
+
+    async def buy(self, security, price, amount, **kwargs):
+        return await self._call("buy", security, price, amount, **kwargs)
+
+    async def sell(self, security, price, amount, **kwargs):
+        return await self._call("sell", security, price, amount, **kwargs)
+
+    async def market_buy(self, security, amount, **kwargs):
+        return await self._call("market_buy", security, amount, **kwargs)
+
+    async def market_sell(self, security, amount, **kwargs):
+        return await self._call("market_sell", security, amount, **kwargs)
+
+    async def submit_orders(self, orders):
+        return await self._call("submit_orders", orders)
+
+    async def cancel_entrust(self, entrust_no):
+        return await self._call("cancel_entrust", entrust_no)
+
+    async def cancel_entrusts_by_id(self, entrust_nos):
+        return await self._call("cancel_entrusts_by_id", entrust_nos)
+
+    async def cancel_all_entrusts(self):
+        return await self._call("cancel_all_entrusts")
+
+    async def auto_ipo(self):
+        return await self._call("auto_ipo")
+
+    async def wait_for_fill(self, entrust_no, timeout=None):
+        # 等待委托完成不占用 GUI 执行线程
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._trader.wait_for_fill, entrust_no, timeout
+        )
@@ -1,30 +1,102 @@
 # -*- coding: utf-8 -*-
 import abc
+import collections
+import datetime
 import functools
 import logging
 import os
 import re
 import sys
+import threading
 import time
-from typing import Type, Union
+from typing import TYPE_CHECKING, Optional, Type, Union
 
 import hashlib, binascii
 
 import easyutils
-from pywinauto import findwindows, timings
-
-from . import grid_strategies, pop_dialog_handler, refresh_strategies
+from pywinauto import findwindows, handleprops, timings
+
+from . import (
+    gui_executor,
+    grid_strategies,
+    pop_dialog_handler,
+    refresh_strategies,
+    trade_trace,
+)
 from .config import client
+from .data_cache import AccountDataCache
+from .exceptions import PreTradeRejected
+from .grid_diff import GridDiff
+from .order_tracker import OrderTracker
 from .grid_strategies import IGridStrategy
 from .log import logger
 from .refresh_strategies import IRefreshStrategy
-from .utils.misc import file2dict
+from .utils import grid_parser
+from .utils.misc import file2dict, str2time
 from .utils.perf import perf_clock
+from .utils.stock import get_stock_type
 
 if not sys.platform.startswith("darwin"):
     import pywinauto
     import pywinauto.clipboard
 
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from .pretrade import PreTradeChecker
+
+# 弹窗监视结果: 弹窗 wrapper, 弹窗标题, 等待耗时(秒)
+PopDialog = collections.namedtuple("PopDialog", ["window", "title", "waited"])
+
+
+def invalidate_data_cache(f):
+    """交易类操作: 执行期间暂停缓存的后台刷新，执行后清空账户数据缓存"""
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        if self.data_cache is None:
+            return f(self, *args, **kwargs)
+        with self.data_cache.mutation():
+            return f(self, *args, **kwargs)
+
+    return wrapper
+
+
+def pretrade_check(f):
+    """买卖操作: 开启 enable_pretrade 后在操作客户端之前检查委托并预留资金或股份"""
+
+    @functools.wraps(f)
+    def wrapper(self, security, price, amount, **kwargs):
+        if self.pretrade is None:
+            return f(self, security, price, amount, **kwargs)
+        decision = self.pretrade.check(f.__name__, security, price, amount, reserve=True)
+        try:
+            return f(self, security, price, decision.amount, **kwargs)
+        except BaseException:
+            self.pretrade.release(decision)
+            raise
+
+    return wrapper
+
+
+def trace_trade(f):
+    """下单类操作: 开启 enable_trade_trace 后记录每笔委托各步骤的耗时"""
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        if self.trade_trace_sink is None and not self.attach_trade_trace:
+            return f(self, *args, **kwargs)
+        outermost = trade_trace.current() is None
+        # 委托参数作为一个整体传入，避免与 record 的参数重名
+        order = {"args": args, "kwargs": kwargs}
+        with trade_trace.record(f.__name__, self.trade_trace_sink, order) as trace:
+            result = f(self, *args, **kwargs)
+        if outermost and self.attach_trade_trace and isinstance(result, dict):
+            result = dict(result, trace=trace.to_dict())
+        return result
+
+    return wrapper
+
+
 class IClientTrader(abc.ABC):
     @property
     @abc.abstractmethod
@@ -61,10 +133,182 @@ class IClientTrader(abc.ABC):
 
 class ClientTrader(IClientTrader):
     _editor_need_type_keys = False
+    # 批量下单时各交易方向对应的菜单
+    ORDER_MENU_PATHS = {"buy": ["买入[F1]"], "sell": ["卖出[F2]"]}
+    # snapshot 支持的数据项及其所在菜单的配置名
+    SNAPSHOT_PARTS = collections.OrderedDict(
+        [
+            ("balance", "BALANCE_MENU_PATH"),
+            ("position", "POSITION_MENU_PATH"),
+            ("today_entrusts", "TODAY_ENTRUSTS_MENU_PATH"),
+            ("today_trades", "TODAY_TRADES_MENU_PATH"),
+        ]
+    )
     # The strategy to use for getting grid data
     grid_strategy: Union[IGridStrategy, Type[IGridStrategy]] = grid_strategies.Copy
     _grid_strategy_instance: IGridStrategy = None
     refresh_strategy: IRefreshStrategy = refresh_strategies.Switch()
+    # 账户数据缓存，通过 enable_data_cache 开启
+    data_cache: Optional[AccountDataCache] = None
+    # 委托状态跟踪，通过 enable_order_tracker 开启
+    order_tracker: Optional[OrderTracker] = None
+    # 委托耗时记录，通过 enable_trade_trace 开启
+    trade_trace_sink = None
+    attach_trade_trace = False
+    # 下单前检查，通过 enable_pretrade 开启
+    pretrade: Optional["PreTradeChecker"] = None
+    # position / today_entrusts / today_trades 的返回格式，可选 records / dataframe / numpy，
+    # 缓存、增量比较等内部处理始终使用 records
+    result_format = "records"
+    # 通过 submit 提交的操作在 GUI 执行线程中的优先级，未列出的按查询处理
+    OPERATION_PRIORITIES = {
+        "cancel_entrust": gui_executor.PRIORITY_CANCEL,
+        "cancel_entrusts_by_id": gui_executor.PRIORITY_CANCEL,
+        "cancel_entrusts_by": gui_executor.PRIORITY_CANCEL,
+        "cancel_all_entrusts": gui_executor.PRIORITY_CANCEL,
+        "buy": gui_executor.PRIORITY_ORDER,
+        "sell": gui_executor.PRIORITY_ORDER,
+        "market_buy": gui_executor.PRIORITY_ORDER,
+        "market_sell": gui_executor.PRIORITY_ORDER,
+        "repo": gui_executor.PRIORITY_ORDER,
+        "reverse_repo": gui_executor.PRIORITY_ORDER,
+        "submit_orders": gui_executor.PRIORITY_ORDER,
+        "auto_ipo": gui_executor.PRIORITY_ORDER,
+        "auto_repurchase": gui_executor.PRIORITY_ORDER,
+    }
+
+    def enable_data_cache(self, ttl=1.0, stale_ttl=0.0, refresh_interval=None):
+        """
+        开启账户数据缓存，balance/position/today_entrusts/today_trades 在有效期内直接返回缓存，
+        买卖、撤单、打新后缓存自动失效
+        :param ttl: 缓存有效期，单位为秒，可以用 {'position': 1, 'balance': 3} 为每项单独设置
+        :param stale_ttl: 过期后仍可返回旧数据并在后台刷新的时长，单位为秒
+        :param refresh_interval: 设置后在客户端空闲时以该间隔在后台提前刷新缓存，单位为秒
+        :return: AccountDataCache
+        """
+        # 后台刷新提交到 GUI 执行线程，与其他操作串行执行
+        self.data_cache = AccountDataCache(
+            ttl=ttl, stale_ttl=stale_ttl, submit=self._submit_background
+        )
+        for name in self.SNAPSHOT_PARTS:
+            self.data_cache.register(name, getattr(self, "_query_" + name))
+        if refresh_interval is not None:
+            self.data_cache.start_refresh_ahead(refresh_interval)
+        return self.data_cache
+
+    def enable_order_tracker(self, fast_interval=0.5, slow_interval=3.0):
+        """
+        开启委托状态跟踪，下单成功的委托自动加入跟踪
+        未开启缓存时同时开启 ttl 为 0 的缓存，使轮询与交易操作互斥
+        :param fast_interval: 有未完成委托时的轮询间隔，单位为秒
+        :param slow_interval: 委托长时间未完成时的轮询间隔，单位为秒
+        :return: OrderTracker
+        """
+        if self.data_cache is None:
+            self.enable_data_cache(ttl=0)
+        if self.order_tracker is None:
+            self.order_tracker = OrderTracker(
+                self, fast_interval=fast_interval, slow_interval=slow_interval
+            )
+            self.order_tracker.start()
+        return self.order_tracker
+
+    def enable_trade_trace(self, sink=None, attach=False):
+        """
+        开启委托耗时记录，每笔委托的菜单切换、参数填写、提交、弹窗处理等步骤各记录一个 span
+        :param sink: sink(trace)，每笔委托结束后调用，可使用 trade_trace.TraceCollector
+        :param attach: 是否将记录以 trace 字段附加到下单返回结果中
+        :return: sink
+        """
+        self.trade_trace_sink = sink
+        self.attach_trade_trace = attach
+        return sink
+
+    def enable_pretrade(self, snapshot_ttl=5.0, clip=False, **kwargs):
+        """
+        开启下单前检查，buy/sell/submit_orders 在操作客户端之前拒绝资金不足、可用余额不足、
+        数量不符合交易单位、价格超出涨跌停范围的委托，被拒绝时抛出 PreTradeRejected
+        :param snapshot_ttl: 资金和持仓数据的有效期，单位为秒
+        :param clip: 截断委托数量而不是拒绝
+        :param kwargs: 见 PreTradeChecker，例如 reference_prices / fee_rate
+        :return: PreTradeChecker
+        """
+        # pretrade 依赖 numpy，只在开启时导入
+        from .pretrade import PreTradeChecker
+
+        self.pretrade = PreTradeChecker(
+            loader=self._pretrade_snapshot,
+            snapshot_ttl=snapshot_ttl,
+            clip=clip,
+            balance_field=self._config.BALANCE_AVAILABLE_FIELD,
+            security_field=self._config.POSITION_SECURITY_FIELD,
+            available_field=self._config.POSITION_AVAILABLE_FIELD,
+            **kwargs
+        )
+        return self.pretrade
+
+    def _pretrade_snapshot(self):
+        return self.query("balance"), self.query("position", result_format="records") or []
+
+    def wait_for_fill(self, entrust_no, timeout=None):
+        """等待委托完成，见 OrderTracker.wait_for_fill"""
+        return self.enable_order_tracker().wait_for_fill(entrust_no, timeout)
+
+    def query(self, name, max_age=None, result_format=None):
+        """
+        读取账户数据，开启缓存时优先返回缓存
+        :param name: 可选 ['balance', 'position', 'today_entrusts', 'today_trades']
+        :param max_age: 可接受的最大数据时长，单位为秒，覆盖缓存有效期
+        :param result_format: 表格数据的返回格式，默认为 result_format 属性，balance 不受影响
+        """
+        if name not in self.SNAPSHOT_PARTS:
+            raise ValueError("不支持的数据项: {}".format(name))
+        if self.data_cache is None:
+            data = getattr(self, "_query_" + name)()
+        else:
+            data = self.data_cache.get(name, max_age)
+        if name == "balance":
+            return data
+        return grid_parser.convert(
+            data,
+            result_format or self.result_format,
+            self._config.GRID_NUMPY_DTYPE,
+        )
+
+    @property
+    def executor(self):
+        """操作客户端的唯一执行线程，首次使用时创建"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = gui_executor.GuiExecutor()
+        return self._executor
+
+    def submit(self, name, /, *args, priority=None, timeout=None, **kwargs):
+        """
+        在 GUI 执行线程中执行操作，多线程调用时保证同一时间只有一个操作在操作客户端
+        :param name: 方法名或属性名，例如 'buy', 'position'
+        :param priority: 优先级，默认按 OPERATION_PRIORITIES 确定
+        :param timeout: 请求的有效时长，单位为秒，超时仍未开始执行的请求被丢弃
+        :return: concurrent.futures.Future
+
+        Usage::
+
+            >>> user.submit('buy', '162411', price=0.55, amount=100).result()
+            >>> user.submit('position', timeout=5).result()
+        """
+        if priority is None:
+            priority = self.OPERATION_PRIORITIES.get(name, gui_executor.PRIORITY_QUERY)
+        if isinstance(getattr(type(self), name, None), property):
+            fn = functools.partial(getattr, self, name)
+        else:
+            fn = getattr(self, name)
+        return self.executor.submit(
+            fn, *args, priority=priority, timeout=timeout, **kwargs
+        )
+
+    def _submit_background(self, fn, *args):
+        # 执行线程内读取缓存触发的后台刷新也放入队列，不在当前操作中同步执行
+        return self.executor.post(fn, *args, priority=gui_executor.PRIORITY_QUERY)
 
     def enable_type_keys_for_editor(self):
         """
@@ -88,6 +332,19 @@ class ClientTrader(IClientTrader):
         self._app = None
         self._main = None
         self._toolbar = None
+        # 当前左侧菜单页面状态: (主窗口, 菜单路径)
+        self._menu_state = None
+        # 已解析的控件缓存: (control_id, class_name) -> wrapper
+        self._control_cache = {}
+        self._control_cache_main = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # 当日委托/成交的增量比较，以及尚未被消费的变化行
+        self._entrust_diff = GridDiff(self._config.ENTRUST_KEY_FIELD)
+        self._trade_diff = GridDiff(self._config.TRADE_KEY_FIELD)
+        self._entrust_updates = collections.deque()
+        self._new_trades = collections.deque()
+        self._change_listeners = []
 
     @property
     def app(self):
@@ -114,6 +371,8 @@ class ClientTrader(IClientTrader):
             )
 
         self._app = pywinauto.Application().connect(path=connect_path, timeout=10)
+        self._invalidate_menu_state()
+        self._clear_control_cache()
         self._close_prompt_windows()
         self._main = self._app.top_window()
         self._init_toolbar()
@@ -124,7 +383,10 @@ class ClientTrader(IClientTrader):
 
     @property
     def balance(self):
-        self._switch_left_menus(["查询[F4]", "资金股票"])
+        return self.query("balance")
+
+    def _query_balance(self):
+        self._switch_left_menus(self._config.BALANCE_MENU_PATH)
 
         return self._get_balance_from_statics()
 
@@ -135,29 +397,118 @@ class ClientTrader(IClientTrader):
         result = {}
         for key, control_id in self._config.BALANCE_CONTROL_ID_GROUP.items():
             result[key] = float(
-                self._main.child_window(
-                    control_id=control_id, class_name="Static"
-                ).window_text()
+                self._get_control(control_id, "Static").window_text()
             )
         return result
 
     @property
     def position(self):
-        self._switch_left_menus(["查询[F4]", "资金股票"])
+        return self.query("position")
+
+    def _query_position(self):
+        self._switch_left_menus(self._config.POSITION_MENU_PATH)
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
     @property
     def today_entrusts(self):
-        self._switch_left_menus(["查询[F4]", "当日委托"])
+        return self.query("today_entrusts")
 
-        return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
+    def _query_today_entrusts(self):
+        self._switch_left_menus(self._config.TODAY_ENTRUSTS_MENU_PATH)
+
+        entrusts = self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
+        added, changed = self._entrust_diff.update(entrusts or [])
+        self._publish_changes("today_entrusts", added + changed, self._entrust_updates)
+        return entrusts
 
     @property
     def today_trades(self):
-        self._switch_left_menus(["查询[F4]", "当日成交"])
+        return self.query("today_trades")
 
-        return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
+    def _query_today_trades(self):
+        self._switch_left_menus(self._config.TODAY_TRADES_MENU_PATH)
+
+        trades = self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
+        added, _ = self._trade_diff.update(trades or [])
+        self._publish_changes("today_trades", added, self._new_trades)
+        return trades
+
+    def new_trades(self, max_age=None):
+        """
+        读取当日成交，只返回上次消费之后新增的成交记录
+        :param max_age: 同 query，开启缓存时可接受的最大数据时长
+        :return: 新增成交记录的迭代器
+        """
+        self.query("today_trades", max_age, result_format="records")
+        return self._drain(self._new_trades)
+
+    def entrust_updates(self, max_age=None):
+        """
+        读取当日委托，只返回上次消费之后新增或状态变化的委托记录
+        :param max_age: 同 query，开启缓存时可接受的最大数据时长
+        :return: 新增或变化委托记录的迭代器
+        """
+        self.query("today_entrusts", max_age, result_format="records")
+        return self._drain(self._entrust_updates)
+
+    def last_entrust(self, entrust_no):
+        """最近一次读取当日委托时该委托的记录，未读取到时返回 None"""
+        return self._entrust_diff.get(str(entrust_no))
+
+    def add_change_listener(self, callback):
+        """
+        注册当日委托/成交变化的回调
+        :param callback: callback(name, rows)，name 为 'today_entrusts' 或 'today_trades'，
+            rows 为新增或变化的记录
+        """
+        self._change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        self._change_listeners.remove(callback)
+
+    def _publish_changes(self, name, rows, pending):
+        if not rows:
+            return
+        pending.extend(rows)
+        for callback in list(self._change_listeners):
+            try:
+                callback(name, rows)
+            # pylint: disable=broad-except
+            except Exception:
+                logger.exception("%s 变化回调执行失败", name)
+
+    @staticmethod
+    def _drain(pending):
+        while pending:
+            yield pending.popleft()
+
+    @perf_clock
+    def snapshot(self, parts=tuple(SNAPSHOT_PARTS)):
+        """
+        一次调用读取多项账户数据，按所在菜单排序读取以减少菜单切换，
+        例如 balance 和 position 同在 资金股票 页面
+        :param parts: 需要读取的数据项，可选 ['balance', 'position', 'today_entrusts', 'today_trades']
+        :return: {数据项: {'data': 数据, 'timestamp': 读取完成时间, 'elapsed': 耗时(秒)}}，
+            按 parts 的顺序返回
+        """
+        unknown = [part for part in parts if part not in self.SNAPSHOT_PARTS]
+        if unknown:
+            raise ValueError("不支持的数据项: {}".format(unknown))
+
+        read_order = sorted(
+            parts, key=lambda part: tuple(getattr(self._config, self.SNAPSHOT_PARTS[part]))
+        )
+        results = {}
+        for part in read_order:
+            start = time.perf_counter()
+            data = self.query(part)
+            results[part] = {
+                "data": data,
+                "timestamp": datetime.datetime.now(),
+                "elapsed": time.perf_counter() - start,
+            }
+        return collections.OrderedDict((part, results[part]) for part in parts)
 
     @property
     def cancel_entrusts(self):
@@ -167,15 +518,110 @@ class ClientTrader(IClientTrader):
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
     @perf_clock
+    @invalidate_data_cache
     def cancel_entrust(self, entrust_no):
-        self.refresh()
+        # 单个撤单失败时抛出异常，与批量撤单不同
+        return self._cancel_entrusts_by_id([entrust_no], raise_errors=True)[entrust_no]
+
+    @perf_clock
+    @invalidate_data_cache
+    def cancel_entrusts_by_id(self, entrust_nos):
+        """
+        批量撤单，只读取一次撤单列表
+        :param entrust_nos: 委托单号列表
+        :return: {委托单号: 撤单结果}
+        """
+        return self._cancel_entrusts_by_id(entrust_nos)
+
+    def _cancel_entrusts_by_id(self, entrust_nos, raise_errors=False):
+        wanted = {str(entrust_no): entrust_no for entrust_no in entrust_nos}
+        field = self._config.CANCEL_ENTRUST_ENTRUST_FIELD
+        cancelled = self._cancel_matched_entrusts(
+            lambda entrust: str(entrust[field]) in wanted, raise_errors
+        )
+
+        results = {}
+        for key, entrust_no in wanted.items():
+            results[entrust_no] = cancelled.get(
+                key, {"message": "委托单状态错误不能撤单, 该委托单可能已经成交或者已撤"}
+            )
+        return results
 
-        for i, entrust in enumerate(self.cancel_entrusts):
-            if entrust[self._config.CANCEL_ENTRUST_ENTRUST_FIELD] == entrust_no:
-                self._cancel_entrust_by_double_click(i)
-                return self._handle_pop_dialogs()
-        return {"message": "委托单状态错误不能撤单, 该委托单可能已经成交或者已撤"}
+    @perf_clock
+    @invalidate_data_cache
+    def cancel_entrusts_by(self, security=None, side=None, older_than=None):
+        """
+        按条件批量撤单，只读取一次撤单列表
+        :param security: 证券代码
+        :param side: 交易方向，可选 ['buy', 'sell']
+        :param older_than: 只撤销委托时间早于 older_than 秒之前的委托，委托时间无法解析的委托不撤销
+        :return: {委托单号: 撤单结果}
+        """
+        config = self._config
+        side_text = {"buy": "买", "sell": "卖"}.get(side)
+        if side is not None and side_text is None:
+            raise ValueError("不支持的交易方向: {}".format(side))
+        before = None
+        if older_than is not None:
+            now = datetime.datetime.now()
+            cutoff = now - datetime.timedelta(seconds=older_than)
+            # 截止时间在今天之前时，当日委托都不满足条件
+            before = cutoff.time() if cutoff.date() == now.date() else datetime.time.min
+
+        def match(entrust):
+            if (
+                security is not None
+                and str(entrust[config.CANCEL_ENTRUST_SECURITY_FIELD]) != security[-6:]
+            ):
+                return False
+            if side_text is not None and side_text not in str(
+                entrust[config.CANCEL_ENTRUST_SIDE_FIELD]
+            ):
+                return False
+            if before is not None:
+                entrust_time = str2time(entrust[config.CANCEL_ENTRUST_TIME_FIELD])
+                if entrust_time is None:
+                    logger.warning(
+                        "无法解析委托时间 %s，不撤销",
+                        entrust[config.CANCEL_ENTRUST_TIME_FIELD],
+                    )
+                    return False
+                if entrust_time >= before:
+                    return False
+            return True
+
+        return self._cancel_matched_entrusts(match)
 
+    def _cancel_matched_entrusts(self, predicate, raise_errors=False):
+        """
+        读取一次撤单列表，建立 委托单号 -> 行号 的索引后撤销满足 predicate 的委托。
+        从最后一行往前撤单，撤掉的行不会改变其上方待撤行的位置，因此无需重新读取列表
+        :param raise_errors: 撤单出错时关闭弹窗后抛出异常，默认记录为 {"error": ...} 并继续撤其他委托
+        :return: {委托单号: 撤单结果}
+        """
+        field = self._config.CANCEL_ENTRUST_ENTRUST_FIELD
+        rows = {
+            str(entrust[field]): row
+            for row, entrust in enumerate(self.cancel_entrusts)
+            if predicate(entrust)
+        }
+
+        results = {}
+        for entrust_no, row in sorted(rows.items(), key=lambda item: -item[1]):
+            try:
+                self._cancel_entrust_by_double_click(row)
+                results[entrust_no] = self._handle_pop_dialogs()
+            # pylint: disable=broad-except
+            except Exception as e:
+                if raise_errors:
+                    self.close_pop_dialog()
+                    raise
+                logger.exception("撤单 %s 失败", entrust_no)
+                results[entrust_no] = {"error": "{}: {}".format(type(e).__name__, e)}
+                self.close_pop_dialog()
+        return results
+
+    @invalidate_data_cache
     def cancel_all_entrusts(self):
         self.refresh()
         self._switch_left_menus(["撤单[F3]"])
@@ -185,7 +631,6 @@ class ClientTrader(IClientTrader):
         self._app.top_window().child_window(
             control_id=self._config.TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID, class_name="Button", title_re="""全撤.*"""
         ).click()
-        self.wait(0.2)
 
         # 等待出现 确认对话框
         if self.is_exist_pop_dialog():
@@ -194,8 +639,9 @@ class ClientTrader(IClientTrader):
             if w is not None:
                 btn = w["是(Y)"]
                 if btn is not None:
+                    dialog = w.wrapper_object()
                     btn.click()
-                    self.wait(0.2)
+                    self.wait_until(lambda: self._is_window_closed(dialog), 0.2)
 
         # 如果出现了确认窗口
         self.close_pop_dialog()
@@ -203,30 +649,89 @@ class ClientTrader(IClientTrader):
         return grid_data
 
     @perf_clock
+    @invalidate_data_cache
+    @trace_trade
     def repo(self, security, price, amount, **kwargs):
         self._switch_left_menus(["债券回购", "融资回购（正回购）"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_data_cache
+    @trace_trade
     def reverse_repo(self, security, price, amount, **kwargs):
         self._switch_left_menus(["债券回购", "融劵回购（逆回购）"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @pretrade_check
+    @invalidate_data_cache
+    @trace_trade
     def buy(self, security, price, amount, **kwargs):
         self._switch_left_menus(["买入[F1]"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @pretrade_check
+    @invalidate_data_cache
+    @trace_trade
     def sell(self, security, price, amount, **kwargs):
         self._switch_left_menus(["卖出[F2]"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_data_cache
+    def submit_orders(self, orders):
+        """
+        批量下单，按交易方向和交易所分组，每组只切换一次菜单，单笔失败不影响其余委托
+        :param orders: [(side, security, price, amount)], side 可选 ['buy', 'sell']
+        :return: 与 orders 顺序一致的结果列表，成功为 {'entrust_no': '委托单号'}，
+            失败为 {'error': '错误信息'}
+        """
+        results = [None] * len(orders)
+        decisions = None
+        if self.pretrade is not None:
+            # 一次检查整组委托，未通过的委托不操作客户端
+            decisions = self.pretrade.check_basket(orders, reserve=True)
+        groups = collections.OrderedDict()
+        for i, (side, security, _, _) in enumerate(orders):
+            if side not in self.ORDER_MENU_PATHS:
+                results[i] = {"error": "不支持的交易方向: {}".format(side)}
+                continue
+            if decisions is not None and decisions[i].reason is not None:
+                results[i] = {
+                    "error": "{}: {}".format(
+                        PreTradeRejected.__name__, PreTradeRejected(decisions[i])
+                    )
+                }
+                continue
+            groups.setdefault((side, get_stock_type(security)), []).append(i)
+
+        for (side, _), indexes in groups.items():
+            path = self.ORDER_MENU_PATHS[side]
+            for i in indexes:
+                _, security, price, amount = orders[i]
+                if decisions is not None:
+                    amount = decisions[i].amount
+                try:
+                    if not self._is_menu_active(path):
+                        self._switch_left_menus(path)
+                    results[i] = self.trade(security, price, amount)
+                # pylint: disable=broad-except
+                except Exception as e:
+                    logger.exception("批量下单 %s %s 失败", side, security)
+                    results[i] = {"error": "{}: {}".format(type(e).__name__, e)}
+                    if decisions is not None:
+                        self.pretrade.release(decisions[i])
+                    self.close_pop_dialog()
+        return results
+
+    @perf_clock
+    @invalidate_data_cache
+    @trace_trade
     def market_buy(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价买入
@@ -244,6 +749,8 @@ class ClientTrader(IClientTrader):
         return self.market_trade(security, amount, ttype, limit_price=limit_price)
 
     @perf_clock
+    @invalidate_data_cache
+    @trace_trade
     def market_sell(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价卖出
@@ -259,6 +766,7 @@ class ClientTrader(IClientTrader):
 
         return self.market_trade(security, amount, ttype, limit_price=limit_price)
 
+    @trace_trade
     def market_trade(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价交易
@@ -285,8 +793,10 @@ class ClientTrader(IClientTrader):
         self._set_market_trade_params(security, amount, limit_price=limit_price)
         self._submit_trade()
 
-        return self._handle_pop_dialogs(
-            handler_class=pop_dialog_handler.TradePopDialogHandler
+        return self._track_order(
+            self._handle_pop_dialogs(
+                handler_class=pop_dialog_handler.TradePopDialogHandler
+            )
         )
 
     def _set_market_trade_type(self, ttype):
@@ -308,8 +818,8 @@ class ClientTrader(IClientTrader):
 
     def _set_stock_exchange_type(self, ttype):
         """根据选择的市价交易类型选择对应的下拉选项"""
-        selects = self._main.child_window(
-            control_id=self._config.TRADE_STOCK_EXCHANGE_CONTROL_ID, class_name="ComboBox"
+        selects = self._get_control(
+            self._config.TRADE_STOCK_EXCHANGE_CONTROL_ID, "ComboBox"
         )
 
         for i, text in enumerate(selects.texts()):
@@ -324,6 +834,7 @@ class ClientTrader(IClientTrader):
                 return
         raise TypeError("不支持对应的市场类型: {}".format(ttype))
 
+    @invalidate_data_cache
     def auto_repurchase(self):
         """
         国债逆回购
@@ -332,12 +843,15 @@ class ClientTrader(IClientTrader):
         self._switch_left_menus(["查询[F4]"])
         self._switch_left_menus(["国债逆回购"])
         self.wait(0.3)
+        # 通过坐标点击操作页面，无法确定之后的页面状态
+        self._invalidate_menu_state()
 
         self._app.top_window().double_click_input(coords=(140,100)) #一天期
         self._app.top_window().double_click_input(coords=(140,375)) #出借
         self._app.top_window().double_click_input(coords=(280,295)) #确认
         self._app.top_window().double_click_input(coords=(355,343)) #关闭
 
+    @invalidate_data_cache
     def auto_ipo(self):
 
         self._switch_left_menus(self._config.AUTO_IPO_MENU_PATH)
@@ -353,15 +867,14 @@ class ClientTrader(IClientTrader):
             return {"message": "没有发现可以申购的新股"}
 
         self._click(self._config.AUTO_IPO_SELECT_ALL_BUTTON_CONTROL_ID)
-        self.wait(0.1)
+        self.wait_until(self._is_page_grid_ready, 0.1)
 
         for row in invalid_list_idx:
             self._click_grid_by_row(row)
-        self.wait(0.1)
+        self.wait_until(self._is_page_grid_ready, 0.1)
 
         self._click(self._config.AUTO_IPO_BUTTON_CONTROL_ID)
-        self.wait(0.1)
-
+        # 申购结果弹窗由 _handle_pop_dialogs 等待
         return self._handle_pop_dialogs()
 
     def _click_grid_by_row(self, row):
@@ -376,8 +889,11 @@ class ClientTrader(IClientTrader):
         ).click(coords=(x, y))
 
     @perf_clock
-    def is_exist_pop_dialog(self):
-        self.wait(0.5)  # wait dialog display
+    def is_exist_pop_dialog(self, timeout=0.5):
+        # wait dialog display, timeout 仅为等待上限
+        return bool(self.wait_until(self._is_pop_dialog_shown, timeout))
+
+    def _is_pop_dialog_shown(self):
         try:
             return (
                 self._main.wrapper_object() != self._app.top_window().wrapper_object()
@@ -386,8 +902,20 @@ class ClientTrader(IClientTrader):
             findwindows.ElementNotFoundError,
             timings.TimeoutError,
             RuntimeError,
-        ) as ex:
-            logger.exception("check pop dialog timeout")
+        ):
+            logger.debug("check pop dialog timeout", exc_info=True)
+            return False
+
+    def _is_main_top_window(self):
+        try:
+            return (
+                self._main.wrapper_object() == self._app.top_window().wrapper_object()
+            )
+        except (
+            findwindows.ElementNotFoundError,
+            timings.TimeoutError,
+            RuntimeError,
+        ):
             return False
 
     @perf_clock
@@ -396,8 +924,10 @@ class ClientTrader(IClientTrader):
             if self._main.wrapper_object() != self._app.top_window().wrapper_object():
                 w = self._app.top_window()
                 if w is not None:
+                    self._invalidate_menu_state()
+                    dialog = w.wrapper_object()
                     w.close()
-                    self.wait(0.2)
+                    self.wait_until(lambda: self._is_window_closed(dialog), 0.2)
         except (
                 findwindows.ElementNotFoundError,
                 timings.TimeoutError,
@@ -411,54 +941,104 @@ class ClientTrader(IClientTrader):
     def wait(self, seconds):
         time.sleep(seconds)
 
+    def wait_until(self, predicate, timeout, poll=0.005, max_poll=0.05, deadline=None):
+        """
+        轮询等待条件成立，轮询间隔从 poll 开始按倍数退避到 max_poll
+        :param predicate: 无参数的判断函数，抛出异常视为条件不成立
+        :param timeout: 最长等待时间，单位为秒，仅作为上限
+        :param poll: 初始轮询间隔，单位为秒
+        :param max_poll: 最大轮询间隔，单位为秒
+        :param deadline: 整个步骤的截止时间 (time.monotonic() 时间)，与 timeout 取较早者
+        :return: 条件成立时返回 predicate 的结果，超时返回 False
+        """
+        end = time.monotonic() + timeout
+        if deadline is not None:
+            end = min(end, deadline)
+        interval = poll
+        while True:
+            try:
+                result = predicate()
+            # pylint: disable=broad-except
+            except Exception:
+                result = False
+            if result:
+                return result
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_poll)
+
     def exit(self):
         self._app.kill()
 
     def _close_prompt_windows(self):
-        self.wait(1)
-        for window in self._app.windows(class_name="#32770", visible_only=True):
-            title = window.window_text()
-            if title != self._config.TITLE:
-                logging.info("close " + title)
-                window.close()
-                self.wait(0.2)
-        self.wait(1)
+        self._invalidate_menu_state()
+        # 等待提示窗口出现
+        self.wait_until(self._prompt_windows, 1)
+        for window in self._prompt_windows():
+            logging.info("close " + window.window_text())
+            window.close()
+            self.wait(0.2)
+        # 等待提示窗口全部关闭
+        self.wait_until(lambda: not self._prompt_windows(), 1)
+
+    def _prompt_windows(self):
+        return [
+            window
+            for window in self._app.windows(class_name="#32770", visible_only=True)
+            if window.window_text() != self._config.TITLE
+        ]
 
     def close_pormpt_window_no_wait(self):
         for window in self._app.windows(class_name="#32770"):
             if window.window_text() != self._config.TITLE:
                 window.close()
 
+    @trace_trade
     def trade(self, security, price, amount):
         self._set_trade_params(security, price, amount)
 
         self._submit_trade()
-        return self._handle_pop_dialogs(
-            handler_class=pop_dialog_handler.TradePopDialogHandler
+        return self._track_order(
+            self._handle_pop_dialogs(
+                handler_class=pop_dialog_handler.TradePopDialogHandler
+            )
         )
 
+    def _track_order(self, result):
+        if self.order_tracker is not None:
+            self.order_tracker.track_result(result)
+        return result
+
     def _click(self, control_id):
+        # 按钮可能位于弹窗中，按顶层窗口查找，不使用主窗口的控件缓存
         self._app.top_window().child_window(
             control_id=control_id, class_name="Button"
         ).click()
 
     @perf_clock
+    @trade_trace.step
     def _submit_trade(self):
-        self._main.child_window(
-            control_id=self._config.TRADE_SUBMIT_CONTROL_ID, class_name="Button"
-        ).click()
+        self._get_control(self._config.TRADE_SUBMIT_CONTROL_ID, "Button").click()
 
         for window in self._app.windows(class_name="#32770", visible_only=True):
             title = window.window_text()
 
-            if title != self._config.TITLE:
+            # 提示信息 需按内容决定是否确认，交给 TradePopDialogHandler 处理
+            if title != self._config.TITLE and (
+                self._get_dialog_title(window) != "提示信息"
+            ):
+                trade_trace.add_dialog(title)
                 # 点击是 按钮
                 w = self._app.top_window()
                 if w is not None:
                     btn = w["是(Y)"]
                     if btn is not None:
+                        dialog = w.wrapper_object()
                         btn.click()
-                        self.wait(0.2)
+                        # 等待确认窗口关闭，0.2 秒仅为等待上限
+                        self.wait_until(lambda: self._is_window_closed(dialog), 0.2)
 
     @perf_clock
     def __get_top_window_pop_dialog(self):
@@ -474,21 +1054,35 @@ class ClientTrader(IClientTrader):
             .window_text()
         )
 
+    @trade_trace.step
     def _set_trade_params(self, security, price, amount):
         code = security[-6:]
 
         self._type_edit_control_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
 
-        # wait security input finish
-        self.wait(0.1)
+        # wait security input finish, 以显示出证券名称为准，连续委托同一证券时不需要等待名称变化
+        if self._config.TRADE_SECURITY_NAME_CONTROL_ID is None:
+            # 未配置证券名称控件，回退为固定等待
+            self.wait(0.1)
+        else:
+            self.wait_until(self._get_security_name, 0.1)
 
         # 设置交易所
+        exchange_type = None
         if security.lower().startswith("sz"):
-            self._set_stock_exchange_type("深圳Ａ股")
+            exchange_type = "深圳Ａ股"
         if security.lower().startswith("sh"):
-            self._set_stock_exchange_type("上海Ａ股")
-
-        self.wait(0.1)
+            exchange_type = "上海Ａ股"
+
+        if exchange_type is not None:
+            self._set_stock_exchange_type(exchange_type)
+            self.wait_until(
+                lambda: self._get_control(
+                    self._config.TRADE_STOCK_EXCHANGE_CONTROL_ID, "ComboBox"
+                ).selected_text().strip()
+                == exchange_type,
+                0.1,
+            )
 
         self._type_edit_control_keys(
             self._config.TRADE_PRICE_CONTROL_ID,
@@ -498,11 +1092,38 @@ class ClientTrader(IClientTrader):
             self._config.TRADE_AMOUNT_CONTROL_ID, str(int(amount))
         )
 
+    def _get_security_name(self):
+        """
+        读取输入证券代码后显示的证券名称
+        :return: 未配置 TRADE_SECURITY_NAME_CONTROL_ID 或找不到该控件时返回 None
+        """
+        control_id = self._config.TRADE_SECURITY_NAME_CONTROL_ID
+        if control_id is None:
+            return None
+        # 直接按句柄查找，控件不存在时不经过 WindowSpecification 的等待逻辑
+        try:
+            handles = findwindows.find_windows(
+                parent=self._main.wrapper_object().handle,
+                control_id=control_id,
+                class_name="Static",
+                top_level_only=False,
+            )
+        except (findwindows.ElementNotFoundError, RuntimeError):
+            return None
+        if not handles:
+            return None
+        return handleprops.text(handles[0]).strip()
+
+    @trade_trace.step
     def _set_market_trade_params(self, security, amount, limit_price=None):
-        self._type_edit_control_keys(
-            self._config.TRADE_AMOUNT_CONTROL_ID, str(int(amount))
+        amount_text = str(int(amount))
+        self._type_edit_control_keys(self._config.TRADE_AMOUNT_CONTROL_ID, amount_text)
+        self.wait_until(
+            lambda: self._get_control(
+                self._config.TRADE_AMOUNT_CONTROL_ID, "Edit"
+            ).window_text() == amount_text,
+            0.1,
         )
-        self.wait(0.1)
         price_control = None
         if str(security).startswith("68"):  # 科创板存在限价
             try:
@@ -518,17 +1139,13 @@ class ClientTrader(IClientTrader):
         return self.grid_strategy_instance.get(control_id)
 
     def _type_keys(self, control_id, text):
-        self._main.child_window(control_id=control_id, class_name="Edit").set_edit_text(
-            text
-        )
+        self._get_control(control_id, "Edit").set_edit_text(text)
 
     def _type_edit_control_keys(self, control_id, text):
         if not self._editor_need_type_keys:
-            self._main.child_window(
-                control_id=control_id, class_name="Edit"
-            ).set_edit_text(text)
+            self._get_control(control_id, "Edit").set_edit_text(text)
         else:
-            editor = self._main.child_window(control_id=control_id, class_name="Edit")
+            editor = self._get_control(control_id, "Edit")
             editor.select()
             editor.type_keys(text)
 
@@ -539,20 +1156,86 @@ class ClientTrader(IClientTrader):
             editor.select()
             editor.type_keys(text)
 
+    def _get_control(self, control_id, class_name):
+        """
+        获取主窗口中的控件，已解析的控件按 (control_id, class_name) 缓存，
+        缓存的句柄失效或不可见（例如切换到了其他页面）时重新查找
+        """
+        if self._control_cache_main is not self._main:
+            self._clear_control_cache()
+            self._control_cache_main = self._main
+
+        key = (control_id, class_name)
+        control = self._control_cache.get(key)
+        if control is None or not self._is_control_valid(control):
+            control = self._main.child_window(
+                control_id=control_id, class_name=class_name
+            ).wrapper_object()
+            self._control_cache[key] = control
+        return control
+
+    @staticmethod
+    def _is_control_valid(control):
+        handle = control.handle
+        return handleprops.iswindow(handle) and handleprops.isvisible(handle)
+
+    def _clear_control_cache(self):
+        self._control_cache.clear()
+
     def _collapse_left_menus(self):
         items = self._get_left_menus_handle().roots()
         for item in items:
             item.collapse()
 
     @perf_clock
+    @trade_trace.step
     def _switch_left_menus(self, path, sleep=0.2):
+        if self._is_menu_active(path):
+            # 已处于目标页面，只需刷新页面数据，同样等待 grid 可用
+            self._app.top_window().type_keys('{F5}')
+            self.wait_until(self._is_page_grid_ready, sleep)
+            return
+
+        self._invalidate_menu_state()
         self.close_pop_dialog()
         self._get_left_menus_handle().wait('ready', 2)
         self._get_left_menus_handle().get_item(path).select()
         self._app.top_window().type_keys('{F5}')
-        self.wait(sleep)
+        # 等待页面 grid 显示并可用，sleep 仅为等待上限
+        self.wait_until(self._is_page_grid_ready, sleep)
+        self._menu_state = (self._main, tuple(path))
+
+    def _is_menu_active(self, path):
+        """
+        判断客户端当前是否已显示 path 对应的页面
+        主窗口变化或者存在弹窗时视为页面状态失效
+        """
+        if self._menu_state is None:
+            return False
+        main, active_path = self._menu_state
+        if main is not self._main or active_path != tuple(path):
+            return False
+        return self._is_main_top_window()
+
+    @staticmethod
+    def _is_window_closed(window):
+        try:
+            return not window.is_visible()
+        except (findwindows.ElementNotFoundError, RuntimeError):
+            return True
+
+    def _is_page_grid_ready(self):
+        grid = self._main.child_window(
+            control_id=self._config.COMMON_GRID_CONTROL_ID,
+            class_name="CVirtualGridCtrl",
+        )
+        return grid.is_visible() and grid.is_enabled()
+
+    def _invalidate_menu_state(self):
+        self._menu_state = None
 
     def _switch_left_menus_by_shortcut(self, shortcut, sleep=0.5):
+        self._invalidate_menu_state()
         self.close_pop_dialog()
         self._app.top_window().type_keys(shortcut)
         self.wait(sleep)
@@ -587,24 +1270,62 @@ class ClientTrader(IClientTrader):
         ).double_click_input(coords=(x, y))
 
     def refresh(self):
+        self._invalidate_menu_state()
         self.refresh_strategy.set_trader(self)
         self.refresh_strategy.refresh()
 
     @perf_clock
+    @trade_trace.step
     def _handle_pop_dialogs(self, handler_class=pop_dialog_handler.PopDialogHandler):
 
         handler = handler_class(self._app)
+        handled = set()
 
-        while self.is_exist_pop_dialog():
-            try:
-                title = self._get_pop_dialog_title()
-            except pywinauto.findwindows.ElementNotFoundError:
+        while True:
+            dialog = self.watch_pop_dialog(ignore=handled)
+            if dialog is None:
                 return {"message": "success"}
+            logger.debug("pop dialog %s shown after %.4f sec", dialog.title, dialog.waited)
+            trade_trace.add_dialog(dialog.title)
+            # 已处理的弹窗可能还未完全关闭，避免重复处理
+            handled.add(dialog.window.handle)
 
-            result = handler.handle(title)
+            result = handler.handle(dialog.title, dialog.window)
             if result:
                 return result
-        return {"message": "success"}
+
+    def watch_pop_dialog(self, timeout=0.5, poll=0.001, ignore=()):
+        """
+        以毫秒级间隔轮询进程的 #32770 顶层窗口，直到出现标题控件有内容的弹窗
+        :param timeout: 最长等待时间，单位为秒
+        :param poll: 轮询间隔，单位为秒
+        :param ignore: 需要忽略的弹窗句柄
+        :return: PopDialog(window, title, waited)，超时未出现弹窗时返回 None
+        """
+        start = time.monotonic()
+        end = start + timeout
+        main_handle = self._main.wrapper_object().handle
+        while True:
+            for window in self._app.windows(class_name="#32770", visible_only=True):
+                if window.handle == main_handle or window.handle in ignore:
+                    continue
+                title = self._get_dialog_title(window)
+                if title:
+                    return PopDialog(window, title, time.monotonic() - start)
+            if time.monotonic() >= end:
+                return None
+            time.sleep(poll)
+
+    def _get_dialog_title(self, window):
+        # 直接按句柄查找标题控件，不经过 WindowSpecification 的等待逻辑
+        handles = findwindows.find_windows(
+            parent=window.handle,
+            control_id=self._config.POP_DIALOD_TITLE_CONTROL_ID,
+            top_level_only=False,
+        )
+        if not handles:
+            return ""
+        return handleprops.text(handles[0])
 
 
 class BaseLoginClientTrader(ClientTrader):
@@ -644,6 +1365,7 @@ class BaseLoginClientTrader(ClientTrader):
             comm_password,
             **kwargs
         )
+        self._clear_control_cache()
         self._init_toolbar()
 
         if res:
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from typing import Optional
+
+
 def create(broker):
     if broker == "yh":
         return YH
@@ -30,6 +33,10 @@ class CommonConfig:
     TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID = 30001
 
     TRADE_SECURITY_CONTROL_ID = 1032
+    # 输入证券代码后显示证券名称的控件，用于判断代码输入完成。
+    # 该控件 ID 尚未在各券商客户端上核实，默认不使用（固定等待），
+    # 核实后可在子类中设置，客户端中找不到该控件时同样回退为固定等待
+    TRADE_SECURITY_NAME_CONTROL_ID: Optional[int] = None
     TRADE_PRICE_CONTROL_ID = 1033
     TRADE_AMOUNT_CONTROL_ID = 1034
 
@@ -74,11 +81,55 @@ class CommonConfig:
         "发生日期": str,
     }
 
+    # result_format 为 numpy 时已知列的类型，字符串列超出长度时自动加宽
+    GRID_NUMPY_DTYPE = {
+        "证券代码": "U6",
+        "证券名称": "U8",
+        "股东代码": "U10",
+        "合同编号": "U12",
+        "成交编号": "U16",
+        "操作": "U8",
+        "备注": "U8",
+        "委托时间": "U8",
+        "成交时间": "U8",
+        "股票余额": "i8",
+        "可用余额": "i8",
+        "冻结数量": "i8",
+        "委托数量": "i8",
+        "成交数量": "i8",
+        "撤单数量": "i8",
+        "成本价": "f8",
+        "市价": "f8",
+        "盈亏": "f8",
+        "市值": "f8",
+        "委托价格": "f8",
+        "成交价格": "f8",
+        "成交均价": "f8",
+        "成交金额": "f8",
+    }
+
     CANCEL_ENTRUST_ENTRUST_FIELD = "合同编号"
+    CANCEL_ENTRUST_SECURITY_FIELD = "证券代码"
+    CANCEL_ENTRUST_SIDE_FIELD = "操作"
+    CANCEL_ENTRUST_TIME_FIELD = "委托时间"
     CANCEL_ENTRUST_GRID_LEFT_MARGIN = 100
     CANCEL_ENTRUST_GRID_FIRST_ROW_HEIGHT = 30
     CANCEL_ENTRUST_GRID_ROW_HEIGHT = 16
 
+    # 当日委托 / 当日成交 增量比较使用的主键
+    ENTRUST_KEY_FIELD = "合同编号"
+    TRADE_KEY_FIELD = "成交编号"
+
+    # 委托状态字段及状态值，用于跟踪委托是否完成
+    ENTRUST_STATUS_FIELD = "备注"
+    ENTRUST_FILLED_STATUSES = ("已成", "全部成交")
+    ENTRUST_FINAL_STATUSES = ("已成", "全部成交", "已撤", "部撤", "废单")
+
+    # 下单前检查使用的资金、持仓字段
+    BALANCE_AVAILABLE_FIELD = "可用金额"
+    POSITION_SECURITY_FIELD = "证券代码"
+    POSITION_AVAILABLE_FIELD = "可用余额"
+
     AUTO_IPO_SELECT_ALL_BUTTON_CONTROL_ID = 1098
     AUTO_IPO_BUTTON_CONTROL_ID = 1006
     AUTO_IPO_MENU_PATH = ["新股申购", "批量新股申购"]
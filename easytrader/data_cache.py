@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from .log import logger
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at")
+
+    def __init__(self, value, loaded_at):
+        self.value = value
+        self.loaded_at = loaded_at
+
+
+class AccountDataCache:
+    """
+    账户数据读穿缓存
+
+    - 数据在 ttl 内直接返回缓存
+    - 超过 ttl 但在 ttl + stale_ttl 内返回旧数据，同时在后台重新读取
+    - 开启 refresh-ahead 后，交易客户端空闲时在后台提前刷新即将过期的数据
+    - 交易类操作通过 mutation() 执行，期间禁止后台刷新，结束后清空缓存
+
+    所有读取操作都在同一把锁内执行。设置 submit 后后台刷新提交到 GUI 执行线程，
+    不会与 refresh / connect / 弹窗处理等不经过缓存的操作同时操作客户端界面
+    """
+
+    def __init__(
+        self,
+        ttl: Union[float, Dict[str, float]] = 1.0,
+        stale_ttl: float = 0.0,
+        submit: Optional[Callable[..., Future]] = None,
+    ):
+        """
+        :param ttl: 缓存有效期，单位为秒，可以用 {数据项: 有效期} 为每项单独设置
+        :param stale_ttl: 过期后仍可返回旧数据并在后台刷新的时长，单位为秒
+        :param submit: submit(fn, *args) -> Future，后台刷新的执行方式，例如 GuiExecutor.post，
+            需要异步执行 fn，默认在后台线程中执行
+        """
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._submit = submit
+        self._loaders: Dict[str, Callable] = {}
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()
+        self._revalidating: Set[str] = set()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+
+    def register(self, name: str, loader: Callable):
+        self._loaders[name] = loader
+
+    def ttl_for(self, name: str) -> float:
+        if isinstance(self._ttl, dict):
+            return self._ttl.get(name, 0.0)
+        return self._ttl
+
+    def get(self, name: str, max_age: Optional[float] = None):
+        """
+        :param name: 数据项
+        :param max_age: 可接受的最大数据时长，单位为秒，设置后覆盖 ttl 且不返回过期数据
+        """
+        entry = self._entries.get(name)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            limit = self.ttl_for(name) if max_age is None else max_age
+            if age <= limit:
+                return entry.value
+            if max_age is None and age <= limit + self._stale_ttl:
+                self._revalidate_async(name)
+                return entry.value
+        return self.load(name, max_age)
+
+    def load(self, name: str, max_age: Optional[float] = None):
+        with self._lock:
+            # 等待锁期间数据可能已被其他线程刷新
+            entry = self._entries.get(name)
+            limit = self.ttl_for(name) if max_age is None else max_age
+            if entry is not None and time.monotonic() - entry.loaded_at <= limit:
+                return entry.value
+
+            value = self._loaders[name]()
+            self._entries[name] = _Entry(value, time.monotonic())
+            return value
+
+    def invalidate(self, name: Optional[str] = None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    @contextlib.contextmanager
+    def mutation(self):
+        """交易类操作期间持有锁，结束后数据失效"""
+        with self._lock:
+            try:
+                yield
+            finally:
+                self.invalidate()
+
+    def _revalidate_async(self, name: str):
+        if name in self._revalidating:
+            return
+        self._revalidating.add(name)
+        if self._submit is not None:
+            self._submit(self._revalidate, name)
+            return
+        thread = threading.Thread(target=self._revalidate, args=(name,))
+        thread.daemon = True
+        thread.start()
+
+    def _revalidate(self, name: str):
+        try:
+            self._reload(name)
+        # pylint: disable=broad-except
+        except Exception:
+            logger.exception("后台刷新 %s 失败", name)
+        finally:
+            self._revalidating.discard(name)
+
+    def _reload(self, name: str):
+        with self._lock:
+            value = self._loaders[name]()
+            self._entries[name] = _Entry(value, time.monotonic())
+
+    def start_refresh_ahead(self, interval: float, ratio: float = 0.8):
+        """
+        启动后台刷新线程，客户端空闲时提前刷新即将过期的数据
+        :param interval: 检查间隔，单位为秒
+        :param ratio: 数据时长超过 ttl * ratio 时刷新
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_ahead_worker, args=(interval, ratio)
+        )
+        self._refresh_thread.daemon = True
+        self._refresh_thread.start()
+
+    def stop_refresh_ahead(self):
+        self._refresh_stop.set()
+
+    def _refresh_ahead_worker(self, interval: float, ratio: float):
+        while not self._refresh_stop.wait(interval):
+            for name in self._due_names(ratio):
+                if self._refresh_stop.is_set():
+                    break
+                # 每项单独提交，其间可以执行优先级更高的请求，等待完成后再提交下一项
+                try:
+                    if self._submit is None:
+                        refreshed = self._refresh_one(name)
+                    else:
+                        refreshed = self._submit(self._refresh_one, name).result()
+                # pylint: disable=broad-except
+                except Exception:
+                    logger.exception("提交后台刷新失败")
+                    break
+                if not refreshed:
+                    break
+
+    def _due_names(self, ratio: float) -> List[str]:
+        now = time.monotonic()
+        return [
+            name
+            for name, entry in list(self._entries.items())
+            if now - entry.loaded_at >= self.ttl_for(name) * ratio
+        ]
+
+    def _refresh_one(self, name: str) -> bool:
+        """
+        :return: 客户端正在被其他操作使用时不刷新并返回 False，调用方跳过本轮刷新
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._reload(name)
+        # pylint: disable=broad-except
+        except Exception:
+            logger.exception("后台刷新 %s 失败", name)
+        finally:
+            self._lock.release()
+        return True
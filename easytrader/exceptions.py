@@ -9,3 +9,23 @@ class NotLoginError(Exception):
     def __init__(self, result=None):
         super(NotLoginError, self).__init__()
         self.result = result
+
+
+class RequestExpiredError(Exception):
+    pass
+
+
+class PreTradeRejected(TradeError):
+    """委托未通过下单前检查，没有提交到客户端"""
+
+    def __init__(self, decision):
+        super(PreTradeRejected, self).__init__(
+            "{} {} {}@{}: {}".format(
+                decision.side,
+                decision.security,
+                decision.amount,
+                decision.price,
+                decision.reason,
+            )
+        )
+        self.decision = decision
@@ -0,0 +1,1114 @@
+# -*- coding: utf-8 -*-
+"""
+模拟 网上股票交易系统5.0 客户端的进程内 pywinauto 对象模型
+
+在没有 Windows 客户端的环境（例如 Linux CI）中运行真实的 ClientTrader 代码路径::
+
+    >>> from easytrader import fake_client
+    >>> client = fake_client.install()  # 必须在导入 easytrader.clienttrader 之前调用
+    >>> client.set_position('162411', 1000, cost=0.5)
+    >>> import easytrader
+    >>> user = easytrader.use('ths')
+    >>> user.connect(client.exe_path)
+    >>> user.buy('162411', 0.55, 100)
+    {'entrust_no': '100001'}
+
+控件 id 来自 config/client.py，可以通过 latency 为各操作注入耗时
+"""
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+import types
+from typing import Dict, List, Optional
+
+from .config import client as client_config
+
+# 左侧菜单路径 -> 页面
+MENU_PAGES = {
+    ("买入[F1]",): "buy",
+    ("卖出[F2]",): "sell",
+    ("撤单[F3]",): "cancel",
+    ("查询[F4]",): "query",
+    ("查询[F4]", "资金股票"): "balance",
+    ("查询[F4]", "当日委托"): "today_entrusts",
+    ("查询[F4]", "当日成交"): "today_trades",
+    ("市价委托", "买入"): "market_buy",
+    ("市价委托", "卖出"): "market_sell",
+    ("债券回购", "融资回购（正回购）"): "repo",
+    ("债券回购", "融劵回购（逆回购）"): "reverse_repo",
+    ("新股申购", "批量新股申购"): "ipo",
+}
+
+# 下单页面 -> 委托中的 操作 字段
+ORDER_PAGES = {
+    "buy": "买入",
+    "sell": "卖出",
+    "market_buy": "买入",
+    "market_sell": "卖出",
+    "repo": "融资回购",
+    "reverse_repo": "融券回购",
+}
+
+POSITION_COLUMNS = ["证券代码", "证券名称", "股票余额", "可用余额", "冻结数量", "成本价", "市价", "盈亏", "市值"]
+ENTRUST_COLUMNS = [
+    "委托时间", "证券代码", "证券名称", "操作", "备注", "委托数量",
+    "成交数量", "委托价格", "成交均价", "合同编号",
+]
+TRADE_COLUMNS = ["成交时间", "证券代码", "证券名称", "操作", "成交数量", "成交均价", "成交金额", "合同编号", "成交编号"]
+IPO_COLUMNS = ["证券代码", "证券名称", "申购价格", "申购数量"]
+
+OPEN_STATUSES = ("已报", "部成")
+
+EXCHANGE_TYPES = ["深圳Ａ股", "上海Ａ股"]
+MARKET_TRADE_TYPES = ["对手方最优价格", "本方最优价格", "即时成交剩余撤销", "最优五档即时成交剩余撤销", "全额成交或撤销"]
+
+# 证券名称控件，客户端配置默认不使用该控件，需要时设置 TRADE_SECURITY_NAME_CONTROL_ID
+SECURITY_NAME_CONTROL_ID = 1036
+
+WS_MINIMIZE = 0x20000000
+WM_COMMAND = 0x0111
+# 表格右键菜单 复制 对应的命令
+COPY_COMMAND = 0xE122
+
+_KEY_PATTERN = re.compile(r"[\^%+]*(?:\{[^}]+\}|.)")
+
+# 所有窗口、控件的句柄
+_handles: Dict[int, "FakeControl"] = {}
+_handle_counter = itertools.count(0x10000)
+# 已安装的客户端: 规范化后的 exe 路径 -> FakeClient
+_clients: Dict[str, "FakeClient"] = {}
+# 最近连接的客户端，剪切板和键盘输入作用于该客户端
+_active: List["FakeClient"] = []
+
+
+class ElementNotFoundError(Exception):
+    """对应 pywinauto.findwindows.ElementNotFoundError"""
+
+
+class TimeoutError(Exception):  # pylint: disable=redefined-builtin
+    """对应 pywinauto.timings.TimeoutError"""
+
+
+class ProcessNotFoundError(Exception):
+    """对应 pywinauto.application.ProcessNotFoundError"""
+
+
+def _normalize_path(path):
+    return os.path.normcase(os.path.normpath(path or ""))
+
+
+def _split_keys(keys):
+    return _KEY_PATTERN.findall(keys)
+
+
+class FakeControl:
+    """控件及顶层窗口，同时充当 pywinauto 的 wrapper"""
+
+    def __init__(
+        self,
+        client: "FakeClient",
+        class_name: str,
+        control_id: Optional[int] = None,
+        text="",
+        parent: Optional["FakeControl"] = None,
+        pages=None,
+    ):
+        """
+        :param text: 文本或返回文本的函数
+        :param pages: 控件只在这些页面显示，None 表示总是显示
+        """
+        self.client = client
+        self.class_name = class_name
+        self.control_id = control_id
+        self._text = text
+        self.parent = parent
+        self.pages = pages
+        self.children: List[FakeControl] = []
+        self.hidden = False
+        self.appear_at = 0.0
+        self.handle = next(_handle_counter)
+        _handles[self.handle] = self
+        if parent is not None:
+            parent.children.append(self)
+
+    def __repr__(self):
+        return "<{} {} {} {!r}>".format(
+            type(self).__name__, self.class_name, self.control_id, self.window_text()
+        )
+
+    # pywinauto wrapper 接口
+    def wrapper_object(self):
+        return self
+
+    def window_text(self):
+        text = self._text() if callable(self._text) else self._text
+        return "" if text is None else str(text)
+
+    def texts(self):
+        return [self.window_text()]
+
+    def is_visible(self):
+        control = self
+        while control is not None:
+            if control.hidden or control.handle not in _handles:
+                return False
+            if control.appear_at > time.monotonic():
+                return False
+            if control.pages is not None and self.client.page not in control.pages:
+                return False
+            control = control.parent
+        return True
+
+    def is_enabled(self):
+        if self.class_name == "CVirtualGridCtrl" and self.client.is_refreshing():
+            return False
+        return self.is_visible()
+
+    def exists(self, timeout=None, retry_interval=None):
+        return self.is_visible()
+
+    def wait(self, wait_for=None, timeout=None, retry_interval=None):
+        if not self.is_visible():
+            raise TimeoutError("{!r} not {}".format(self, wait_for))
+        return self
+
+    def has_style(self, style):
+        return False
+
+    def set_focus(self):
+        self.client.focus = self
+        return self
+
+    def select(self, item=None):
+        return self
+
+    def click(self, button="left", coords=(None, None), **kwargs):
+        self.client.on_click(self, coords, double=False)
+        return self
+
+    def click_input(self, button="left", coords=(None, None), **kwargs):
+        if button == "right":
+            return self
+        return self.click(button=button, coords=coords)
+
+    def double_click_input(self, button="left", coords=(None, None), **kwargs):
+        self.client.on_click(self, coords, double=True)
+        return self
+
+    def type_keys(self, keys, set_foreground=True, **kwargs):
+        for key in _split_keys(keys):
+            self.client.on_key(self, key)
+        return self
+
+    def post_message(self, message, wparam=0, lparam=0):
+        self.client.on_message(self, message, wparam, lparam)
+        return True
+
+    def close(self):
+        self.client.close_window(self)
+
+    def menu_item(self, path, exact=False):
+        return FakeMenuItem(self, path)
+
+    def capture_as_image(self, rect=None):
+        raise NotImplementedError("模拟客户端不支持截图")
+
+    # 子控件查找
+    def descendants(self):
+        for child in self.children:
+            yield child
+            for descendant in child.descendants():
+                yield descendant
+
+    def child_window(self, **criteria):
+        return FakeSpec(self, criteria)
+
+    window = child_window
+    ChildWindow = child_window
+
+    def __getitem__(self, name):
+        return FakeSpec(self, {"best_match": name})
+
+    def __getattr__(self, name):
+        # Static / Edit1 / Button2 等 best match 属性访问
+        if name[:1].isupper():
+            return FakeSpec(self, {"best_match": name})
+        raise AttributeError(name)
+
+
+class FakeEdit(FakeControl):
+    def __init__(self, client, control_id, parent, pages=None, on_change=None):
+        super(FakeEdit, self).__init__(client, "Edit", control_id, "", parent, pages)
+        self.on_change = on_change
+
+    def set_text(self, text):
+        self.client.delay("set_text")
+        self._text = "" if text is None else str(text)
+        if self.on_change is not None:
+            self.on_change(self._text)
+
+    def set_edit_text(self, text, pos_start=None, pos_end=None):
+        self.set_text(text)
+        return self
+
+    def type_keys(self, keys, set_foreground=True, **kwargs):
+        text = self.window_text()
+        for key in _split_keys(keys):
+            if key == "{BACKSPACE}":
+                text = text[:-1]
+            elif key == "{ENTER}":
+                self.client.on_key(self.client.top_window(), key)
+            elif not key.startswith("{") and key[:1] not in "^%+":
+                text += key
+        self.set_text(text)
+        return self
+
+
+class FakeComboBox(FakeControl):
+    def __init__(self, client, control_id, parent, items, pages=None):
+        super(FakeComboBox, self).__init__(client, "ComboBox", control_id, "", parent, pages)
+        self.items = list(items)
+        self.selected = 0
+
+    def window_text(self):
+        return self.items[self.selected] if self.items else ""
+
+    def texts(self):
+        # 与 pywinauto 一致，第一项为当前选中的文本
+        return [self.window_text()] + list(self.items)
+
+    def item_texts(self):
+        return list(self.items)
+
+    def selected_text(self):
+        return self.window_text()
+
+    def select(self, item=None):
+        if isinstance(item, int):
+            self.selected = item
+        elif item is not None:
+            self.selected = self.items.index(item)
+        return self
+
+
+class FakeTreeItem:
+    def __init__(self, tree, path):
+        self.tree = tree
+        self.path = tuple(path)
+
+    def select(self):
+        self.tree.client.switch_page(self.path)
+        return self
+
+    def collapse(self):
+        return self
+
+    def text(self):
+        return self.path[-1]
+
+
+class FakeTreeView(FakeControl):
+    def __init__(self, client, parent):
+        super(FakeTreeView, self).__init__(client, "SysTreeView32", 129, "", parent)
+
+    def get_item(self, path, exact=False):
+        path = tuple(path)
+        if path not in MENU_PAGES:
+            raise IndexError("菜单不存在: {}".format(path))
+        return FakeTreeItem(self, path)
+
+    def roots(self):
+        return [FakeTreeItem(self, (path[0],)) for path in MENU_PAGES if len(path) == 1]
+
+
+class FakeToolbar(FakeControl):
+    def __init__(self, client, parent):
+        super(FakeToolbar, self).__init__(client, "ToolbarWindow32", None, "", parent)
+
+    def button(self, index):
+        return FakeToolbarButton(self.client, index)
+
+
+class FakeToolbarButton:
+    def __init__(self, client, index):
+        self.client = client
+        self.index = index
+
+    def click(self):
+        self.client.refresh()
+
+
+class FakeMenuItem:
+    def __init__(self, window, path):
+        self.window = window
+        self.path = path
+
+    def click_input(self):
+        if self.path == "复制":
+            self.window.client.copy_grid()
+
+    click = click_input
+
+
+class FakeSpec:
+    """对应 pywinauto 的 WindowSpecification，每次使用时重新查找控件"""
+
+    def __init__(self, parent, criteria):
+        self._parent = parent
+        self._criteria = criteria
+
+    def _parent_control(self):
+        parent = self._parent
+        if isinstance(parent, FakeSpec):
+            return parent.wrapper_object()
+        if parent is None:
+            return None
+        return parent
+
+    def wrapper_object(self):
+        parent = self._parent_control()
+        if parent is None:
+            candidates = self._criteria["client"].top_windows()
+        else:
+            candidates = list(parent.descendants())
+        control = _match(candidates, self._criteria)
+        if control is None:
+            raise ElementNotFoundError(self._criteria)
+        return control
+
+    def exists(self, timeout=None, retry_interval=None):
+        try:
+            self.wrapper_object()
+            return True
+        except ElementNotFoundError:
+            return False
+
+    def wait(self, wait_for=None, timeout=None, retry_interval=None):
+        try:
+            return self.wrapper_object()
+        except ElementNotFoundError:
+            raise TimeoutError("{} not {}".format(self._criteria, wait_for))
+
+    def child_window(self, **criteria):
+        return FakeSpec(self, criteria)
+
+    window = child_window
+    ChildWindow = child_window
+
+    def __getitem__(self, name):
+        return FakeSpec(self, {"best_match": name})
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if hasattr(FakeControl, name) or name in ("handle", "items", "texts"):
+            return getattr(self.wrapper_object(), name)
+        if name[:1].isupper():
+            return FakeSpec(self, {"best_match": name})
+        return getattr(self.wrapper_object(), name)
+
+
+def _match(candidates, criteria):
+    candidates = [c for c in candidates if c.is_visible()]
+    if "handle" in criteria:
+        control = _handles.get(criteria["handle"])
+        return control if control in candidates else None
+    for key, attr in (("class_name", "class_name"), ("control_id", "control_id")):
+        if criteria.get(key) is not None:
+            candidates = [c for c in candidates if getattr(c, attr) == criteria[key]]
+    if criteria.get("title") is not None:
+        candidates = [c for c in candidates if c.window_text() == criteria["title"]]
+    if criteria.get("title_re") is not None:
+        pattern = re.compile(criteria["title_re"])
+        candidates = [c for c in candidates if pattern.match(c.window_text())]
+    best_match = criteria.get("best_match")
+    if best_match is not None:
+        return _best_match(candidates, best_match)
+    return candidates[0] if candidates else None
+
+
+def _best_match(candidates, name):
+    for control in candidates:
+        if control.window_text().replace("&", "") == name.replace("&", ""):
+            return control
+    matched = re.match(r"^([A-Za-z]+)(\d*)$", name)
+    if matched:
+        class_name, index = matched.group(1), int(matched.group(2) or 1)
+        if class_name == "Dialog":
+            class_name = "#32770"
+        same_class = [c for c in candidates if c.class_name == class_name]
+        if same_class:
+            return same_class[max(index, 1) - 1] if len(same_class) >= index else None
+    for control in candidates:
+        if name in control.window_text():
+            return control
+    return None
+
+
+class FakeDialog(FakeControl):
+    """#32770 弹窗，标题写在 POP_DIALOD_TITLE_CONTROL_ID 控件中"""
+
+    def __init__(self, client, title, content, buttons, on_button=None):
+        super(FakeDialog, self).__init__(client, "#32770", None, "")
+        self.title = title
+        self.on_button = on_button
+        FakeControl(client, "Static", 1004, content, self)
+        FakeControl(client, "Static", client.config.POP_DIALOD_TITLE_CONTROL_ID, title, self)
+        for i, text in enumerate(buttons):
+            FakeControl(client, "Button", 6 + i, text, self)
+
+    def press(self, button_text):
+        self.client.close_window(self)
+        if self.on_button is not None:
+            self.on_button(button_text)
+
+
+class FakeClient:
+    """
+    模拟客户端状态: 页面、弹窗、剪切板以及委托簿
+    """
+
+    def __init__(
+        self,
+        broker: str = "ths",
+        exe_path: str = r"C:\fake\xiadan.exe",
+        cash: float = 1000000.0,
+        latency: Optional[Dict[str, float]] = None,
+        confirm_dialog: bool = True,
+        fill_on_submit: bool = False,
+        securities: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param broker: 使用的控件配置，同 config.client.create 的参数
+        :param exe_path: connect 时使用的客户端路径
+        :param cash: 初始资金
+        :param latency: 各操作注入的耗时，单位为秒，可选 connect / switch_menu / refresh / set_text /
+            click / copy / submit / cancel / dialog（弹窗延迟出现）/ security_name（证券名称延迟显示）
+        :param confirm_dialog: 下单时是否弹出 委托确认
+        :param fill_on_submit: 委托提交后是否立即全部成交
+        :param securities: 证券代码 -> 证券名称
+        """
+        self.config = client_config.create(broker)
+        self.exe_path = exe_path
+        self.latency = dict(latency or {})
+        self.confirm_dialog = confirm_dialog
+        self.fill_on_submit = fill_on_submit
+        self.securities = dict(securities or {})
+        self.prices: Dict[str, float] = {}
+        self.ipo: List[Dict] = []
+
+        self.cash = cash
+        self.positions: Dict[str, Dict] = {}
+        self.entrusts: List[Dict] = []
+        self.trades: List[Dict] = []
+        self._entrust_no = itertools.count(100001)
+        self._trade_no = itertools.count(900001)
+        self._rejections: List[str] = []
+        self._warnings: List[str] = []
+
+        self.page = None
+        self.refreshing_until = 0.0
+        self.clipboard = ""
+        self.focus = None
+        self.counters: Dict[str, int] = {}
+        self._dialogs: List[FakeDialog] = []
+        self._name_ready_at = 0.0
+        self._lock = threading.RLock()
+        self._build_main_window()
+
+    # 状态设置
+    def set_position(self, security, amount, cost, price=None, available=None):
+        with self._lock:
+            self.positions[security] = {
+                "amount": int(amount),
+                "available": int(amount if available is None else available),
+                "frozen": 0,
+                "cost": float(cost),
+            }
+            self.prices[security] = float(cost if price is None else price)
+
+    def set_price(self, security, price):
+        self.prices[security] = float(price)
+
+    def reject_next_order(self, message="委托失败"):
+        """下一笔委托以 提示 弹窗 message 被拒绝"""
+        self._rejections.append(message)
+
+    def warn_next_order(self, message):
+        """下一笔委托先弹出 提示信息 弹窗 message，选择 是 后继续下单"""
+        self._warnings.append(message)
+
+    def delay(self, operation):
+        self.counters[operation] = self.counters.get(operation, 0) + 1
+        seconds = self.latency.get(operation)
+        if seconds:
+            time.sleep(seconds)
+
+    def security_name(self, security):
+        return self.securities.get(security, "证券{}".format(security))
+
+    # 窗口
+    def _build_main_window(self):
+        config = self.config
+        main = self.main = FakeControl(self, "Afx:400000:8", None, config.TITLE)
+        FakeToolbar(self, main)
+        FakeTreeView(self, main)
+        FakeControl(self, "CVirtualGridCtrl", config.COMMON_GRID_CONTROL_ID, "", main)
+
+        trade_pages = set(ORDER_PAGES)
+        limit_pages = {"buy", "sell", "repo", "reverse_repo"}
+        market_pages = {"market_buy", "market_sell"}
+        self.security_edit = FakeEdit(
+            self, config.TRADE_SECURITY_CONTROL_ID, main, trade_pages, self._on_security_change
+        )
+        FakeControl(
+            self, "Static", SECURITY_NAME_CONTROL_ID, self._security_name_text,
+            main, trade_pages,
+        )
+        self.price_edit = FakeEdit(self, config.TRADE_PRICE_CONTROL_ID, main, limit_pages | market_pages)
+        self.amount_edit = FakeEdit(self, config.TRADE_AMOUNT_CONTROL_ID, main, trade_pages)
+        self.exchange_combo = FakeComboBox(
+            self, config.TRADE_STOCK_EXCHANGE_CONTROL_ID, main, EXCHANGE_TYPES, limit_pages
+        )
+        FakeComboBox(self, config.TRADE_MARKET_TYPE_CONTROL_ID, main, MARKET_TRADE_TYPES, market_pages)
+        FakeControl(self, "Button", config.TRADE_SUBMIT_CONTROL_ID, "确定", main, trade_pages | {"ipo"})
+        FakeControl(
+            self, "Button", config.TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID, "全撤(Z /)", main, {"cancel"}
+        )
+        FakeControl(self, "Button", config.AUTO_IPO_SELECT_ALL_BUTTON_CONTROL_ID, "全选", main, {"ipo"})
+        for key, control_id in config.BALANCE_CONTROL_ID_GROUP.items():
+            FakeControl(
+                self, "Static", control_id, lambda key=key: "{:.2f}".format(self.balance()[key]),
+                main, {"balance"},
+            )
+
+    def top_windows(self):
+        return [self.main] + [d for d in self._dialogs if d.is_visible()]
+
+    def top_window(self):
+        for dialog in reversed(self._dialogs):
+            if dialog.is_visible():
+                return dialog
+        return self.main
+
+    def open_dialog(self, title, content, buttons=("确定",), on_button=None):
+        dialog = FakeDialog(self, title, content, buttons, on_button)
+        delay = self.latency.get("dialog")
+        if delay:
+            dialog.appear_at = time.monotonic() + delay
+        self._dialogs.append(dialog)
+        return dialog
+
+    def close_window(self, window):
+        if window is self.main:
+            return
+        if window in self._dialogs:
+            self._dialogs.remove(window)
+        for control in [window] + list(window.descendants()):
+            _handles.pop(control.handle, None)
+
+    # 事件
+    def switch_page(self, path):
+        self.delay("switch_menu")
+        self.page = MENU_PAGES[tuple(path)]
+
+    def refresh(self):
+        # 刷新期间 grid 不可用，latency["refresh"] 为异步加载数据的时长
+        self.counters["refresh"] = self.counters.get("refresh", 0) + 1
+        self.refreshing_until = time.monotonic() + self.latency.get("refresh", 0)
+
+    def is_refreshing(self):
+        return time.monotonic() < self.refreshing_until
+
+    def on_click(self, control, coords, double):
+        self.delay("click")
+        if isinstance(control, FakeDialog) or control.class_name != "Button":
+            if control.class_name == "CVirtualGridCtrl" and double and self.page == "cancel":
+                self._cancel_by_coords(coords)
+            return
+        parent = control.parent
+        if isinstance(parent, FakeDialog):
+            parent.press(control.window_text())
+        elif control.control_id == self.config.TRADE_SUBMIT_CONTROL_ID and self.page in ORDER_PAGES:
+            self._submit()
+        elif control.control_id == self.config.TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID:
+            self.open_dialog(
+                "撤单确认", "您确定要撤销全部委托吗？", ("是(Y)", "否(N)"),
+                lambda button: self._cancel_all() if "(Y)" in button else None,
+            )
+
+    def on_key(self, control, key):
+        window = control
+        while window.parent is not None:
+            window = window.parent
+        if isinstance(window, FakeDialog):
+            if key.startswith("%"):
+                letter = key.strip("%{}").upper()
+                for child in window.children:
+                    if child.class_name == "Button" and "({})".format(letter) in child.window_text():
+                        window.press(child.window_text())
+                        return
+                if letter == "S" and window.title == "另存为":
+                    self._save_grid(window)
+            elif key == "{ENTER}":
+                buttons = [c for c in window.children if c.class_name == "Button"]
+                if buttons:
+                    window.press(buttons[0].window_text())
+            return
+        if key == "{F5}":
+            self.refresh()
+        elif key == "^s" and control.class_name == "CVirtualGridCtrl":
+            dialog = self.open_dialog("另存为", "", ("保存(&S)", "取消"))
+            FakeEdit(self, 1148, dialog)
+
+    def on_message(self, control, message, wparam, lparam):
+        if message == WM_COMMAND and wparam == COPY_COMMAND:
+            self.copy_grid()
+
+    def _on_security_change(self, text):
+        delay = self.latency.get("security_name")
+        self._name_ready_at = time.monotonic() + delay if delay else 0.0
+
+    def _security_name_text(self):
+        code = self.security_edit.window_text()[-6:]
+        if len(code) != 6 or time.monotonic() < self._name_ready_at:
+            return ""
+        return self.security_name(code)
+
+    # 表格
+    def grid_text(self, page=None):
+        rows, columns = self.grid_rows(page or self.page)
+        lines = ["\t".join(columns)]
+        for row in rows:
+            lines.append("\t".join(_format_cell(row.get(column, "")) for column in columns))
+        return "\n".join(lines) + "\n"
+
+    def grid_rows(self, page):
+        with self._lock:
+            if page in ("balance", "buy", "sell", "market_buy", "market_sell"):
+                return self.position_rows(), POSITION_COLUMNS
+            if page == "today_entrusts":
+                return [dict(e) for e in self.entrusts], ENTRUST_COLUMNS
+            if page == "cancel":
+                return self.open_entrusts(), ENTRUST_COLUMNS
+            if page == "today_trades":
+                return [dict(t) for t in self.trades], TRADE_COLUMNS
+            if page == "ipo":
+                return [dict(i) for i in self.ipo], IPO_COLUMNS
+            return [], POSITION_COLUMNS
+
+    def copy_grid(self):
+        self.delay("copy")
+        self.clipboard = self.grid_text()
+
+    def _save_grid(self, dialog):
+        path = [c for c in dialog.children if c.class_name == "Edit"][0].window_text()
+        self.delay("copy")
+        with open(path, "w", encoding="gbk", errors="replace") as f:
+            f.write(self.grid_text())
+        self.close_window(dialog)
+
+    # 委托簿
+    def position_rows(self):
+        rows = []
+        for security, position in self.positions.items():
+            price = self.prices.get(security, position["cost"])
+            rows.append(
+                {
+                    "证券代码": security,
+                    "证券名称": self.security_name(security),
+                    "股票余额": position["amount"],
+                    "可用余额": position["available"],
+                    "冻结数量": position["frozen"],
+                    "成本价": position["cost"],
+                    "市价": price,
+                    "盈亏": (price - position["cost"]) * position["amount"],
+                    "市值": price * position["amount"],
+                }
+            )
+        return rows
+
+    def open_entrusts(self):
+        return [dict(e) for e in self.entrusts if e["备注"] in OPEN_STATUSES]
+
+    def balance(self):
+        with self._lock:
+            frozen = sum(
+                (e["委托数量"] - e["成交数量"]) * e["委托价格"]
+                for e in self.entrusts
+                if e["操作"] == "买入" and e["备注"] in OPEN_STATUSES
+            )
+            positions = self.position_rows()
+            market_value = sum(p["市值"] for p in positions)
+            return {
+                "资金余额": self.cash,
+                "冻结金额": frozen,
+                "可用金额": self.cash - frozen,
+                "可取金额": self.cash - frozen,
+                "股票市值": market_value,
+                "总资产": self.cash + market_value,
+                "持仓盈亏": sum(p["盈亏"] for p in positions),
+                "当日盈亏": 0.0,
+                "当日盈亏比": 0.0,
+            }
+
+    def _submit(self):
+        self.delay("submit")
+        side = ORDER_PAGES[self.page]
+        security = self.security_edit.window_text()[-6:]
+        try:
+            price = float(self.price_edit.window_text() or self.prices.get(security, 0))
+            amount = int(float(self.amount_edit.window_text() or 0))
+        except ValueError:
+            self.open_dialog("提示", "委托价格或数量输入错误")
+            return
+
+        def place(button="是(Y)"):
+            if "(Y)" not in button:
+                return
+            error = self._check_order(side, security, price, amount)
+            if error is not None:
+                self.open_dialog("提示", error)
+                return
+            entrust_no = self.place_order(side, security, price, amount)
+            self.open_dialog("提示", "您的{}委托已成功提交，合同编号：{}。".format(side, entrust_no))
+
+        def confirm(button="是(Y)"):
+            if "(Y)" not in button:
+                return
+            if self.confirm_dialog:
+                self.open_dialog(
+                    "委托确认",
+                    "{} {} {} 价格 {} 数量 {}".format(side, security, self.security_name(security), price, amount),
+                    ("是(Y)", "否(N)"),
+                    place,
+                )
+            else:
+                place()
+
+        if self._warnings:
+            self.open_dialog("提示信息", self._warnings.pop(0), ("是(Y)", "否(N)"), confirm)
+        else:
+            confirm()
+
+    def _check_order(self, side, security, price, amount):
+        if self._rejections:
+            return self._rejections.pop(0)
+        if len(security) != 6 or not security.isdigit():
+            return "证券代码输入错误"
+        if amount <= 0:
+            return "委托数量必须大于0"
+        if side == "买入":
+            if amount % 100:
+                return "委托数量必须是100的整数倍"
+            if price * amount > self.balance()["可用金额"]:
+                return "可用资金不足"
+        if side == "卖出":
+            available = self.positions.get(security, {}).get("available", 0)
+            if amount > available:
+                return "可用股份数不足"
+        return None
+
+    def place_order(self, side, security, price, amount):
+        """直接向委托簿添加委托，不经过界面"""
+        with self._lock:
+            entrust_no = str(next(self._entrust_no))
+            self.entrusts.append(
+                {
+                    "委托时间": time.strftime("%H:%M:%S"),
+                    "证券代码": security,
+                    "证券名称": self.security_name(security),
+                    "操作": side,
+                    "备注": "已报",
+                    "委托数量": amount,
+                    "成交数量": 0,
+                    "委托价格": price,
+                    "成交均价": 0.0,
+                    "合同编号": entrust_no,
+                }
+            )
+            if side == "卖出":
+                position = self.positions[security]
+                position["available"] -= amount
+                position["frozen"] += amount
+        if self.fill_on_submit:
+            self.fill(entrust_no)
+        return entrust_no
+
+    def entrust(self, entrust_no):
+        for entrust in self.entrusts:
+            if entrust["合同编号"] == str(entrust_no):
+                return entrust
+        raise KeyError(entrust_no)
+
+    def fill(self, entrust_no, amount=None, price=None):
+        """
+        成交委托
+        :param amount: 成交数量，默认全部剩余数量
+        :param price: 成交价格，默认委托价格
+        """
+        with self._lock:
+            entrust = self.entrust(entrust_no)
+            remaining = entrust["委托数量"] - entrust["成交数量"]
+            amount = remaining if amount is None else min(int(amount), remaining)
+            price = entrust["委托价格"] if price is None else float(price)
+            if amount <= 0 or entrust["备注"] not in OPEN_STATUSES:
+                return
+            filled = entrust["成交数量"] + amount
+            entrust["成交均价"] = (
+                entrust["成交均价"] * entrust["成交数量"] + price * amount
+            ) / filled
+            entrust["成交数量"] = filled
+            entrust["备注"] = "已成" if filled == entrust["委托数量"] else "部成"
+
+            security = entrust["证券代码"]
+            position = self.positions.setdefault(
+                security, {"amount": 0, "available": 0, "frozen": 0, "cost": price}
+            )
+            if entrust["操作"] == "买入":
+                cost = position["cost"] * position["amount"] + price * amount
+                position["amount"] += amount
+                position["cost"] = cost / position["amount"]
+                self.cash -= price * amount
+            else:
+                position["amount"] -= amount
+                position["frozen"] -= amount
+                self.cash += price * amount
+            self.prices[security] = price
+            self.trades.append(
+                {
+                    "成交时间": time.strftime("%H:%M:%S"),
+                    "证券代码": security,
+                    "证券名称": entrust["证券名称"],
+                    "操作": entrust["操作"],
+                    "成交数量": amount,
+                    "成交均价": price,
+                    "成交金额": price * amount,
+                    "合同编号": entrust["合同编号"],
+                    "成交编号": str(next(self._trade_no)),
+                }
+            )
+
+    def cancel(self, entrust_no):
+        with self._lock:
+            entrust = self.entrust(entrust_no)
+            if entrust["备注"] not in OPEN_STATUSES:
+                return False
+            entrust["备注"] = "部撤" if entrust["成交数量"] else "已撤"
+            if entrust["操作"] == "卖出":
+                remaining = entrust["委托数量"] - entrust["成交数量"]
+                position = self.positions[entrust["证券代码"]]
+                position["available"] += remaining
+                position["frozen"] -= remaining
+            return True
+
+    def _cancel_by_coords(self, coords):
+        config = self.config
+        y = coords[1] if coords and coords[1] is not None else 0
+        row = (y - config.CANCEL_ENTRUST_GRID_FIRST_ROW_HEIGHT) // config.CANCEL_ENTRUST_GRID_ROW_HEIGHT
+        entrusts = self.open_entrusts()
+        if not 0 <= row < len(entrusts):
+            return
+        entrust_no = entrusts[row]["合同编号"]
+
+        def confirm(button):
+            if "(Y)" not in button:
+                return
+            self.delay("cancel")
+            self.cancel(entrust_no)
+            self.open_dialog("提示", "您的撤单委托已成功提交，合同编号：{}。".format(entrust_no))
+
+        self.open_dialog("撤单确认", "您确定要撤销该委托吗？", ("是(Y)", "否(N)"), confirm)
+
+    def _cancel_all(self):
+        self.delay("cancel")
+        for entrust in self.open_entrusts():
+            self.cancel(entrust["合同编号"])
+        self.open_dialog("提示", "您的撤单委托已成功提交。")
+
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return "{:.3f}".format(value)
+    return str(value)
+
+
+# 模拟的 pywinauto 模块
+class FakeApplication:
+    def __init__(self, backend="win32"):
+        self.client: Optional[FakeClient] = None
+
+    def connect(self, path=None, timeout=None, **kwargs):
+        client = _clients.get(_normalize_path(path))
+        if client is None:
+            raise ProcessNotFoundError("process not found: {}".format(path))
+        client.delay("connect")
+        _active[:] = [client]
+        self.client = client
+        return self
+
+    def top_window(self):
+        return self.client.top_window()
+
+    def windows(self, class_name=None, visible_only=True, **kwargs):
+        windows = self.client.top_windows() if visible_only else [self.client.main] + list(self.client._dialogs)
+        if class_name is not None:
+            windows = [w for w in windows if w.class_name == class_name]
+        return windows
+
+    def window(self, **criteria):
+        criteria = dict(criteria, client=self.client)
+        return FakeSpec(None, criteria)
+
+    def Window_(self, best_match=None, top_level_only=True, **criteria):
+        if best_match == "Dialog":
+            return self.client.top_window()
+        return self.window(best_match=best_match, **criteria)
+
+    def kill(self, soft=False):
+        for dialog in list(self.client._dialogs):
+            self.client.close_window(dialog)
+
+
+def _find_windows(parent=None, control_id=None, class_name=None, top_level_only=True, **kwargs):
+    if parent is not None:
+        control = _handles.get(parent)
+        candidates = list(control.descendants()) if control is not None else []
+    else:
+        candidates = [c for client in _clients.values() for c in client.top_windows()]
+    criteria = {"control_id": control_id, "class_name": class_name}
+    if kwargs.get("title") is not None:
+        criteria["title"] = kwargs["title"]
+    candidates = [c for c in candidates if c.is_visible()]
+    for key in ("control_id", "class_name", "title"):
+        if criteria.get(key) is not None:
+            candidates = [
+                c for c in candidates
+                if (c.window_text() if key == "title" else getattr(c, key)) == criteria[key]
+            ]
+    return [c.handle for c in candidates]
+
+
+def _find_window(**kwargs):
+    handles = _find_windows(**kwargs)
+    if not handles:
+        raise ElementNotFoundError(kwargs)
+    return handles[0]
+
+
+def _top_client():
+    if _active:
+        return _active[0]
+    for client in _clients.values():
+        return client
+    raise RuntimeError("没有安装模拟客户端")
+
+
+def _build_modules():
+    pywinauto = types.ModuleType("pywinauto")
+    pywinauto.__path__ = []
+    pywinauto.Application = FakeApplication
+    pywinauto.fake = True
+
+    findwindows = types.ModuleType("pywinauto.findwindows")
+    findwindows.ElementNotFoundError = ElementNotFoundError
+    findwindows.find_windows = _find_windows
+    findwindows.find_window = _find_window
+
+    handleprops = types.ModuleType("pywinauto.handleprops")
+    handleprops.iswindow = lambda handle: handle in _handles
+    handleprops.isvisible = lambda handle: handle in _handles and _handles[handle].is_visible()
+    handleprops.text = lambda handle: _handles[handle].window_text() if handle in _handles else ""
+
+    timings = types.ModuleType("pywinauto.timings")
+    timings.TimeoutError = TimeoutError
+
+    application = types.ModuleType("pywinauto.application")
+    application.Application = FakeApplication
+    application.ProcessNotFoundError = ProcessNotFoundError
+
+    clipboard = types.ModuleType("pywinauto.clipboard")
+
+    def get_data(format_id=None):
+        # 与 pywinauto 一致，剪切板中没有文本时抛出异常
+        if not _top_client().clipboard:
+            raise RuntimeError("That format is not available")
+        return _top_client().clipboard
+
+    def empty_clipboard():
+        _top_client().clipboard = ""
+
+    clipboard.GetData = get_data
+    clipboard.EmptyClipboard = empty_clipboard
+
+    keyboard = types.ModuleType("pywinauto.keyboard")
+
+    def send_keys(keys, *args, **kwargs):
+        client = _top_client()
+        client.top_window().type_keys(keys)
+
+    keyboard.send_keys = send_keys
+
+    win32defines = types.ModuleType("pywinauto.win32defines")
+    win32defines.WS_MINIMIZE = WS_MINIMIZE
+    win32defines.WM_COMMAND = WM_COMMAND
+
+    win32functions = types.ModuleType("pywinauto.win32functions")
+
+    def set_foreground_window(window):
+        window.client.focus = window
+        return True
+
+    win32functions.SetForegroundWindow = set_foreground_window
+    win32functions.ShowWindow = lambda window, cmd: True
+
+    mouse = types.ModuleType("pywinauto.mouse")
+    mouse.click = lambda button="left", coords=(0, 0): None
+
+    modules = {
+        "pywinauto": pywinauto,
+        "pywinauto.findwindows": findwindows,
+        "pywinauto.handleprops": handleprops,
+        "pywinauto.timings": timings,
+        "pywinauto.application": application,
+        "pywinauto.clipboard": clipboard,
+        "pywinauto.keyboard": keyboard,
+        "pywinauto.win32defines": win32defines,
+        "pywinauto.win32functions": win32functions,
+        "pywinauto.mouse": mouse,
+    }
+    for name, module in modules.items():
+        if name != "pywinauto":
+            setattr(pywinauto, name.split(".", 1)[1], module)
+    return modules
+
+
+def install(client: Optional[FakeClient] = None, **kwargs) -> FakeClient:
+    """
+    用模拟模块替换 pywinauto 并注册模拟客户端，Application().connect(path=client.exe_path) 会连接到该客户端
+    必须在导入 easytrader.clienttrader 等客户端模块之前调用
+    :param client: 模拟客户端，默认使用 kwargs 创建
+    :return: FakeClient
+    """
+    current = sys.modules.get("pywinauto")
+    if current is None or not getattr(current, "fake", False):
+        if "easytrader.clienttrader" in sys.modules:
+            raise RuntimeError("easytrader.clienttrader 已使用真实的 pywinauto 导入")
+        sys.modules.update(_build_modules())
+    if client is None:
+        client = FakeClient(**kwargs)
+    _clients[_normalize_path(client.exe_path)] = client
+    return client
+
+
+def uninstall(client: FakeClient):
+    """注销模拟客户端"""
+    _clients.pop(_normalize_path(client.exe_path), None)
+    if client in _active:
+        _active.remove(client)
+    client.close_window(client.main)
+    for control in [client.main] + list(client.main.descendants()):
+        _handles.pop(control.handle, None)
@@ -11,7 +11,7 @@ from typing import List
 
 import requests
 
-from . import exceptions
+from . import exceptions, gui_executor
 from .log import logger
 
 
@@ -315,7 +315,21 @@ class BaseFollower(metaclass=abc.ABCMeta):
                 "entrust_prop": entrust_prop,
             }
             try:
-                response = getattr(user, trade_cmd["action"])(**args)
+                # 开启下单前检查的交易对象先在本线程检查，未通过的指令不进入 GUI 执行队列
+                checker = getattr(user, "pretrade", None)
+                if checker is not None:
+                    # pretrade 依赖 numpy，开启 enable_pretrade 后才会导入
+                    from .pretrade import SIDES
+
+                    if trade_cmd["action"] in SIDES:
+                        args["amount"] = checker.check(
+                            trade_cmd["action"],
+                            args["security"],
+                            actual_price,
+                            args["amount"],
+                            refresh=False,
+                        ).amount
+                response = gui_executor.call(user, trade_cmd["action"], **args)
             except exceptions.TradeError as e:
                 trader_name = type(user).__name__
                 err_msg = "{}: {}".format(type(e).__name__, e.args)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, List, Tuple
+
+
+class GridDiff:
+    """
+    以主键字段比较前后两次读取的 grid 记录，只返回新增和变化的行
+    """
+
+    def __init__(self, key_field: str):
+        """
+        :param key_field: 主键字段，例如 合同编号 / 成交编号
+        """
+        self.key_field = key_field
+        self._rows: Dict[str, Dict] = {}
+
+    def update(self, records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        用最新读取的记录替换上一次的快照
+        :param records: grid 记录
+        :return: (新增记录, 变化记录)
+        """
+        added, changed = [], []
+        rows = {}
+        for record in records:
+            key = record.get(self.key_field)
+            if key is None:
+                continue
+            previous = self._rows.get(key)
+            if previous is None:
+                added.append(record)
+            elif previous != record:
+                changed.append(record)
+            rows[key] = record
+        self._rows = rows
+        return added, changed
+
+    def get(self, key: str):
+        return self._rows.get(key)
+
+    def reset(self):
+        self._rows = {}
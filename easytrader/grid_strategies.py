@@ -1,17 +1,16 @@
 # -*- coding: utf-8 -*-
 import abc
-import io
 import tempfile
-from io import StringIO
 from typing import TYPE_CHECKING, Dict, List, Optional
 
-import pandas as pd
 import pywinauto.keyboard
 import pywinauto
 import pywinauto.clipboard
 
 from .log import logger
-from .utils.captcha import captcha_recognize
+from .utils import grid_parser
+from .utils.grid_parser import parse_grid
+from .utils.perf import perf_clock
 from .utils.win_gui import SetForegroundWindow, ShowWindow, win32defines
 
 if TYPE_CHECKING:
@@ -21,11 +20,12 @@ if TYPE_CHECKING:
 
 class IGridStrategy(abc.ABC):
     @abc.abstractmethod
-    def get(self, control_id: int) -> List[Dict]:
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         """
         获取 gird 数据并格式化返回
 
         :param control_id: grid 的 control id
+        :param result_format: 返回格式，可选 records / dataframe / numpy
         :return: grid 数据
         """
         pass
@@ -43,13 +43,19 @@ class BaseStrategy(IGridStrategy):
         self._trader = trader
 
     @abc.abstractmethod
-    def get(self, control_id: int) -> List[Dict]:
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         """
         :param control_id: grid 的 control id
+        :param result_format: 返回格式，可选 records / dataframe / numpy
         :return: grid 数据
         """
         pass
 
+    def _convert(self, records: Optional[List[Dict]], result_format: str):
+        return grid_parser.convert(
+            records, result_format, self._trader.config.GRID_NUMPY_DTYPE
+        )
+
     def _get_grid(self, control_id: int):
         grid = self._trader.main.child_window(
             control_id=control_id, class_name="CVirtualGridCtrl"
@@ -68,85 +74,139 @@ class BaseStrategy(IGridStrategy):
             pass
 
 
+# Copy 记录的客户端验证码状态
+CAPTCHA_UNKNOWN = "unknown"  # 尚未确定
+CAPTCHA_ABSENT = "absent"  # 复制成功过且没有出现验证码
+CAPTCHA_PRESENT = "present"  # 出现过验证码
+
+
 class Copy(BaseStrategy):
     """
     通过复制 grid 内容到剪切板再读取来获取 grid 内容
+
+    复制前清空剪切板，只有复制后剪切板为空（复制失败或内容未更新）时才检查验证码窗口，
+    不弹出验证码的客户端不需要等待验证码窗口。captcha_state 记录当前会话中客户端是否出现过验证码，
+    复制成功过且没有出现验证码 (CAPTCHA_ABSENT) 时只检查已存在的验证码窗口，随后重新复制一次
     """
 
-    _need_captcha_reg = True
+    # 读取剪切板的重试次数及间隔，已知会弹出验证码时只读取一次
+    clipboard_retries = 3
+    clipboard_retry_interval = 0.1
+    # 等待验证码窗口出现的时间，单位为秒
+    captcha_probe_timeout = 2
 
-    def get(self, control_id: int) -> List[Dict]:
+    def __init__(self):
+        super().__init__()
+        self.captcha_state = CAPTCHA_UNKNOWN
+
+    @perf_clock
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         grid = self._get_grid(control_id)
+        self._copy(grid)
+        content = self._get_clipboard_data(grid)
+        return self._convert(self._format_grid_data(content), result_format)
+
+    def _copy(self, grid):
+        """清空剪切板后通过右键菜单复制 grid 内容"""
         self._set_foreground(grid)
+        self._clear_clipboard()
         self._trader.app.top_window().click_input(button='right')
         self._trader.wait(0.2)
         self._trader.app.top_window().menu_item('复制').click_input()
         # exit()
         # grid.type_keys("^C", set_foreground=False)
-        content = self._get_clipboard_data()
-        return self._format_grid_data(content)
 
-    def _format_grid_data(self, data: str) -> List[Dict]:
+    def _format_grid_data(self, data: str) -> Optional[List[Dict]]:
+        if not data:
+            logger.warning("剪切板中没有 grid 数据")
+            return None
         try:
-            df = pd.read_csv(
-                io.StringIO(data),
-                delimiter="\t",
-                dtype=self._trader.config.GRID_DTYPE,
-                na_filter=False,
-            )
-            return df.to_dict("records")
-        except:
-            Copy._need_captcha_reg = True
-
-    def _get_clipboard_data(self) -> str:
-        Copy._need_captcha_reg = True
-        if Copy._need_captcha_reg:
-            curr_window = self._trader.app.top_window()
-            if curr_window.window(class_name="Static", title_re="验证码").exists(timeout=2):
-                file_path = "tmp.png"
-                count = 10
-                found = False
-
-                while count > 0:
-                    curr_window.Static2.capture_as_image().save(file_path)  # 保存验证码
-
-                    captcha_num = captcha_recognize(file_path).strip()  # 识别验证码
-                    captcha_num = "".join(captcha_num.split())
-                    # logger.info("验证码 结果-->" + captcha_num)
-                    if len(captcha_num) == 4:
-                        curr_window.Edit.set_focus()
-                        curr_window.Edit.click().type_keys("{RIGHT}" * 5).type_keys("{BACKSPACE}" * 5).type_keys(captcha_num)  # 模拟输入验证码
-                        self._trader.wait(0.2)
-                        pywinauto.keyboard.send_keys("{ENTER}")  # 模拟发送enter，点击确定
-                        if not curr_window.window(class_name="Static", title_re="验证码").exists(timeout=1):
-                            found = True
-                            break
-                        # try:
-                        #     logger.info('验证成功')
-                        #     result=self._trader.app.top_window().window(class_name="Static", title_re="验证码").exists(timeout=0.5)
-                        #     print('result',result)
-                        #     # print('test1',test1)
-                        # except Exception as ex:  # 窗体消失
-                        #     logger.exception(ex)
-                        #     found = True
-                        #     break
-                    count -= 1
-                    # self._trader.wait(0.1)
-                    # 验证错误，刷新验证码
-                    curr_window.window(control_id=0x965, class_name="Static").click()
-
-                if not found:
-                    curr_window.Button2.click()  # 点击取消
-            else:
-                Copy._need_captcha_reg = False
-        count = 2
-        while count > 0:
+            return parse_grid(data, self._trader.config.GRID_DTYPE)
+        # pylint: disable=broad-except
+        except Exception:
+            logger.exception("解析 grid 数据失败")
+            return None
+
+    @perf_clock
+    def _get_clipboard_data(self, grid=None) -> str:
+        retries = 1 if self.captcha_state == CAPTCHA_PRESENT else self.clipboard_retries
+        content = self._read_clipboard(retries)
+        if content:
+            if self.captcha_state == CAPTCHA_UNKNOWN:
+                self.captcha_state = CAPTCHA_ABSENT
+            return content
+
+        if self.captcha_state == CAPTCHA_ABSENT:
+            # 客户端未弹出过验证码，复制失败多为偶发，不等待验证码窗口，直接重新复制
+            if not self._handle_captcha(timeout=0) and grid is not None:
+                self._copy(grid)
+            return self._read_clipboard(self.clipboard_retries)
+
+        # 剪切板为空，检查是否弹出了验证码，输入验证码后客户端才会复制
+        if self._handle_captcha(self.captcha_probe_timeout):
+            content = self._read_clipboard(self.clipboard_retries)
+        return content
+
+    def _clear_clipboard(self):
+        try:
+            pywinauto.clipboard.EmptyClipboard()
+        # pylint: disable=broad-except
+        except Exception as e:
+            logger.debug("清空剪切板失败: %s", e)
+
+    def _read_clipboard(self, retries: int) -> str:
+        for i in range(retries):
+            if i > 0:
+                self._trader.wait(self.clipboard_retry_interval)
             try:
-                return pywinauto.clipboard.GetData()
+                content = pywinauto.clipboard.GetData()
             # pylint: disable=broad-except
             except Exception as e:
-                count -= 1
-                logger.exception("%s, 重试 ......", e)
+                # 剪切板为空时 GetData 抛出异常
+                logger.debug("读取剪切板失败: %s", e)
+                continue
+            if content:
+                return content
+        return ""
+
+    def _handle_captcha(self, timeout: float = 2) -> bool:
+        """
+        检查并输入验证码
+        :param timeout: 等待验证码窗口出现的时间，单位为秒，0 表示只检查一次
+        :return: 是否出现了验证码
+        """
+        curr_window = self._trader.app.top_window()
+        if not curr_window.window(class_name="Static", title_re="验证码").exists(timeout=timeout):
+            return False
+
+        # 验证码识别依赖 numpy，只在出现验证码时导入
+        from .utils.captcha import captcha_recognize, confirm_captcha
+
+        self.captcha_state = CAPTCHA_PRESENT
+        count = 10
+        found = False
+
+        while count > 0:
+            image = curr_window.Static2.capture_as_image()  # 截取验证码
+
+            captcha_num = captcha_recognize(image)  # 识别验证码
+            # logger.info("验证码 结果-->" + captcha_num)
+            if len(captcha_num) == 4:
+                curr_window.Edit.set_focus()
+                curr_window.Edit.click().type_keys("{RIGHT}" * 5).type_keys("{BACKSPACE}" * 5).type_keys(captcha_num)  # 模拟输入验证码
+                self._trader.wait(0.2)
+                pywinauto.keyboard.send_keys("{ENTER}")  # 模拟发送enter，点击确定
+                if not curr_window.window(class_name="Static", title_re="验证码").exists(timeout=1):
+                    confirm_captcha(image, captcha_num)
+                    found = True
+                    break
+            count -= 1
+            # 验证错误，刷新验证码
+            curr_window.window(control_id=0x965, class_name="Static").click()
+
+        if not found:
+            curr_window.Button2.click()  # 点击取消
+        return True
 
 
 class WMCopy(Copy):
@@ -154,12 +214,17 @@ class WMCopy(Copy):
     通过复制 grid 内容到剪切板再读取来获取 grid 内容
     """
 
-    def get(self, control_id: int) -> List[Dict]:
+    @perf_clock
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         grid = self._get_grid(control_id)
+        self._copy(grid)
+        content = self._get_clipboard_data(grid)
+        return self._convert(self._format_grid_data(content), result_format)
+
+    def _copy(self, grid):
+        self._clear_clipboard()
         grid.post_message(win32defines.WM_COMMAND, 0xE122, 0)
         self._trader.wait(0.1)
-        content = self._get_clipboard_data()
-        return self._format_grid_data(content)
 
 
 class Xls(BaseStrategy):
@@ -174,7 +239,8 @@ class Xls(BaseStrategy):
         super().__init__()
         self.tmp_folder = tmp_folder
 
-    def get(self, control_id: int) -> List[Dict]:
+    @perf_clock
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         grid = self._get_grid(control_id)
 
         # ctrl+s 保存 grid 内容为 xls 文件
@@ -200,16 +266,10 @@ class Xls(BaseStrategy):
             self._trader.app.top_window().Button2.click()
             self._trader.wait(0.2)
 
-        return self._format_grid_data(temp_path)
+        return self._convert(self._format_grid_data(temp_path), result_format)
 
     def _format_grid_data(self, data: str) -> List[Dict]:
         with open(data, encoding="gbk", errors="replace") as f:
             content = f.read()
 
-        df = pd.read_csv(
-            StringIO(content),
-            delimiter="\t",
-            dtype=self._trader.config.GRID_DTYPE,
-            na_filter=False,
-        )
-        return df.to_dict("records")
+        return parse_grid(content, self._trader.config.GRID_DTYPE)
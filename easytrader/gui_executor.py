@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from . import exceptions
+from .log import logger
+
+# 优先级，数值越小越先执行
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "deadline")
+
+    def __init__(self, future, fn, args, kwargs, deadline):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+
+
+class GuiExecutor:
+    """
+    单线程、带优先级的 GUI 操作执行器
+
+    pywinauto 操作同一个交易客户端不能并发，所有操作提交到唯一的执行线程中按优先级执行:
+    撤单优先，其次下单，最后查询。请求可以设置截止时间，开始执行前已过期的请求直接丢弃，
+    不会再操作客户端
+    """
+
+    def __init__(self, name: str = "easytrader-gui"):
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._worker, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        priority: int = PRIORITY_QUERY,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Future:
+        """
+        提交操作
+        :param fn: 在执行线程中调用的函数
+        :param priority: 优先级，可选 PRIORITY_CANCEL / PRIORITY_ORDER / PRIORITY_QUERY
+        :param timeout: 请求的有效时长，单位为秒，超时仍未开始执行的请求被丢弃，
+            对应的 future 抛出 RequestExpiredError
+        :return: concurrent.futures.Future
+        """
+        item = self._make_item(fn, args, kwargs, timeout)
+
+        # 执行线程内的嵌套调用直接执行，避免自己等待自己
+        if threading.current_thread() is self._thread:
+            self._run(item)
+            return item.future
+
+        self._enqueue(priority, item)
+        return item.future
+
+    def post(
+        self,
+        fn: Callable,
+        *args,
+        priority: int = PRIORITY_QUERY,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Future:
+        """
+        同 submit，但总是放入队列，执行线程内调用时也不会直接执行，
+        用于后台刷新等调用方不需要等待结果的操作。执行线程内不能等待返回的 future
+        """
+        item = self._make_item(fn, args, kwargs, timeout)
+        self._enqueue(priority, item)
+        return item.future
+
+    @staticmethod
+    def _make_item(fn, args, kwargs, timeout) -> _WorkItem:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return _WorkItem(Future(), fn, args, kwargs, deadline)
+
+    def _enqueue(self, priority: int, item: _WorkItem):
+        if self._shutdown:
+            raise RuntimeError("executor has been shut down")
+        self._queue.put((priority, next(self._sequence), item))
+
+    def is_executor_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def shutdown(self, wait: bool = True):
+        self._shutdown = True
+        # 使用最低优先级，保证已提交的请求执行完毕
+        self._queue.put((float("inf"), next(self._sequence), None))
+        if wait:
+            self._thread.join()
+
+    def _worker(self):
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                return
+            self._run(item)
+
+    @staticmethod
+    def _run(item: _WorkItem):
+        if not item.future.set_running_or_notify_cancel():
+            return
+        if item.deadline is not None and time.monotonic() > item.deadline:
+            item.future.set_exception(
+                exceptions.RequestExpiredError(
+                    "{} 在开始执行前已过期".format(getattr(item.fn, "__name__", item.fn))
+                )
+            )
+            return
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        # pylint: disable=broad-except
+        except Exception as e:
+            logger.debug("gui executor call failed", exc_info=True)
+            item.future.set_exception(e)
+        else:
+            item.future.set_result(result)
+
+
+def call(user, name: str, /, *args, **kwargs):
+    """
+    调用交易对象的方法或读取属性，支持 submit 的交易对象在 GUI 执行线程中执行并等待结果
+    :param user: 交易对象，与 name 均为仅位置参数，kwargs 中可以包含同名参数（例如 prepare 的 user）
+    :param name: 方法名或属性名
+    """
+    if callable(getattr(type(user), "submit", None)):
+        return user.submit(name, *args, **kwargs).result()
+    attr = getattr(user, name)
+    if callable(attr):
+        return attr(*args, **kwargs)
+    return attr
+
+
+def call_focused(user, name: str, /, *args, **kwargs):
+    """
+    同 call，执行前先将主窗口置于前台，两步在同一个 GUI 执行线程请求中完成
+    """
+
+    def run():
+        user._main.set_focus()
+        attr = getattr(user, name)
+        if callable(attr):
+            return attr(*args, **kwargs)
+        return attr
+
+    if callable(getattr(type(user), "submit", None)):
+        priority = user.OPERATION_PRIORITIES.get(name, PRIORITY_QUERY)
+        return user.executor.submit(run, priority=priority).result()
+    return run()
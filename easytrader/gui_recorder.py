@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+录制客户端交易对象发出的 pywinauto 调用，并在没有客户端的环境中回放
+
+录制::
+
+    >>> recorder = GuiRecorder()
+    >>> recorder.attach(user)  # user 已 connect / prepare
+    >>> user.position
+    >>> recorder.save('morning.jsonl.gz')
+
+回放（Linux 上需先 fake_client.install() 提供 pywinauto 模块）::
+
+    >>> player = GuiReplayer('morning.jsonl.gz', speed=None)
+    >>> player.attach(ClientTrader())
+    >>> user.position
+"""
+import base64
+import gzip
+import io
+import itertools
+import json
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .log import logger
+
+TRACE_VERSION = 1
+
+# 录制时替换的模块函数: (模块名, 属性名)
+MODULE_FUNCTIONS = (
+    ("pywinauto.findwindows", "find_windows"),
+    ("pywinauto.findwindows", "find_window"),
+    ("pywinauto.handleprops", "text"),
+    ("pywinauto.handleprops", "iswindow"),
+    ("pywinauto.handleprops", "isvisible"),
+    ("pywinauto.clipboard", "GetData"),
+    ("pywinauto.clipboard", "EmptyClipboard"),
+    ("pywinauto.keyboard", "send_keys"),
+    ("easytrader.grid_strategies", "SetForegroundWindow"),
+    ("easytrader.grid_strategies", "ShowWindow"),
+    ("easytrader.pop_dialog_handler", "SetForegroundWindow"),
+    ("easytrader.pop_dialog_handler", "ShowWindow"),
+)
+
+# 回放时按名称还原的异常所在模块
+EXCEPTION_MODULES = ("pywinauto.findwindows", "pywinauto.timings", "builtins")
+
+# 交易对象上被录制的 pywinauto 对象属性
+ROOT_ATTRIBUTES = ("_app", "_main", "_toolbar")
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+class ReplayError(Exception):
+    """回放时出现了录制中没有的调用"""
+
+
+def _is_image(value):
+    return type(value).__module__.startswith("PIL.") and hasattr(value, "save")
+
+
+def _call_key(args, kwargs) -> str:
+    return json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _module_function_name(module_name, attr):
+    return "{}.{}".format(module_name.rsplit(".", 1)[-1], attr)
+
+
+def _patch_module_functions(make_replacement) -> List[Tuple]:
+    patched = []
+    for module_name, attr in MODULE_FUNCTIONS:
+        module = sys.modules.get(module_name)
+        if module is None or not hasattr(module, attr):
+            continue
+        original = getattr(module, attr)
+        setattr(
+            module, attr, make_replacement(_module_function_name(module_name, attr), original)
+        )
+        patched.append((module, attr, original))
+    return patched
+
+
+def _restore_module_functions(patched):
+    for module, attr, original in patched:
+        setattr(module, attr, original)
+
+
+def _reset_trader_state(trader):
+    trader._clear_control_cache()
+    trader._invalidate_menu_state()
+    cached = getattr(type(trader)._get_left_menus_handle, "cache_clear", None)
+    if cached is not None:
+        cached()
+
+
+def _open(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class _RecordingProxy:
+    """录制对 pywinauto 对象的属性读取和方法调用"""
+
+    __slots__ = ("_recorder", "_target", "_id")
+
+    def __init__(self, recorder, target, obj_id):
+        object.__setattr__(self, "_recorder", recorder)
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_id", obj_id)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if callable(value) and hasattr(value, "__self__"):
+            return _RecordingMethod(self._recorder, self._id, name, value)
+        return self._recorder.record_attr(self._id, name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._recorder.record_call(self._id, "__call__", self._target, args, kwargs)
+
+    def __getitem__(self, key):
+        return self._recorder.record_call(
+            self._id, "__getitem__", self._target.__getitem__, (key,), {}
+        )
+
+    def __iter__(self):
+        return iter(self._recorder.record_call(self._id, "__iter__", lambda: list(self._target), (), {}))
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return "<recorded {!r}>".format(self._target)
+
+
+class _RecordingMethod:
+    __slots__ = ("_recorder", "_obj_id", "_name", "_method")
+
+    def __init__(self, recorder, obj_id, name, method):
+        self._recorder = recorder
+        self._obj_id = obj_id
+        self._name = name
+        self._method = method
+
+    def __call__(self, *args, **kwargs):
+        return self._recorder.record_call(self._obj_id, self._name, self._method, args, kwargs)
+
+
+def _unwrap(value):
+    if isinstance(value, _RecordingProxy):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _unwrap(v) for k, v in value.items()}
+    return value
+
+
+class GuiRecorder:
+    """
+    录制交易对象发出的 pywinauto 调用: 调用对象、方法、参数、返回的文本/剪切板/grid 内容以及耗时
+    """
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.roots: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._patched: List[Tuple] = []
+        self._trader = None
+
+    def attach(self, trader):
+        """开始录制，trader 需已连接客户端"""
+        self._trader = trader
+        self._start = time.monotonic()
+        for attr in ROOT_ATTRIBUTES:
+            target = getattr(trader, attr, None)
+            if target is None:
+                continue
+            obj_id = next(self._ids)
+            self.roots[attr] = obj_id
+            setattr(trader, attr, _RecordingProxy(self, target, obj_id))
+        _reset_trader_state(trader)
+
+        def make_replacement(name, original):
+            def replacement(*args, **kwargs):
+                return self.record_call(0, name, original, args, kwargs)
+
+            return replacement
+
+        self._patched = _patch_module_functions(make_replacement)
+        return self
+
+    def detach(self):
+        """停止录制并恢复交易对象"""
+        _restore_module_functions(self._patched)
+        self._patched = []
+        if self._trader is not None:
+            for attr in self.roots:
+                setattr(self._trader, attr, _unwrap(getattr(self._trader, attr)))
+            _reset_trader_state(self._trader)
+            self._trader = None
+
+    def _encode(self, value):
+        """:return: (返回给调用方的值, 写入录制文件的值)"""
+        if isinstance(value, _PRIMITIVES):
+            return value, value
+        if isinstance(value, (list, tuple)):
+            pairs = [self._encode(v) for v in value]
+            return type(value)(p[0] for p in pairs), [p[1] for p in pairs]
+        if _is_image(value):
+            buffer = io.BytesIO()
+            value.save(buffer, format="PNG")
+            return value, {"$img": base64.b64encode(buffer.getvalue()).decode("ascii")}
+        obj_id = next(self._ids)
+        encoded = {"$o": obj_id}
+        handle = vars(value).get("handle") if hasattr(value, "__dict__") else None
+        if isinstance(handle, int):
+            encoded["h"] = handle
+        return _RecordingProxy(self, value, obj_id), encoded
+
+    def _encode_args(self, value):
+        if isinstance(value, _RecordingProxy):
+            return {"$o": object.__getattribute__(value, "_id")}
+        if isinstance(value, (list, tuple)):
+            return [self._encode_args(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._encode_args(v) for k, v in value.items()}
+        if isinstance(value, _PRIMITIVES):
+            return value
+        return repr(value)
+
+    def _append(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def record_attr(self, obj_id, name, value):
+        live, encoded = self._encode(value)
+        self._append({"i": obj_id, "m": name, "k": "a", "r": encoded})
+        return live
+
+    def record_call(self, obj_id, name, function, args, kwargs):
+        event = {
+            "i": obj_id,
+            "m": name,
+            "k": "c",
+            "a": self._encode_args(list(args)),
+            "w": self._encode_args(kwargs),
+            "t": round(time.monotonic() - self._start, 6),
+        }
+        start = time.monotonic()
+        try:
+            result = function(*_unwrap(args), **_unwrap(kwargs))
+        except Exception as e:
+            event["d"] = round(time.monotonic() - start, 6)
+            event["e"] = [type(e).__name__, str(e)]
+            self._append(event)
+            raise
+        event["d"] = round(time.monotonic() - start, 6)
+        live, event["r"] = self._encode(result)
+        self._append(event)
+        return live
+
+    def save(self, path):
+        """保存录制文件，文件名以 .gz 结尾时使用 gzip 压缩"""
+        with self._lock:
+            events = list(self.events)
+        with _open(path, "w") as f:
+            header = {"version": TRACE_VERSION, "roots": self.roots, "events": len(events)}
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+class _ReplayObject:
+    __slots__ = ("_player", "_id", "_handle")
+
+    def __init__(self, player, obj_id, handle=None):
+        object.__setattr__(self, "_player", player)
+        object.__setattr__(self, "_id", obj_id)
+        object.__setattr__(self, "_handle", handle)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self._player.replay_attr(self._id, name)
+
+    def __call__(self, *args, **kwargs):
+        return self._player.replay_call(self._id, "__call__", args, kwargs)
+
+    def __getitem__(self, key):
+        return self._player.replay_call(self._id, "__getitem__", (key,), {})
+
+    def __iter__(self):
+        return iter(self._player.replay_call(self._id, "__iter__", (), {}))
+
+    def __eq__(self, other):
+        if not isinstance(other, _ReplayObject):
+            return False
+        if self._handle is not None and other._handle is not None:
+            return self._handle == other._handle
+        return self._id == other._id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._handle if self._handle is not None else self._id)
+
+    def __repr__(self):
+        return "<replayed #{} handle={}>".format(self._id, self._handle)
+
+
+class _ReplayMethod:
+    __slots__ = ("_player", "_obj_id", "_name")
+
+    def __init__(self, player, obj_id, name):
+        self._player = player
+        self._obj_id = obj_id
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        return self._player.replay_call(self._obj_id, self._name, args, kwargs)
+
+
+class _Queue:
+    """同一调用的录制结果，按顺序消费，用完后重复最后一个结果"""
+
+    __slots__ = ("events", "position")
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.position = 0
+
+    def next(self):
+        event = self.events[min(self.position, len(self.events) - 1)]
+        self.position += 1
+        return event
+
+
+class GuiReplayer:
+    """
+    回放录制文件，相同对象上相同的调用按录制顺序返回结果，轮询次数不同时重复最后一个结果
+    """
+
+    def __init__(self, path, speed: Optional[float] = None):
+        """
+        :param path: 录制文件
+        :param speed: 回放速度，1 为按录制耗时回放，2 为两倍速，None 为不等待
+        """
+        self.speed = speed
+        self.roots: Dict[str, int] = {}
+        self._calls: Dict[Tuple, _Queue] = {}
+        self._methods: Dict[Tuple, _Queue] = {}
+        self._attrs: Dict[Tuple, _Queue] = {}
+        self._patched: List[Tuple] = []
+        self._lock = threading.Lock()
+        self.calls = 0
+        self._load(path)
+
+    def _load(self, path):
+        with _open(path, "r") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != TRACE_VERSION:
+                raise ReplayError("不支持的录制文件版本: {}".format(header.get("version")))
+            self.roots = header["roots"]
+            for line in f:
+                event = json.loads(line)
+                if event["k"] == "a":
+                    self._attrs.setdefault((event["i"], event["m"]), _Queue()).events.append(event)
+                    continue
+                key = (event["i"], event["m"], _call_key(event["a"], event["w"]))
+                self._calls.setdefault(key, _Queue()).events.append(event)
+                self._methods.setdefault((event["i"], event["m"]), _Queue()).events.append(event)
+
+    def attach(self, trader):
+        """用回放对象替换 trader 的 pywinauto 对象"""
+        for attr, obj_id in self.roots.items():
+            setattr(trader, attr, _ReplayObject(self, obj_id))
+        _reset_trader_state(trader)
+        if self.speed is None:
+            trader.wait = lambda seconds: None
+        elif self.speed != 1:
+            trader.wait = lambda seconds: time.sleep(seconds / self.speed)
+
+        def make_replacement(name, original):
+            def replacement(*args, **kwargs):
+                return self.replay_call(0, name, args, kwargs)
+
+            return replacement
+
+        self._patched = _patch_module_functions(make_replacement)
+        return self
+
+    def detach(self):
+        _restore_module_functions(self._patched)
+        self._patched = []
+
+    def _decode(self, value):
+        if isinstance(value, list):
+            return [self._decode(v) for v in value]
+        if isinstance(value, dict):
+            if "$o" in value:
+                return _ReplayObject(self, value["$o"], value.get("h"))
+            if "$img" in value:
+                from PIL import Image
+
+                return Image.open(io.BytesIO(base64.b64decode(value["$img"])))
+        return value
+
+    def _encode_args(self, value):
+        if isinstance(value, _ReplayObject):
+            return {"$o": object.__getattribute__(value, "_id")}
+        if isinstance(value, (list, tuple)):
+            return [self._encode_args(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._encode_args(v) for k, v in value.items()}
+        if isinstance(value, _PRIMITIVES):
+            return value
+        return repr(value)
+
+    def replay_attr(self, obj_id, name):
+        with self._lock:
+            queue = self._attrs.get((obj_id, name))
+            if queue is not None:
+                return self._decode(queue.next()["r"])
+        if (obj_id, name) in self._methods:
+            return _ReplayMethod(self, obj_id, name)
+        raise ReplayError("录制中没有对象 #{} 的属性或方法 {}".format(obj_id, name))
+
+    def replay_call(self, obj_id, name, args, kwargs):
+        key = (obj_id, name, _call_key(self._encode_args(list(args)), self._encode_args(kwargs)))
+        with self._lock:
+            queue = self._calls.get(key)
+            if queue is None:
+                # 参数不同（例如临时文件路径），按同一方法的录制顺序回放
+                queue = self._methods.get((obj_id, name))
+            if queue is None:
+                raise ReplayError("录制中没有调用 #{}.{}{}".format(obj_id, name, key[2]))
+            event = queue.next()
+            self.calls += 1
+        if self.speed:
+            time.sleep(event.get("d", 0) / self.speed)
+        if "e" in event:
+            raise self._exception(*event["e"])
+        return self._decode(event.get("r"))
+
+    @staticmethod
+    def _exception(type_name, message):
+        for module_name in EXCEPTION_MODULES:
+            module = sys.modules.get(module_name)
+            cls = getattr(module, type_name, None) if module is not None else None
+            if isinstance(cls, type) and issubclass(cls, BaseException):
+                try:
+                    return cls(message)
+                # pylint: disable=broad-except
+                except Exception:
+                    logger.debug("无法构造异常 %s", type_name, exc_info=True)
+        return RuntimeError("{}: {}".format(type_name, message))
@@ -57,8 +57,7 @@ class HTClientTrader(clienttrader.BaseLoginClientTrader):
         self._main.wait ( "exists enabled visible ready" , timeout=100 )
         self._close_prompt_windows ( )
 
-    @property
-    def balance(self):
+    def _query_balance(self):
         self._switch_left_menus(self._config.BALANCE_MENU_PATH)
 
         return self._get_balance_from_statics()
@@ -67,9 +66,7 @@ class HTClientTrader(clienttrader.BaseLoginClientTrader):
         result = {}
         for key, control_id in self._config.BALANCE_CONTROL_ID_GROUP.items():
             result[key] = float(
-                self._main.child_window(
-                    control_id=control_id, class_name="Static"
-                ).window_text()
+                self._get_control(control_id, "Static").window_text()
             )
         return result
 
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+from .log import logger
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from . import clienttrader
+
+
+class OrderTracker:
+    """
+    后台跟踪委托状态
+
+    所有等待者共享同一个轮询线程，有未完成委托时以 fast_interval 读取当日委托，
+    没有未完成委托时线程空闲，直到有新的委托被跟踪
+    """
+
+    def __init__(
+        self,
+        trader: "clienttrader.ClientTrader",
+        fast_interval: float = 0.5,
+        slow_interval: float = 3.0,
+        slow_after: float = 60.0,
+    ):
+        """
+        :param trader: 客户端交易对象
+        :param fast_interval: 有未完成委托时的轮询间隔，单位为秒
+        :param slow_interval: 委托长时间未完成时的轮询间隔，单位为秒
+        :param slow_after: 最近一次跟踪新委托超过该时长后使用 slow_interval，单位为秒
+        """
+        self._trader = trader
+        self._config = trader.config
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.slow_after = slow_after
+
+        self._entrusts: Dict[str, Optional[Dict]] = {}
+        self._open: Set[str] = set()
+        self._last_tracked_at = 0.0
+        self._callbacks: List[Callable] = []
+        self._cond = threading.Condition()
+        self._active = False
+        self._thread: Optional[threading.Thread] = None
+
+        trader.add_change_listener(self._on_change)
+
+    def track(self, entrust_no):
+        """跟踪委托单号"""
+        entrust_no = str(entrust_no)
+        with self._cond:
+            if entrust_no not in self._entrusts:
+                # 委托可能在跟踪前已经被读取过
+                entrust = self._trader.last_entrust(entrust_no)
+                self._entrusts[entrust_no] = entrust
+                if entrust is None or not self.is_final(entrust):
+                    self._open.add(entrust_no)
+            self._last_tracked_at = time.monotonic()
+            self._cond.notify_all()
+
+    def track_result(self, result):
+        """从下单返回结果 {'entrust_no': '委托单号'} 中登记委托"""
+        if isinstance(result, dict) and result.get("entrust_no"):
+            self.track(result["entrust_no"])
+
+    def on_status_change(self, callback: Callable):
+        """
+        注册委托状态变化回调
+        :param callback: callback(entrust_no, status, entrust)
+        """
+        self._callbacks.append(callback)
+
+    def status(self, entrust_no) -> Optional[Dict]:
+        """返回委托最近一次读取到的记录，尚未读取到时返回 None"""
+        return self._entrusts.get(str(entrust_no))
+
+    def is_final(self, entrust) -> bool:
+        status = str(entrust.get(self._config.ENTRUST_STATUS_FIELD, ""))
+        return any(s in status for s in self._config.ENTRUST_FINAL_STATUSES)
+
+    def is_filled(self, entrust) -> bool:
+        status = str(entrust.get(self._config.ENTRUST_STATUS_FIELD, ""))
+        return any(s in status for s in self._config.ENTRUST_FILLED_STATUSES)
+
+    def wait_for_fill(self, entrust_no, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        等待委托进入最终状态（已成、已撤、废单等）
+        :param entrust_no: 委托单号，未被跟踪时自动跟踪
+        :param timeout: 最长等待时间，单位为秒，None 表示一直等待
+        :return: 委托最终状态的记录，超时返回 None，是否成交可用 is_filled 判断
+        """
+        entrust_no = str(entrust_no)
+        self.track(entrust_no)
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while entrust_no in self._open:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._entrusts[entrust_no]
+
+    def start(self):
+        if self._active:
+            return
+        self._active = True
+        self._thread = threading.Thread(target=self._worker)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._active = False
+            self._cond.notify_all()
+
+    def _poll_interval(self) -> float:
+        if time.monotonic() - self._last_tracked_at > self.slow_after:
+            return self.slow_interval
+        return self.fast_interval
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                # 没有未完成委托时空闲等待
+                while self._active and not self._open:
+                    self._cond.wait()
+                if not self._active:
+                    return
+                interval = self._poll_interval()
+
+            started = time.monotonic()
+            try:
+                # 读取结果通过 change listener 回调到 _on_change
+                self._trader.submit(
+                    "query", "today_entrusts", max_age=interval
+                ).result()
+            # pylint: disable=broad-except
+            except Exception:
+                logger.exception("委托状态轮询失败")
+
+            with self._cond:
+                remaining = interval - (time.monotonic() - started)
+                if self._active and remaining > 0:
+                    self._cond.wait(remaining)
+
+    def _on_change(self, name, rows):
+        if name != "today_entrusts":
+            return
+        key_field = self._config.ENTRUST_KEY_FIELD
+        changed = []
+        with self._cond:
+            for entrust in rows:
+                entrust_no = str(entrust.get(key_field))
+                if entrust_no not in self._entrusts:
+                    continue
+                self._entrusts[entrust_no] = entrust
+                if self.is_final(entrust):
+                    self._open.discard(entrust_no)
+                changed.append((entrust_no, entrust))
+            if changed:
+                self._cond.notify_all()
+
+        status_field = self._config.ENTRUST_STATUS_FIELD
+        for entrust_no, entrust in changed:
+            for callback in list(self._callbacks):
+                try:
+                    callback(entrust_no, entrust.get(status_field), entrust)
+                # pylint: disable=broad-except
+                except Exception:
+                    logger.exception("委托 %s 状态回调执行失败", entrust_no)
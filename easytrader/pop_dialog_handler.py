@@ -4,6 +4,7 @@ import time
 from typing import Optional
 
 from . import exceptions
+from . import trade_trace
 from .utils.perf import perf_clock
 from .utils.win_gui import SetForegroundWindow, ShowWindow, win32defines
 
@@ -11,6 +12,13 @@ from .utils.win_gui import SetForegroundWindow, ShowWindow, win32defines
 class PopDialogHandler:
     def __init__(self, app):
         self._app = app
+        self._dialog_handle = None
+
+    def _dialog(self):
+        """当前处理的弹窗，未指定时为 app 的顶层窗口"""
+        if self._dialog_handle is None:
+            return self._app.top_window()
+        return self._app.window(handle=self._dialog_handle)
 
     @staticmethod
     def _set_foreground(window):
@@ -20,7 +28,9 @@ class PopDialogHandler:
             SetForegroundWindow(window.wrapper_object())  # bring to front
 
     @perf_clock
-    def handle(self, title):
+    @trade_trace.step
+    def handle(self, title, window=None):
+        self._dialog_handle = None if window is None else window.handle
         if any(s in title for s in {"提示信息", "委托确认", "网上交易用户协议", "撤单确认"}):
             self._submit_by_shortcut()
             return None
@@ -35,7 +45,7 @@ class PopDialogHandler:
         return {"message": "unknown message: {}".format(content)}
 
     def _extract_content(self):
-        return self._app.top_window().Static.window_text()
+        return self._dialog().Static.window_text()
 
     @staticmethod
     def _extract_entrust_id(content):
@@ -43,23 +53,25 @@ class PopDialogHandler:
 
     def _submit_by_click(self):
         try:
-            self._app.top_window()["确定"].click()
+            self._dialog()["确定"].click()
         except Exception as ex:
             self._app.Window_(best_match="Dialog", top_level_only=True).ChildWindow(
                 best_match="确定"
             ).click()
 
     def _submit_by_shortcut(self):
-        self._set_foreground(self._app.top_window())
-        self._app.top_window().type_keys("%Y", set_foreground=False)
+        self._set_foreground(self._dialog())
+        self._dialog().type_keys("%Y", set_foreground=False)
 
     def _close(self):
-        self._app.top_window().close()
+        self._dialog().close()
 
 
 class TradePopDialogHandler(PopDialogHandler):
     @perf_clock
-    def handle(self, title) -> Optional[dict]:
+    @trade_trace.step
+    def handle(self, title, window=None) -> Optional[dict]:
+        self._dialog_handle = None if window is None else window.handle
         if title == "委托确认":
             self._submit_by_shortcut()
             return None
@@ -82,7 +94,9 @@ class TradePopDialogHandler(PopDialogHandler):
                 self._submit_by_shortcut()
                 return None
 
-            return None
+            # 未识别的提示不能自动确认，关闭弹窗后按委托失败处理，避免弹窗残留
+            self._close()
+            raise exceptions.TradeError(content)
 
         if title == "提示":
             content = self._extract_content()
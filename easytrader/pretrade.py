@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+import collections
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .exceptions import PreTradeRejected
+from .log import logger
+
+# 检查结果: amount 为检查后（clip 时可能被截断）的数量，reason 为 None 表示通过
+Decision = collections.namedtuple(
+    "Decision", ["side", "security", "price", "amount", "reason"]
+)
+
+INVALID_ORDER = "委托价格或数量无效"
+INVALID_SIDE = "不支持的交易方向"
+OUT_OF_BAND = "委托价格超出涨跌停范围"
+BAD_LOT = "委托数量不符合交易单位"
+NO_CASH = "可用资金不足"
+NO_SHARES = "可用股份数不足"
+
+SIDES = ("buy", "sell")
+
+# 科创板: 最小 200 股，以 1 股递增
+STAR_PREFIXES = ("688", "689")
+# 可转债等债券: 以 10 张为单位
+BOND_PREFIXES = ("11", "12")
+# 创业板、科创板涨跌幅限制为 20%
+WIDE_BAND_PREFIXES = ("300", "301") + STAR_PREFIXES
+
+_EPS = 1e-6
+
+
+def lot_rule(code: str):
+    """
+    :param code: 六位证券代码
+    :return: (最小委托数量, 委托数量递增单位)
+    """
+    if code.startswith(STAR_PREFIXES):
+        return 200, 1
+    if code.startswith(BOND_PREFIXES):
+        return 10, 10
+    return 100, 100
+
+
+def default_limit_ratio(code: str) -> float:
+    """涨跌幅限制比例，0 表示不检查"""
+    if code.startswith(BOND_PREFIXES):
+        return 0.0
+    if code.startswith(WIDE_BAND_PREFIXES):
+        return 0.2
+    return 0.1
+
+
+def price_band(reference: float, ratio: float):
+    """按交易所四舍五入到分的涨跌停价"""
+    return (
+        math.floor(reference * (1 - ratio) * 100 + 0.5) / 100,
+        math.floor(reference * (1 + ratio) * 100 + 0.5) / 100,
+    )
+
+
+class PreTradeChecker:
+    """
+    下单前检查，在操作客户端之前拒绝（或截断）客户端必然拒绝的委托
+
+    - 价格、数量无效，数量不符合交易单位（卖出全部可用余额时允许零股）
+    - 设置了参考价（昨收价）时，价格超出涨跌停范围
+    - 买入金额超过可用资金，卖出数量超过可用余额
+
+    资金和持仓来自缓存的账户数据，超过 snapshot_ttl 后重新读取。
+    检查通过并预留的委托在下次读取账户数据之前占用对应的资金和股份，
+    客户端读取到的可用资金和可用余额已经扣除了这些委托冻结的部分
+
+    Usage::
+
+        >>> checker = user.enable_pretrade(clip=True)
+        >>> checker.reference_prices['600000'] = 10.0
+        >>> checker.check_basket([('buy', '600000', 10.5, 1000), ('sell', '000001', 12, 300)])
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable] = None,
+        snapshot_ttl: float = 5.0,
+        clip: bool = False,
+        fee_rate: float = 0.0,
+        reference_prices: Optional[Dict[str, float]] = None,
+        limit_ratios: Optional[Dict[str, float]] = None,
+        balance_field: str = "可用金额",
+        security_field: str = "证券代码",
+        available_field: str = "可用余额",
+    ):
+        """
+        :param loader: loader() -> (balance, position)，用于读取账户数据
+        :param snapshot_ttl: 账户数据有效期，单位为秒
+        :param clip: 资金或股份不足、数量不是整手时截断数量而不是拒绝
+        :param fee_rate: 买入时按 价格 * 数量 * (1 + fee_rate) 计算所需资金
+        :param reference_prices: {六位证券代码: 参考价}，用于计算涨跌停价，未设置的证券不检查价格范围
+        :param limit_ratios: {六位证券代码: 涨跌幅比例}，覆盖默认规则，例如 ST 股票设置为 0.05
+        :param balance_field: 资金数据中可用资金的字段名
+        :param security_field: 持仓数据中证券代码的字段名
+        :param available_field: 持仓数据中可用余额的字段名
+        """
+        self.loader = loader
+        self.snapshot_ttl = snapshot_ttl
+        self.clip = clip
+        self.fee_rate = fee_rate
+        self.reference_prices = dict(reference_prices or {})
+        self.limit_ratios = dict(limit_ratios or {})
+        self.balance_field = balance_field
+        self.security_field = security_field
+        self.available_field = available_field
+
+        # None 表示没有账户数据，不检查资金或持仓
+        self._cash: Optional[float] = None
+        self._shares: Optional[Dict[str, int]] = None
+        self._reserved_cash = 0.0
+        self._reserved_shares: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def load_snapshot(self, balance: Dict, position: List[Dict]):
+        """使用客户端读取的资金和持仓替换本地数据，同时清空预留"""
+        shares: Dict[str, int] = {}
+        for row in position or []:
+            code = str(row[self.security_field])[-6:]
+            shares[code] = shares.get(code, 0) + int(float(row[self.available_field]))
+        with self._lock:
+            self._cash = float(balance[self.balance_field])
+            self._shares = shares
+            self._reserved_cash = 0.0
+            self._reserved_shares = {}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """下次检查时重新读取账户数据"""
+        with self._lock:
+            self._loaded_at = None
+
+    def refresh(self, force: bool = False):
+        """账户数据超过有效期时通过 loader 重新读取，读取失败时继续使用旧数据"""
+        if self.loader is None:
+            return
+        with self._lock:
+            if (
+                not force
+                and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at <= self.snapshot_ttl
+            ):
+                return
+            try:
+                balance, position = self.loader()
+            # pylint: disable=broad-except
+            except Exception:
+                logger.exception("下单前检查读取账户数据失败，继续使用旧数据")
+                return
+            self.load_snapshot(balance, position)
+
+    @property
+    def available_cash(self) -> Optional[float]:
+        """扣除预留后的可用资金，没有账户数据时为 None"""
+        with self._lock:
+            if self._cash is None:
+                return None
+            return self._cash - self._reserved_cash
+
+    def available_shares(self, security: str) -> Optional[int]:
+        """扣除预留后的可用余额，没有账户数据时为 None"""
+        code = security[-6:]
+        with self._lock:
+            if self._shares is None:
+                return None
+            return self._shares.get(code, 0) - self._reserved_shares.get(code, 0)
+
+    def limit_ratio(self, code: str) -> float:
+        ratio = self.limit_ratios.get(code)
+        return default_limit_ratio(code) if ratio is None else ratio
+
+    def check(
+        self,
+        side: str,
+        security: str,
+        price: float,
+        amount: int,
+        reserve: bool = False,
+        refresh: bool = True,
+    ) -> Decision:
+        """
+        检查单笔委托
+        :param side: 交易方向，可选 ['buy', 'sell']
+        :param reserve: 通过后预留资金或股份，委托提交失败时需要调用 release
+        :param refresh: 账户数据过期时是否重新读取，不在 GUI 执行线程中时应设置为 False
+        :return: Decision
+        :raises PreTradeRejected: 委托未通过检查
+        """
+        with self._lock:
+            if refresh:
+                self.refresh()
+            decision = self._evaluate(side, security, price, amount)
+            if decision.reason is not None:
+                raise PreTradeRejected(decision)
+            if reserve:
+                self._reserve(decision)
+        return decision
+
+    def _evaluate(self, side, security, price, amount) -> Decision:
+        code = security[-6:]
+
+        def reject(reason):
+            return Decision(side, security, price, amount, reason)
+
+        if side not in SIDES:
+            return reject(INVALID_SIDE)
+        if not price > 0 or not amount > 0:
+            return reject(INVALID_ORDER)
+
+        reference = self.reference_prices.get(code)
+        ratio = self.limit_ratio(code)
+        if reference and ratio:
+            low, high = price_band(reference, ratio)
+            if price < low - _EPS or price > high + _EPS:
+                return reject(OUT_OF_BAND)
+
+        minimum, step = lot_rule(code)
+        if side == "buy":
+            odd = _odd_lot_scalar(amount, minimum, step)
+            if amount < minimum or (odd and not self.clip):
+                return reject(BAD_LOT)
+            checked = amount - odd
+            cash = self.available_cash
+            unit_cost = price * (1 + self.fee_rate)
+            if cash is not None and unit_cost * checked > cash + _EPS:
+                if not self.clip:
+                    return reject(NO_CASH)
+                checked = int((cash + _EPS) / unit_cost)
+                checked -= _odd_lot_scalar(checked, minimum, step)
+                if checked < minimum:
+                    return reject(NO_CASH)
+            return Decision(side, security, price, int(checked), None)
+
+        checked = amount
+        shares = self.available_shares(code)
+        if shares is not None and checked > shares:
+            if not self.clip or shares <= 0:
+                return reject(NO_SHARES)
+            checked = shares
+        # 卖出全部可用余额时允许零股
+        if shares is None or checked != shares:
+            odd = _odd_lot_scalar(checked, minimum, step)
+            if checked < minimum or odd:
+                if not self.clip or checked < minimum:
+                    return reject(BAD_LOT)
+                checked -= odd
+        return Decision(side, security, price, int(checked), None)
+
+    def check_basket(
+        self, orders: Sequence, reserve: bool = False, refresh: bool = True
+    ) -> List[Decision]:
+        """
+        一次检查一组委托，资金和股份按委托顺序占用，
+        第一笔超出可用资金（或同一证券可用余额）的委托及其后的同类委托被拒绝，clip 时截断第一笔
+        :param orders: [(side, security, price, amount)]
+        :param reserve: 预留通过检查的委托的资金和股份
+        :return: 与 orders 顺序一致的 Decision 列表
+        """
+        if not orders:
+            return []
+        with self._lock:
+            if refresh:
+                self.refresh()
+            decisions = self._evaluate_basket(orders)
+            if reserve:
+                for decision in decisions:
+                    if decision.reason is None:
+                        self._reserve(decision)
+        return decisions
+
+    def _evaluate_basket(self, orders) -> List[Decision]:
+        n = len(orders)
+        sides = np.array([order[0] for order in orders], dtype=object)
+        securities = [order[1] for order in orders]
+        codes = np.array([security[-6:] for security in securities])
+        prices = np.array([order[2] for order in orders], dtype=float)
+        amounts = np.array([order[3] for order in orders], dtype=float)
+        reasons = np.full(n, None, dtype=object)
+        ok = np.ones(n, dtype=bool)
+
+        def reject(mask, reason):
+            reasons[mask & ok] = reason
+            ok[mask] = False
+
+        is_buy = sides == "buy"
+        is_sell = sides == "sell"
+        reject(~(is_buy | is_sell), INVALID_SIDE)
+        reject(~((prices > 0) & (amounts > 0)), INVALID_ORDER)
+
+        # 证券分类: 交易单位和涨跌幅
+        star = _startswith(codes, STAR_PREFIXES)
+        bond = _startswith(codes, BOND_PREFIXES) & ~star
+        minimum = np.where(star, 200, np.where(bond, 10, 100))
+        step = np.where(star, 1, np.where(bond, 10, 100))
+        ratios = np.where(
+            bond, 0.0, np.where(_startswith(codes, WIDE_BAND_PREFIXES), 0.2, 0.1)
+        )
+        references = np.zeros(n)
+        for i, code in enumerate(codes):
+            references[i] = self.reference_prices.get(code) or 0.0
+            if code in self.limit_ratios:
+                ratios[i] = self.limit_ratios[code]
+        high = np.floor(references * (1 + ratios) * 100 + 0.5) / 100
+        low = np.floor(references * (1 - ratios) * 100 + 0.5) / 100
+        banded = (references > 0) & (ratios > 0)
+        reject(banded & ((prices < low - _EPS) | (prices > high + _EPS)), OUT_OF_BAND)
+
+        # 买入: 整手检查后按顺序占用资金
+        odd = _odd_lot(amounts, minimum, step)
+        reject(is_buy & ((amounts < minimum) | ((odd > 0) & (not self.clip))), BAD_LOT)
+        buys = is_buy & ok
+        amounts = np.where(buys, amounts - odd, amounts)
+        cash = self.available_cash
+        if cash is not None:
+            unit_cost = prices * (1 + self.fee_rate)
+            cost = np.where(buys, unit_cost * amounts, 0.0)
+            spent = np.cumsum(cost)
+            over = buys & (spent > cash + _EPS)
+            if self.clip and over.any():
+                first = int(np.argmax(over))
+                left = cash - (spent[first] - cost[first])
+                clipped = int((left + _EPS) / unit_cost[first])
+                clipped -= _odd_lot(clipped, minimum[first], step[first])
+                if clipped >= minimum[first]:
+                    amounts[first] = clipped
+                    over[first] = False
+            reject(over, NO_CASH)
+
+        # 卖出: 同一证券按顺序占用可用余额
+        sells = is_sell & ok
+        sells_out = np.zeros(n, dtype=bool)
+        if self._shares is not None and sells.any():
+            uniques, inverse = np.unique(codes, return_inverse=True)
+            available = np.array([self.available_shares(code) for code in uniques])[
+                inverse
+            ]
+            wanted = np.where(sells, amounts, 0.0)
+            # 按证券分组的累计卖出数量
+            order = np.argsort(inverse, kind="mergesort")
+            running = np.cumsum(wanted[order])
+            starts = np.r_[0, np.flatnonzero(np.diff(inverse[order])) + 1]
+            offsets = np.repeat(
+                running[starts] - wanted[order][starts], np.diff(np.r_[starts, n])
+            )
+            sold = np.empty(n)
+            sold[order] = running - offsets
+            before = sold - wanted
+            over = sells & (sold > available)
+            if self.clip:
+                # 每个证券第一笔超出的委托截断为剩余可用余额
+                first = over & (before < available)
+                amounts = np.where(first, available - before, amounts)
+                sold = np.where(first, available, sold)
+                over &= ~first
+            reject(over, NO_SHARES)
+            sells_out = sells & ok & (sold == available)
+
+        # 卖出零股只允许在卖出全部可用余额时出现
+        sells = is_sell & ok & ~sells_out
+        odd = _odd_lot(amounts, minimum, step)
+        bad_lot = sells & ((amounts < minimum) | (odd > 0))
+        if self.clip:
+            fixable = bad_lot & (amounts >= minimum)
+            amounts = np.where(fixable, amounts - odd, amounts)
+            bad_lot &= ~fixable
+        reject(bad_lot, BAD_LOT)
+
+        return [
+            Decision(
+                orders[i][0],
+                securities[i],
+                orders[i][2],
+                int(amounts[i]) if ok[i] else orders[i][3],
+                reasons[i],
+            )
+            for i in range(n)
+        ]
+
+    def _reserve(self, decision: Decision):
+        if decision.side == "buy":
+            self._reserved_cash += decision.price * decision.amount * (1 + self.fee_rate)
+        else:
+            code = decision.security[-6:]
+            self._reserved_shares[code] = self._reserved_shares.get(code, 0) + decision.amount
+
+    def release(self, decision: Decision):
+        """委托提交失败时释放预留的资金或股份"""
+        with self._lock:
+            if decision.side == "buy":
+                self._reserved_cash = max(
+                    0.0,
+                    self._reserved_cash
+                    - decision.price * decision.amount * (1 + self.fee_rate),
+                )
+            else:
+                code = decision.security[-6:]
+                left = self._reserved_shares.get(code, 0) - decision.amount
+                if left > 0:
+                    self._reserved_shares[code] = left
+                else:
+                    self._reserved_shares.pop(code, None)
+
+
+def _odd_lot_scalar(amount, minimum, step):
+    return (amount - minimum) % step if amount >= minimum else amount
+
+
+def _odd_lot(amount, minimum, step):
+    """超出 最小委托数量 + 整数倍递增单位 的零头，不足最小委托数量时为全部数量"""
+    return np.where(amount >= minimum, np.mod(amount - minimum, step), amount)
+
+
+def _startswith(codes: np.ndarray, prefixes) -> np.ndarray:
+    result = np.zeros(len(codes), dtype=bool)
+    for prefix in prefixes:
+        result |= np.char.startswith(codes, prefix)
+    return result
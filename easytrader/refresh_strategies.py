@@ -5,13 +5,11 @@ import tempfile
 from io import StringIO
 from typing import TYPE_CHECKING, Dict, List, Optional
 
-import pandas as pd
 import pywinauto.keyboard
 import pywinauto
 import pywinauto.clipboard
 
 from .log import logger
-from .utils.captcha import captcha_recognize
 from .utils.win_gui import SetForegroundWindow, ShowWindow, win32defines
 
 if TYPE_CHECKING:
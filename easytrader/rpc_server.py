@@ -2,7 +2,7 @@ from __future__ import print_function
 from __future__ import absolute_import
 import functools
 
-from . import api
+from . import api, gui_executor
 from .log import logger
 from .rpc import RpcServer
 
@@ -56,7 +56,7 @@ class ThsRpcServer(RpcServer):
         json_data.pop('kwargs')
         user = api.use(json_data.pop("broker"), debug=False)
 
-        res = user.prepare(**json_data)
+        res = gui_executor.call(user, "prepare", **json_data)
         global_store["user"] = user
         if res:
             logger.info('rpc_server prepare执行成功')
@@ -68,8 +68,7 @@ class ThsRpcServer(RpcServer):
     @error_handle
     def balance(self, request):
         user = global_store["user"]
-        user._main.set_focus()
-        balance = user.balance
+        balance = gui_executor.call_focused(user, "balance")
 
         # print('balance',balance)
         return balance, 200
@@ -77,16 +76,14 @@ class ThsRpcServer(RpcServer):
     @error_handle
     def position(self, request):
         user = global_store["user"]
-        user._main.set_focus()
-        position = user.position
+        position = gui_executor.call_focused(user, "position")
         # print('position',position)
         return position, 200
 
     @error_handle
     def auto_ipo(self, request):
         user = global_store["user"]
-        user._main.set_focus()
-        res = user.auto_ipo()
+        res = gui_executor.call_focused(user, "auto_ipo")
 
         return res, 200
 
@@ -94,7 +91,7 @@ class ThsRpcServer(RpcServer):
     def today_entrusts(self, request):
         user = global_store["user"]
         # user.main().set_focus()
-        today_entrusts = user.today_entrusts
+        today_entrusts = gui_executor.call(user, "today_entrusts")
 
         return today_entrusts, 200
 
@@ -102,7 +99,7 @@ class ThsRpcServer(RpcServer):
     def today_trades(self, request):
         user = global_store["user"]
         # user.main().set_focus()
-        today_trades = user.today_trades
+        today_trades = gui_executor.call(user, "today_trades")
 
         return today_trades, 200
 
@@ -110,7 +107,7 @@ class ThsRpcServer(RpcServer):
     def cancel_entrusts(self, request):
         user = global_store["user"]
         # user.main().set_focus()
-        cancel_entrusts = user.cancel_entrusts
+        cancel_entrusts = gui_executor.call(user, "cancel_entrusts")
 
         return cancel_entrusts, 200
 
@@ -120,7 +117,7 @@ class ThsRpcServer(RpcServer):
         json_data = request
         user = global_store["user"]
         # user.main().set_focus()
-        res = user.buy(**json_data)
+        res = gui_executor.call(user, "buy", **json_data)
 
         return res, 201
 
@@ -131,7 +128,7 @@ class ThsRpcServer(RpcServer):
 
         user = global_store["user"]
         # user.main().set_focus()
-        res = user.sell(**json_data)
+        res = gui_executor.call(user, "sell", **json_data)
 
         return res, 201
 
@@ -142,7 +139,7 @@ class ThsRpcServer(RpcServer):
 
         user = global_store["user"]
         # user.main().set_focus()
-        res = user.cancel_entrust(**json_data)
+        res = gui_executor.call(user, "cancel_entrust", **json_data)
 
         return res, 201
 
@@ -150,7 +147,7 @@ class ThsRpcServer(RpcServer):
     def exit(self, request):
         user = global_store["user"]
         # user.main().set_focus()
-        user.exit()
+        gui_executor.call(user, "exit")
 
         return {"msg": "exit success"}, 200
 
@@ -159,7 +156,7 @@ class ThsRpcServer(RpcServer):
         json_data = request
         user = global_store["user"]
         # user.main().set_focus()
-        data = user.hangqing(**json_data)
+        data = gui_executor.call(user, "hangqing", **json_data)
 
         return data, 200
 
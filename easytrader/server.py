@@ -1,7 +1,7 @@
 import functools
 from flask import Flask, jsonify, request
 
-from . import api
+from . import api, gui_executor
 from .log import logger
 import sys, os
 
@@ -42,7 +42,7 @@ def post_prepare():
     # print('root_path',root_path)
     # user.grid_strategy_instance.tmp_folder = root_path()
 
-    user.prepare(**json_data)
+    gui_executor.call(user, "prepare", **json_data)
 
     global_store["user"] = user
     return jsonify({"msg": "login success"}), 201
@@ -52,7 +52,7 @@ def post_prepare():
 @error_handle
 def get_balance():
     user = global_store["user"]
-    balance = user.balance
+    balance = gui_executor.call(user, "balance")
 
     return jsonify(balance), 200
 
@@ -61,7 +61,7 @@ def get_balance():
 @error_handle
 def get_position():
     user = global_store["user"]
-    position = user.position
+    position = gui_executor.call(user, "position")
 
     return jsonify(position), 200
 
@@ -70,7 +70,7 @@ def get_position():
 @error_handle
 def get_auto_ipo():
     user = global_store["user"]
-    res = user.auto_ipo()
+    res = gui_executor.call(user, "auto_ipo")
 
     return jsonify(res), 200
 
@@ -79,7 +79,7 @@ def get_auto_ipo():
 @error_handle
 def get_today_entrusts():
     user = global_store["user"]
-    today_entrusts = user.today_entrusts
+    today_entrusts = gui_executor.call(user, "today_entrusts")
 
     return jsonify(today_entrusts), 200
 
@@ -88,7 +88,7 @@ def get_today_entrusts():
 @error_handle
 def get_today_trades():
     user = global_store["user"]
-    today_trades = user.today_trades
+    today_trades = gui_executor.call(user, "today_trades")
 
     return jsonify(today_trades), 200
 
@@ -97,7 +97,7 @@ def get_today_trades():
 @error_handle
 def get_cancel_entrusts():
     user = global_store["user"]
-    cancel_entrusts = user.cancel_entrusts
+    cancel_entrusts = gui_executor.call(user, "cancel_entrusts")
 
     return jsonify(cancel_entrusts), 200
 
@@ -107,7 +107,7 @@ def get_cancel_entrusts():
 def post_buy():
     json_data = request.get_json(force=True)
     user = global_store["user"]
-    res = user.buy(**json_data)
+    res = gui_executor.call(user, "buy", **json_data)
 
     return jsonify(res), 201
 
@@ -118,7 +118,7 @@ def post_sell():
     json_data = request.get_json(force=True)
 
     user = global_store["user"]
-    res = user.sell(**json_data)
+    res = gui_executor.call(user, "sell", **json_data)
 
     return jsonify(res), 201
 
@@ -129,7 +129,7 @@ def post_cancel_entrust():
     json_data = request.get_json(force=True)
 
     user = global_store["user"]
-    res = user.cancel_entrust(**json_data)
+    res = gui_executor.call(user, "cancel_entrust", **json_data)
 
     return jsonify(res), 201
 
@@ -138,7 +138,7 @@ def post_cancel_entrust():
 @error_handle
 def get_exit():
     user = global_store["user"]
-    user.exit()
+    gui_executor.call(user, "exit")
 
     return jsonify({"msg": "exit success"}), 200
 
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import collections
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .log import logger
+from .trader_pool import TraderSession
+
+# 可以安全重放的只读操作
+IDEMPOTENT_OPERATIONS = frozenset(
+    [
+        "balance",
+        "position",
+        "today_entrusts",
+        "today_trades",
+        "cancel_entrusts",
+        "snapshot",
+        "query",
+    ]
+)
+
+# 各操作默认的截止时间，单位为秒
+DEFAULT_DEADLINES = {
+    "start": 60.0,
+    "balance": 10.0,
+    "position": 15.0,
+    "today_entrusts": 15.0,
+    "today_trades": 15.0,
+    "cancel_entrusts": 15.0,
+    "snapshot": 40.0,
+    "buy": 10.0,
+    "sell": 10.0,
+    "cancel_entrust": 15.0,
+}
+
+
+class SupervisedSession(TraderSession):
+    """
+    带看门狗的交易会话
+
+    每个操作都有截止时间，子进程中的操作超过截止时间未返回（客户端卡死、出现无法识别的弹窗等）时，
+    子进程会先把所有线程的调用栈写入 trace 文件，随后被主进程杀掉并重新 connect(exe_path)。
+    超时的只读操作在会话重启后自动重放一次，其余操作抛出 TimeoutError，避免重复下单
+
+    Usage::
+
+        >>> session = SupervisedSession('a', 'ths', exe_path=r'C:\\a\\xiadan.exe')
+        >>> session.start()
+        >>> session.call('position')
+        >>> session.stats()
+    """
+
+    def __init__(
+        self,
+        account: str,
+        broker: str,
+        exe_path: Optional[str] = None,
+        deadlines: Optional[Dict[str, float]] = None,
+        default_deadline: float = 30.0,
+        grace: float = 1.0,
+        max_restarts: Optional[int] = None,
+        max_stuck_records: int = 100,
+        **prepare_kwargs
+    ):
+        """
+        :param account: 账户标识
+        :param broker: 同 easytrader.use 的 broker 参数
+        :param exe_path: 设置后使用 connect(exe_path) 连接已登录的客户端，否则使用 prepare_kwargs 登录
+        :param deadlines: 各操作的截止时间，单位为秒，覆盖 DEFAULT_DEADLINES
+        :param default_deadline: 未设置截止时间的操作使用的截止时间，单位为秒
+        :param grace: 截止时间之后等待调用栈写入的时间，单位为秒
+        :param max_restarts: 最大重启次数，None 表示不限制
+        :param max_stuck_records: 保留的超时操作记录数
+        """
+        if exe_path is not None:
+            prepare_kwargs.setdefault("connect", True)
+            prepare_kwargs["exe_path"] = exe_path
+        super(SupervisedSession, self).__init__(account, broker, **prepare_kwargs)
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))
+        self.default_deadline = default_deadline
+        self.grace = grace
+        self.max_restarts = max_restarts
+        self.restart_count = 0
+        self.stuck_operations: Deque[Dict[str, Any]] = collections.deque(
+            maxlen=max_stuck_records
+        )
+
+        fd, self.trace_path = tempfile.mkstemp(
+            prefix="easytrader-{}-".format(account), suffix=".trace"
+        )
+        os.close(fd)
+        self._started = False
+        self._restart_lock = threading.Lock()
+        # 当前请求 (操作名, args, kwargs, 发送时间)
+        self._inflight: Optional[Tuple[str, tuple, dict, float]] = None
+
+    def deadline_for(self, name: str) -> float:
+        return self.deadlines.get(name, self.default_deadline)
+
+    def start(self):
+        self._start_watched()
+        self._started = True
+
+    def _start_watched(self):
+        """连接或登录超过截止时间时记录子进程调用栈并抛出 TimeoutError"""
+        self.start_timeout = self.deadline_for("start")
+        started_at = time.time()
+        try:
+            super(SupervisedSession, self).start(
+                timeout=self.start_timeout + self.grace
+            )
+        except TimeoutError as e:
+            self._record_stuck("start", (), {}, started_at, e)
+            raise
+
+    def restart(self):
+        """杀掉子进程并重新连接客户端"""
+        with self._restart_lock:
+            if self.max_restarts is not None and self.restart_count >= self.max_restarts:
+                raise RuntimeError(
+                    "{} 重启次数已达上限 {}".format(self.account, self.max_restarts)
+                )
+            self.stop()
+            self.restart_count += 1
+            logger.warning("会话 %s 第 %s 次重启", self.account, self.restart_count)
+            self._start_watched()
+
+    def send(self, name: str, *args, **kwargs):
+        if self._started and not self.is_alive():
+            self.restart()
+        self._inflight = (name, args, kwargs, time.time())
+        try:
+            self.send_request(name, args, kwargs, self.deadline_for(name))
+        except (OSError, EOFError):
+            # 子进程已退出
+            self.restart()
+            self.send_request(name, args, kwargs, self.deadline_for(name))
+
+    def receive(self, name: str, timeout: Optional[float] = None, replay: bool = True):
+        if self._inflight is None:
+            raise RuntimeError("{} 没有等待结果的请求".format(self.account))
+        _, args, kwargs, started_at = self._inflight
+        if timeout is None:
+            timeout = self.deadline_for(name) + self.grace
+        try:
+            return super(SupervisedSession, self).receive(name, timeout)
+        except (TimeoutError, EOFError, OSError) as e:
+            self._record_stuck(name, args, kwargs, started_at, e)
+            self.restart()
+            if replay and name in IDEMPOTENT_OPERATIONS:
+                logger.warning("会话 %s 重放操作 %s", self.account, name)
+                self.send(name, *args, **kwargs)
+                return self.receive(name, replay=False)
+            raise
+
+    def _record_stuck(self, name, args, kwargs, started_at, error):
+        try:
+            with open(self.trace_path, encoding="utf-8", errors="replace") as f:
+                trace = f.read()
+        except OSError:
+            trace = ""
+        record = {
+            "name": name,
+            "args": args,
+            "kwargs": kwargs,
+            "started_at": started_at,
+            "elapsed": time.time() - started_at,
+            "deadline": self.deadline_for(name),
+            "error": repr(error),
+            "trace": trace,
+        }
+        self.stuck_operations.append(record)
+        logger.error(
+            "会话 %s 操作 %s 超过 %s 秒未完成，调用栈:\n%s",
+            self.account,
+            name,
+            record["deadline"],
+            trace,
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "account": self.account,
+            "alive": self.is_alive(),
+            "restart_count": self.restart_count,
+            "stuck_count": len(self.stuck_operations),
+            "last_stuck": self.stuck_operations[-1] if self.stuck_operations else None,
+        }
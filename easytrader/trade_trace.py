@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .log import logger
+
+_local = threading.local()
+
+
+class Span:
+    """下单过程中的一个步骤"""
+
+    __slots__ = ("name", "start", "end", "dialogs", "error")
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.dialogs: List[str] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "dialogs": list(self.dialogs),
+            "error": self.error,
+        }
+
+
+class TradeTrace:
+    """
+    单笔委托的耗时记录，每个步骤一个 span，弹窗标题同时记录在所在步骤和整笔委托上
+    """
+
+    def __init__(self, action: str, order: Optional[Dict] = None):
+        """
+        :param action: 操作名，例如 buy / sell / market_buy
+        :param order: 委托参数，例如 {'security': '162411', 'price': 0.55, 'amount': 100}
+        """
+        self.action = action
+        self.order = dict(order or {})
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.dialogs: List[str] = []
+        self.error: Optional[str] = None
+        self._stack: List[Span] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        span = Span(name, time.time())
+        self.spans.append(span)
+        self._stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = "{}: {}".format(type(e).__name__, e)
+            raise
+        finally:
+            span.end = time.time()
+            self._stack.pop()
+
+    def add_dialog(self, title: str):
+        self.dialogs.append(title)
+        if self._stack:
+            self._stack[-1].dialogs.append(title)
+
+    def to_dict(self) -> Dict:
+        return {
+            "action": self.action,
+            "order": dict(self.order),
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "dialogs": list(self.dialogs),
+            "error": self.error,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+def current() -> Optional[TradeTrace]:
+    """当前线程正在记录的委托，没有时返回 None"""
+    return getattr(_local, "trace", None)
+
+
+@contextlib.contextmanager
+def record(action: str, sink: Optional[Callable] = None, order: Optional[Dict] = None):
+    """
+    在当前线程开始记录一笔委托，结束后交给 sink 处理，已在记录中时直接复用外层记录
+    :param action: 操作名
+    :param sink: sink(trace)，在委托结束（包括异常）后调用
+    :param order: 委托参数
+    """
+    trace = current()
+    if trace is not None:
+        with trace.span(action):
+            yield trace
+        return
+
+    trace = _local.trace = TradeTrace(action, order)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.error = "{}: {}".format(type(e).__name__, e)
+        raise
+    finally:
+        trace.end = time.time()
+        _local.trace = None
+        if sink is not None:
+            try:
+                sink(trace)
+            # pylint: disable=broad-except
+            except Exception:
+                logger.exception("委托耗时记录 sink 执行失败")
+
+
+def step(f):
+    """
+    将函数记录为当前委托的一个步骤，步骤名为函数的 __qualname__，
+    没有正在记录的委托时不做任何处理
+    """
+    name = getattr(f, "__qualname__", f.__name__)
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        trace = current()
+        if trace is None:
+            return f(*args, **kwargs)
+        with trace.span(name):
+            return f(*args, **kwargs)
+
+    return wrapper
+
+
+def add_dialog(title: str):
+    """在当前委托上记录弹窗标题"""
+    trace = current()
+    if trace is not None:
+        trace.add_dialog(title)
+
+
+class TraceCollector:
+    """保存最近的委托记录，可以直接作为 sink 使用"""
+
+    def __init__(self, maxlen: Optional[int] = 1000):
+        self.maxlen = maxlen
+        self.traces: List[TradeTrace] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, trace: TradeTrace):
+        with self._lock:
+            self.traces.append(trace)
+            if self.maxlen is not None and len(self.traces) > self.maxlen:
+                del self.traces[: len(self.traces) - self.maxlen]
+
+    def aggregate(self) -> Dict[str, Dict]:
+        with self._lock:
+            traces = list(self.traces)
+        return aggregate(traces)
+
+    def clear(self):
+        with self._lock:
+            self.traces = []
+
+
+def _percentile(values: List[float], q: float) -> float:
+    index = min(len(values) - 1, max(0, math.ceil(q / 100.0 * len(values)) - 1))
+    return values[index]
+
+
+def aggregate(traces: Iterable) -> Dict[str, Dict]:
+    """
+    按步骤汇总委托耗时
+    :param traces: TradeTrace 或 TradeTrace.to_dict() 的结果
+    :return: {步骤名: {count, total, mean, p50, p95, max, dialogs}}，单位为秒，
+        "total" 步骤为整笔委托的耗时，dialogs 为该步骤中出现过的弹窗标题及次数
+    """
+    durations: Dict[str, List[float]] = {}
+    dialogs: Dict[str, Dict[str, int]] = {}
+    for trace in traces:
+        if isinstance(trace, TradeTrace):
+            trace = trace.to_dict()
+        durations.setdefault("total", []).append(trace["duration"])
+        for span in trace["spans"]:
+            durations.setdefault(span["name"], []).append(span["duration"])
+            counter = dialogs.setdefault(span["name"], {})
+            for title in span["dialogs"]:
+                counter[title] = counter.get(title, 0) + 1
+
+    table = {}
+    for name, values in durations.items():
+        values.sort()
+        table[name] = {
+            "count": len(values),
+            "total": sum(values),
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "max": values[-1],
+            "dialogs": dialogs.get(name, {}),
+        }
+    return table
+
+
+def format_table(table: Dict[str, Dict]) -> str:
+    """将 aggregate 的结果按总耗时从高到低格式化为文本表格，单位为毫秒"""
+    lines = [
+        "{:<32} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "step", "count", "mean", "p50", "p95", "max"
+        )
+    ]
+    for name, row in sorted(table.items(), key=lambda item: -item[1]["total"]):
+        lines.append(
+            "{:<32} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                name,
+                row["count"],
+                row["mean"] * 1000,
+                row["p50"] * 1000,
+                row["p95"] * 1000,
+                row["max"] * 1000,
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+import faulthandler
+import multiprocessing
+import threading
+import time
+import traceback
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterable, List, Optional
+
+from .log import logger
+
+# 汇总持仓时求和的数量、市值类字段
+POSITION_SUM_FIELDS = (
+    "股票余额",
+    "可用余额",
+    "冻结数量",
+    "实际数量",
+    "市值",
+    "参考市值",
+    "盈亏",
+    "参考盈亏",
+)
+
+
+class RemoteCallError(Exception):
+    """子进程中执行操作时抛出的异常"""
+
+    def __init__(self, account, name, remote_traceback):
+        super(RemoteCallError, self).__init__(
+            "{} {}: {}".format(account, name, remote_traceback)
+        )
+        self.account = account
+        self.name = name
+        self.remote_traceback = remote_traceback
+
+
+def _resolve(user, name, args, kwargs):
+    attr = getattr(user, name)
+    if callable(attr):
+        return attr(*args, **kwargs)
+    return attr
+
+
+def session_worker(
+    conn,
+    broker: str,
+    prepare_kwargs: Dict,
+    trace_path: Optional[str] = None,
+    start_deadline: Optional[float] = None,
+):
+    """
+    子进程入口，登录客户端后循环执行主进程发送的 (name, args, kwargs, deadline)
+    :param trace_path: 设置后操作超过 deadline 秒仍未完成时，将所有线程的调用栈写入该文件
+    :param start_deadline: 连接或登录的截止时间，超过后同样将调用栈写入 trace_path
+    """
+    from . import api
+
+    trace_file = open(trace_path, "w") if trace_path else None
+    if trace_file is not None and start_deadline:
+        faulthandler.dump_traceback_later(start_deadline, file=trace_file)
+    try:
+        user = api.use(broker)
+        if prepare_kwargs.get("connect"):
+            user.connect(prepare_kwargs.get("exe_path"))
+        else:
+            user.prepare(**prepare_kwargs)
+    # pylint: disable=broad-except
+    except Exception:
+        conn.send((False, traceback.format_exc()))
+        return
+    finally:
+        if trace_file is not None and start_deadline:
+            faulthandler.cancel_dump_traceback_later()
+    conn.send((True, None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        name, args, kwargs, deadline = request
+        if trace_file is not None and deadline:
+            trace_file.seek(0)
+            trace_file.truncate()
+            faulthandler.dump_traceback_later(deadline, file=trace_file)
+        try:
+            conn.send((True, _resolve(user, name, args, kwargs)))
+        # pylint: disable=broad-except
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+        finally:
+            if trace_file is not None and deadline:
+                faulthandler.cancel_dump_traceback_later()
+
+
+class TraderSession:
+    """运行在独立子进程中的单个客户端交易会话"""
+
+    def __init__(self, account: str, broker: str, **prepare_kwargs):
+        """
+        :param account: 账户标识
+        :param broker: 同 easytrader.use 的 broker 参数
+        :param prepare_kwargs: 登录参数，同 prepare，设置 connect=True 时改为
+            connect(exe_path) 直接连接已登录的客户端
+        """
+        self.account = account
+        self.broker = broker
+        self.prepare_kwargs = prepare_kwargs
+        self.trace_path: Optional[str] = None
+        # 连接或登录的超时时间，单位为秒，None 表示一直等待
+        self.start_timeout: Optional[float] = 60.0
+        self._conn: Optional[Connection] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._lock = threading.Lock()
+
+    def start(self, timeout: Optional[float] = None):
+        """
+        启动子进程并等待连接或登录完成
+        :param timeout: 等待时间，单位为秒，默认使用 start_timeout，超时后结束子进程并抛出 TimeoutError
+        """
+        if timeout is None:
+            timeout = self.start_timeout
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=session_worker,
+            args=(
+                child_conn,
+                self.broker,
+                self.prepare_kwargs,
+                self.trace_path,
+                self.start_timeout,
+            ),
+            name="easytrader-{}".format(self.account),
+        )
+        self._process.daemon = True
+        self._process.start()
+        self._conn = parent_conn
+
+        if not parent_conn.poll(timeout):
+            # 子进程卡在连接或登录中，不会再读取请求，直接结束
+            self._process.terminate()
+            self._process.join(1)
+            self._process = None
+            raise TimeoutError("{} 启动超时".format(self.account))
+        ok, error = parent_conn.recv()
+        if not ok:
+            self.stop()
+            raise RemoteCallError(self.account, "prepare", error)
+
+    def send(self, name: str, *args, **kwargs):
+        """发送请求，需与 receive 成对调用"""
+        self.send_request(name, args, kwargs)
+
+    def send_request(self, name: str, args, kwargs, deadline: Optional[float] = None):
+        self._lock.acquire()
+        try:
+            self._connection().send((name, args, kwargs, deadline))
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def receive(self, name: str, timeout: Optional[float] = None):
+        try:
+            conn = self._connection()
+            if not conn.poll(timeout):
+                # 超时后子进程状态未知，迟到的结果也会打乱后续请求，直接结束会话
+                self.stop()
+                raise TimeoutError("{} {} 超时".format(self.account, name))
+            ok, result = conn.recv()
+        finally:
+            self._lock.release()
+        if not ok:
+            raise RemoteCallError(self.account, name, result)
+        return result
+
+    def call(self, name: str, *args, timeout: Optional[float] = None, **kwargs):
+        self.send(name, *args, **kwargs)
+        return self.receive(name, timeout)
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def _connection(self) -> Connection:
+        if self._conn is None:
+            raise RuntimeError("{} 会话未启动".format(self.account))
+        return self._conn
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            if self._conn is not None:
+                self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+
+class TraderPool:
+    """
+    多账户会话池，每个账户的客户端交易对象运行在独立的子进程中，
+    同一操作可以并行发送到所有账户
+
+    Usage::
+
+        >>> pool = TraderPool()
+        >>> pool.add('a', 'ths', connect=True, exe_path=r'C:\\a\\xiadan.exe')
+        >>> pool.add('b', 'ths', connect=True, exe_path=r'C:\\b\\xiadan.exe')
+        >>> pool.start()
+        >>> pool.map('position')
+        >>> pool.total_assets()
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, TraderSession] = {}
+
+    def add(self, account: str, broker: str, **prepare_kwargs) -> TraderSession:
+        session = TraderSession(account, broker, **prepare_kwargs)
+        self._sessions[account] = session
+        return session
+
+    def add_session(self, session) -> None:
+        self._sessions[session.account] = session
+
+    @property
+    def accounts(self) -> List[str]:
+        return list(self._sessions)
+
+    def session(self, account: str):
+        return self._sessions[account]
+
+    def start(self):
+        """
+        并行启动所有会话，启动失败的会话从池中移除
+        :return: {账户: 异常}，启动失败的账户
+        """
+        errors = self._parallel(
+            {account: session.start for account, session in self._sessions.items()}
+        )
+        failed = {k: v for k, v in errors.items() if isinstance(v, Exception)}
+        if failed:
+            logger.error("会话启动失败，已从会话池移除: %s", failed)
+        for account in failed:
+            self._sessions.pop(account).stop()
+        return failed
+
+    def stop(self):
+        for session in self._sessions.values():
+            session.stop()
+
+    def call(self, account: str, name: str, *args, **kwargs):
+        """在指定账户上执行操作"""
+        session = self._sessions[account]
+        try:
+            return session.call(name, *args, **kwargs)
+        except TimeoutError:
+            self._drop_if_dead(account, session)
+            raise
+
+    def map(
+        self,
+        name: str,
+        *args,
+        accounts: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        在所有（或指定）账户上并行执行同一操作
+        :param timeout: 等待所有账户返回的总时长，单位为秒
+        :return: {账户: 结果}，失败的账户结果为对应的异常对象
+        """
+        accounts = list(self._sessions if accounts is None else accounts)
+        sent = {}
+        results: Dict[str, Any] = {}
+        for account in accounts:
+            try:
+                self._sessions[account].send(name, *args, **kwargs)
+                sent[account] = self._sessions[account]
+            # pylint: disable=broad-except
+            except Exception as e:
+                results[account] = e
+        deadline = self._deadline(timeout)
+        for account, session in sent.items():
+            results[account] = self._receive(account, session, name, deadline)
+        return {account: results[account] for account in accounts}
+
+    def submit_all(
+        self, orders_by_account: Dict[str, List], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        各账户并行批量下单
+        :param orders_by_account: {账户: [(side, security, price, amount)]}
+        :param timeout: 等待所有账户返回的总时长，单位为秒
+        :return: {账户: submit_orders 的结果列表}，失败的账户结果为对应的异常对象
+        """
+        results = {}
+        for account in orders_by_account:
+            try:
+                self._sessions[account].send("submit_orders", orders_by_account[account])
+            # pylint: disable=broad-except
+            except Exception as e:
+                results[account] = e
+        deadline = self._deadline(timeout)
+        for account in orders_by_account:
+            if account in results:
+                continue
+            results[account] = self._receive(
+                account, self._sessions[account], "submit_orders", deadline
+            )
+        return results
+
+    def snapshot(self, parts=None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """并行读取所有账户的 snapshot"""
+        if parts is None:
+            return self.map("snapshot", timeout=timeout)
+        return self.map("snapshot", parts, timeout=timeout)
+
+    def total_assets(
+        self, field: str = "总资产", timeout: Optional[float] = None
+    ) -> float:
+        """并行读取所有账户的资金并汇总总资产，读取失败的账户会被跳过并记录日志"""
+        total = 0.0
+        for account, balance in self.map("balance", timeout=timeout).items():
+            if isinstance(balance, Exception):
+                logger.error("账户 %s 读取资金失败: %s", account, balance)
+                continue
+            if isinstance(balance, list):
+                balance = balance[0] if balance else {}
+            total += float(balance.get(field, 0))
+        return total
+
+    def aggregate_positions(
+        self,
+        key_field: str = "证券代码",
+        sum_fields: Iterable[str] = POSITION_SUM_FIELDS,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Dict]:
+        """
+        并行读取所有账户的持仓，按证券代码合并，sum_fields 中的字段求和，
+        其余字段保留首次出现的值
+        :return: {证券代码: 合并后的持仓}
+        """
+        sum_fields = set(sum_fields)
+        merged: Dict[str, Dict] = {}
+        for account, positions in self.map("position", timeout=timeout).items():
+            if isinstance(positions, Exception):
+                logger.error("账户 %s 读取持仓失败: %s", account, positions)
+                continue
+            for position in positions or []:
+                key = position.get(key_field)
+                target = merged.get(key)
+                if target is None:
+                    merged[key] = dict(position)
+                    continue
+                for field, value in position.items():
+                    if field not in sum_fields:
+                        continue
+                    if isinstance(value, (int, float)) and isinstance(
+                        target.get(field), (int, float)
+                    ):
+                        target[field] = target[field] + value
+        return merged
+
+    def _receive(self, account: str, session, name: str, deadline: Optional[float]):
+        """:return: 结果，失败时返回对应的异常对象"""
+        try:
+            return session.receive(name, self._remaining(deadline))
+        except TimeoutError as e:
+            self._drop_if_dead(account, session)
+            return e
+        # pylint: disable=broad-except
+        except Exception as e:
+            return e
+
+    def _drop_if_dead(self, account: str, session):
+        """超时后已被结束（且未重启）的会话从池中移除，需要时重新 add 并 start"""
+        if not session.is_alive() and self._sessions.get(account) is session:
+            logger.error("会话 %s 超时后已结束，已从会话池移除", account)
+            del self._sessions[account]
+
+    @staticmethod
+    def _deadline(timeout: Optional[float]) -> Optional[float]:
+        return None if timeout is None else time.monotonic() + timeout
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """所有账户共用一个截止时间，每个账户只等待剩余的时间"""
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    @staticmethod
+    def _parallel(calls: Dict[str, Any]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+
+        def run(key, fn):
+            try:
+                results[key] = fn()
+            # pylint: disable=broad-except
+            except Exception as e:
+                results[key] = e
+
+        threads = [
+            threading.Thread(target=run, args=(key, fn)) for key, fn in calls.items()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -15,7 +15,6 @@ from .utils.captcha import captcha_recognize
 from datetime import datetime
 import random
 import os
-import pandas as pd
 
 class Xls(grid_strategies.Xls):
     """
@@ -30,7 +29,7 @@ class Xls(grid_strategies.Xls):
         self.tmp_folder = tmp_folder
         # self.tmp_folder = './'
 
-    def get(self, control_id: int) -> List[Dict]:
+    def get(self, control_id: int, result_format: str = "records") -> List[Dict]:
         grid = self._get_grid(control_id)
 
         # ctrl+s 保存 grid 内容为 xls 文件
@@ -43,10 +42,7 @@ class Xls(grid_strategies.Xls):
             if self._trader.is_exist_pop_dialog() and self._trader.app.top_window().window_text() != '另存为':
                 pop_dialog_window = self._trader.app.top_window()  # 验证码弹窗
                 pop_dialog_window.Static2.click()
-                file_path = './tmp/tmp.png'
-                pop_dialog_window.Static2.capture_as_image().save(file_path)
-                captcha_num = captcha_recognize(file_path).strip()  # 识别验证码
-                captcha_num = "".join(captcha_num.split())
+                captcha_num = captcha_recognize(pop_dialog_window.Static2.capture_as_image())  # 识别验证码
                 # logger.info("captcha result-->" + captcha_num)
                 pop_dialog_window.Edit.click().type_keys("{RIGHT}" * 10).type_keys("{BACKSPACE}" * 12).type_keys(
                     captcha_num).type_keys('{ENTER}')
@@ -70,7 +66,7 @@ class Xls(grid_strategies.Xls):
         #     self._trader.app.top_window().Button2.click()
         #     self._trader.wait(0.2)
 
-        return self._format_grid_data(temp_path)
+        return self._convert(self._format_grid_data(temp_path), result_format)
 
 
 class UniversalClientTrader(clienttrader.BaseLoginClientTrader):
@@ -125,10 +121,7 @@ class UniversalClientTrader(clienttrader.BaseLoginClientTrader):
 
                 # yzm = user_login_window['验 证 码(&V):Static1']
                 yzm = user_login_window.child_window(class_name="Static", best_match='验 证 码(&V):Static1')
-                file_path = './tmp/tmp.png'
-                yzm.capture_as_image().save(file_path)
-                captcha_num = captcha_recognize(file_path).strip()  # 识别验证码
-                captcha_num = "".join(captcha_num.split())
+                captcha_num = captcha_recognize(yzm.capture_as_image())  # 识别验证码
                 logger.debug('登录验证码' + captcha_num)
                 user_login_window.Edit1.set_focus()  # 获取账号输入框焦点
                 user_login_window.Edit1.type_keys(user)  # 输入账号
@@ -195,10 +188,7 @@ class UniversalClientTrader(clienttrader.BaseLoginClientTrader):
                 user_login_window = self._app.window(handle=login_window)
                 # yzm = user_login_window['验 证 码(&V):Static1']
                 yzm = user_login_window.child_window(class_name="Static", best_match='验 证 码(&V):Static1')
-                file_path = './tmp/tmp.png'
-                yzm.capture_as_image().save(file_path)
-                captcha_num = captcha_recognize(file_path).strip()  # 识别验证码
-                captcha_num = "".join(captcha_num.split())
+                captcha_num = captcha_recognize(yzm.capture_as_image())  # 识别验证码
                 logger.debug('登录验证码' + captcha_num)
                 user_login_window.Edit1.set_focus()  # 获取账号输入框焦点
                 user_login_window.Edit1.type_keys(user)  # 输入账号
@@ -267,10 +257,7 @@ class UniversalClientTrader(clienttrader.BaseLoginClientTrader):
 
             # yzm = user_login_window['验 证 码(&V):Static1']
             yzm = user_login_window.child_window(class_name="Static", best_match='验 证 码(&V):Static1')
-            file_path = './tmp/tmp.png'
-            yzm.capture_as_image().save(file_path)
-            captcha_num = captcha_recognize(file_path).strip()  # 识别验证码
-            captcha_num = "".join(captcha_num.split())
+            captcha_num = captcha_recognize(yzm.capture_as_image())  # 识别验证码
             logger.debug('登录验证码' + captcha_num)
             user_login_window.Edit1.set_focus()  # 获取账号输入框焦点
             user_login_window.Edit1.type_keys(user)  # 输入账号
@@ -339,6 +326,9 @@ class UniversalClientTrader(clienttrader.BaseLoginClientTrader):
         time.sleep(0.5)
         pywinauto.keyboard.send_keys("{ENTER}")
         time.sleep(2)
+        # pandas 只在读取导出的数据文件时使用，调用时再导入
+        import pandas as pd
+
         # pd.set_option('display.max_columns',None)
         data = pd.read_csv(file_path, delimiter='\t', encoding='gbk')
         self._main.maximize()
@@ -1,33 +1,435 @@
+import collections
+import hashlib
+import io
+import os
 import re
+from typing import Optional
 
+import numpy as np
 import requests
 from PIL import Image
 
 from easytrader import exceptions
+from easytrader.log import logger
 
+# 客户端数字验证码的二值化阈值，灰度小于阈值的像素视为字符
+CAPTCHA_THRESHOLD = 200
 
-def captcha_recognize(img_path):
+# default_recognizer 的模板文件，创建识别器时加载，confirm_captcha 学习成功后保存，
+# 重启后不需要重新学习。可以通过环境变量 EASYTRADER_CAPTCHA_TEMPLATES 指定，设为 None 时不保存
+CAPTCHA_TEMPLATES_PATH = os.environ.get(
+    "EASYTRADER_CAPTCHA_TEMPLATES",
+    os.path.join(os.path.expanduser("~"), ".easytrader", "captcha_templates.npz"),
+)
+
+
+class CaptchaPipeline:
+    """
+    验证码预处理流水线，将图片转为 numpy 数组后依次执行各个步骤，
+    步骤为 ndarray -> ndarray 的函数，由 rgb / mask_dark / grayscale / binary_threshold / keep_band /
+    min_filter / median_filter 等组合，各券商的配置见 PROFILES
+    """
+
+    def __init__(self, *steps):
+        self.steps = steps
+
+    def __call__(self, image: Image.Image) -> np.ndarray:
+        steps = self.steps
+        if steps and steps[0] is grayscale:
+            # 第一步为灰度转换时直接使用 PIL 转换，结果与 grayscale 相同，小图片更快
+            image = image.convert("L")
+            steps = steps[1:]
+        elif image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGB")
+        array = np.asarray(image)
+        for step in steps:
+            array = step(array)
+        return array
+
+    def to_image(self, image: Image.Image) -> Image.Image:
+        return Image.fromarray(self(image))
+
+
+def rgb(array):
+    """去掉 alpha 通道，灰度图扩展为三个通道"""
+    if array.ndim == 2:
+        return np.repeat(array[:, :, None], 3, axis=2)
+    return array[:, :, :3]
+
+
+def mask_dark(limit=(100, 100, 100), fill=255):
+    """
+    将颜色按 (R, G, B) 比较小于 limit 的像素替换为 fill，
+    与逐像素执行 if img.getpixel((x, y)) < limit: img.putpixel((x, y), fill) 的结果一致
+    """
+
+    def step(array):
+        array = rgb(array)
+        less = np.zeros(array.shape[:2], dtype=bool)
+        equal = np.ones(array.shape[:2], dtype=bool)
+        # 元组按字典序比较
+        for channel, value in enumerate(limit):
+            less |= equal & (array[:, :, channel] < value)
+            equal &= array[:, :, channel] == value
+        array = array.copy()
+        array[less] = fill
+        return array
+
+    return step
+
+
+# PIL 的 RGB 转灰度使用的 16 位定点系数
+_GRAY_WEIGHTS = np.array([19595, 38470, 7471], dtype=np.uint32)
+
+
+def grayscale(array):
+    """与 PIL 的 convert("L") 相同的整数灰度转换"""
+    if array.ndim == 2:
+        return array
+    gray = array[:, :, :3] @ _GRAY_WEIGHTS + 0x8000
+    return (gray >> 16).astype(np.uint8)
+
+
+_BLACK = np.uint8(0)
+_WHITE = np.uint8(255)
+
+
+def binary_threshold(value):
+    """灰度小于 value 的像素置为 0，其余置为 255"""
+
+    def step(array):
+        return np.where(array < value, _BLACK, _WHITE)
+
+    return step
+
+
+def keep_band(low, high):
+    """灰度在 (low, high) 之间的像素置为 0，其余置为 255"""
+
+    def step(array):
+        return np.where((array > low) & (array < high), _BLACK, _WHITE)
+
+    return step
+
+
+def _windows(array, size):
+    """size x size 邻域内各位置的平移视图，边缘按最近像素扩展，与 PIL 的 RankFilter 相同"""
+    margin = size // 2
+    padded = np.pad(array, margin, mode="edge")
+    height, width = array.shape
+    return [padded[i:i + height, j:j + width] for i in range(size) for j in range(size)]
+
+
+# 求 9 个数的中位数的比较交换网络，19 次比较后位置 4 为中位数
+_MEDIAN9_NETWORK = (
+    (1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8), (0, 3),
+    (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2),
+)
+
+
+def min_filter(size=3):
+    """与 ImageFilter.MinFilter(size) 一致"""
+    return lambda array: np.minimum.reduce(_windows(array, size))
+
+
+def median_filter(size=3):
+    """与 ImageFilter.MedianFilter(size) 一致"""
+
+    def step(array):
+        windows = _windows(array, size)
+        if size == 3:
+            for i, j in _MEDIAN9_NETWORK:
+                windows[i], windows[j] = (
+                    np.minimum(windows[i], windows[j]),
+                    np.maximum(windows[i], windows[j]),
+                )
+            return windows[4]
+        rank = size * size // 2
+        return np.partition(np.stack(windows), rank, axis=0)[rank]
+
+    return step
+
+
+PROFILES = {
+    # 广发: 去掉深色干扰线后保留特定灰度的字符，再去噪
+    "gf": CaptchaPipeline(
+        mask_dark((100, 100, 100), 255),
+        grayscale,
+        keep_band(68, 90),
+        min_filter(3),
+        median_filter(3),
+        median_filter(3),
+        median_filter(3),
+    ),
+    # 银河客户端: 由识别服务处理，本地只统一为 RGB
+    "yh_client": CaptchaPipeline(rgb),
+    # 同花顺系客户端复制 grid 及登录时的数字验证码
+    "ths": CaptchaPipeline(grayscale, binary_threshold(CAPTCHA_THRESHOLD)),
+}
+
+
+def preprocess(image, profile: str) -> Image.Image:
+    """
+    :param image: PIL 图片或图片路径
+    :param profile: PROFILES 中的配置名
+    :return: 预处理后的图片
+    """
+    return PROFILES[profile].to_image(_open(image))
+
+
+def _open(image):
+    if isinstance(image, str):
+        return Image.open(image)
+    return image
+
+
+class DigitRecognizer:
+    """
+    在内存中识别客户端的数字验证码，不写临时文件，不启动 tesseract 进程:
+    二值化后按列投影切分出每个数字，缩放到固定大小后与模板逐像素比较，取最相似的模板
+
+    模板通过 train 从已确认正确的验证码中学习，可以 save / load 到文件。
+    没有模板、切分失败或匹配度低于 min_similarity 时使用 tesseract 识别。
+    识别结果按图片内容的哈希缓存
+    """
+
+    # 单个数字缩放后的大小 (高, 宽)
+    glyph_shape = (16, 12)
+
+    def __init__(
+        self,
+        digits: int = 4,
+        threshold: int = CAPTCHA_THRESHOLD,
+        min_similarity: float = 0.9,
+        max_templates: int = 20,
+        cache_size: int = 256,
+        templates_path: Optional[str] = None,
+    ):
+        """
+        :param digits: 验证码位数
+        :param threshold: 二值化阈值，灰度小于阈值的像素视为字符
+        :param min_similarity: 模板匹配的最低相似度 (相同像素的比例)，低于时使用 tesseract
+        :param max_templates: 每个数字最多保留的模板数
+        :param cache_size: 缓存的识别结果数
+        :param templates_path: 模板文件，见 save
+        """
+        self.digits = digits
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.max_templates = max_templates
+        self.cache_size = cache_size
+        self._cache: collections.OrderedDict = collections.OrderedDict()
+        self._templates = np.zeros((0, self.glyph_shape[0] * self.glyph_shape[1]), dtype=bool)
+        self._labels = np.zeros(0, dtype="U1")
+        if templates_path is not None:
+            self.load(templates_path)
+
+    @property
+    def template_count(self) -> int:
+        return len(self._labels)
+
+    def recognize(self, image: Image.Image) -> str:
+        """
+        :param image: 验证码图片，例如 capture_as_image() 的结果
+        :return: 识别结果，只包含数字
+        """
+        key = self._key(image)
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            return result
+
+        binary = self.binarize(image)
+        result = self.match(binary)
+        if result is None:
+            result = tesseract_digits(image)
+        self._remember(key, result)
+        return result
+
+    def match(self, binary: np.ndarray):
+        """
+        :param binary: binarize 的结果
+        :return: 模板匹配的结果，无法可靠匹配时返回 None
+        """
+        if not self.template_count:
+            return None
+        glyphs = self.segment(binary)
+        if glyphs is None:
+            return None
+        features = np.stack([self.normalize(glyph) for glyph in glyphs])
+        # (数字个数, 模板数) 的相似度矩阵
+        similarity = (features[:, None, :] == self._templates[None, :, :]).mean(axis=2)
+        best = similarity.argmax(axis=1)
+        if similarity[np.arange(len(best)), best].min() < self.min_similarity:
+            return None
+        return "".join(self._labels[best])
+
+    def train(self, image: Image.Image, text: str) -> bool:
+        """
+        使用已确认正确的验证码学习模板，例如验证码输入成功后调用
+        :return: 是否学习成功，切分出的数字个数不一致时返回 False
+        """
+        if len(text) != self.digits or not text.isdigit():
+            return False
+        glyphs = self.segment(self.binarize(image))
+        if glyphs is None:
+            return False
+        for label, glyph in zip(text, glyphs):
+            self._add_template(label, self.normalize(glyph))
+        self._remember(self._key(image), text)
+        return True
+
+    def save(self, path: str):
+        """保存模板到 npz 文件，先写入临时文件再替换，写入中途失败不会损坏原文件"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, templates=self._templates, labels=self._labels)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """从 save 保存的文件加载模板"""
+        with np.load(path) as data:
+            for template, label in zip(data["templates"], data["labels"]):
+                self._add_template(str(label), template.astype(bool))
+
+    def binarize(self, image: Image.Image) -> np.ndarray:
+        """:return: bool 数组，True 为字符像素"""
+        if self.threshold == CAPTCHA_THRESHOLD:
+            return PROFILES["ths"](image) == 0
+        return CaptchaPipeline(grayscale, binary_threshold(self.threshold))(image) == 0
+
+    def segment(self, binary: np.ndarray):
+        """
+        按列投影切分数字，去掉孤立噪点后合并间隔最小的相邻片段或对半拆分最宽的片段，
+        直到片段数与位数相同
+        :return: 每个数字裁剪后的 bool 数组，没有字符时返回 None
+        """
+        columns = binary.sum(axis=0)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], columns > 0, [0]))))
+        spans = [
+            [start, stop]
+            for start, stop in zip(edges[::2], edges[1::2])
+            if columns[start:stop].sum() > 2
+        ]
+        if not spans:
+            return None
+        while len(spans) > self.digits:
+            gaps = [spans[i + 1][0] - spans[i][1] for i in range(len(spans) - 1)]
+            i = int(np.argmin(gaps))
+            spans[i:i + 2] = [[spans[i][0], spans[i + 1][1]]]
+        while len(spans) < self.digits:
+            i = int(np.argmax([stop - start for start, stop in spans]))
+            start, stop = spans[i]
+            if stop - start < 2:
+                return None
+            middle = (start + stop) // 2
+            spans[i:i + 1] = [[start, middle], [middle, stop]]
+
+        glyphs = []
+        for start, stop in spans:
+            glyph = binary[:, start:stop]
+            rows = np.flatnonzero(glyph.any(axis=1))
+            if not len(rows):
+                return None
+            glyphs.append(glyph[rows[0]:rows[-1] + 1])
+        return glyphs
+
+    def normalize(self, glyph: np.ndarray) -> np.ndarray:
+        """保持宽高比居中后按最近邻缩放到 glyph_shape，返回展开的一维数组"""
+        height, width = self.glyph_shape
+        glyph_height, glyph_width = glyph.shape
+        box_width = max(glyph_width, -(-glyph_height * width // height))
+        box_height = max(glyph_height, -(-glyph_width * height // width))
+        box = np.zeros((box_height, box_width), dtype=bool)
+        top = (box_height - glyph_height) // 2
+        left = (box_width - glyph_width) // 2
+        box[top:top + glyph_height, left:left + glyph_width] = glyph
+        rows = np.arange(height) * box_height // height
+        cols = np.arange(width) * box_width // width
+        return box[np.ix_(rows, cols)].ravel()
+
+    def _add_template(self, label, template):
+        same_label = np.flatnonzero(self._labels == label)
+        if (self._templates[same_label] == template).all(axis=1).any():
+            return
+        if len(same_label) >= self.max_templates:
+            # 去掉该数字最早的模板
+            keep = np.ones(len(self._labels), dtype=bool)
+            keep[same_label[0]] = False
+            self._templates = self._templates[keep]
+            self._labels = self._labels[keep]
+        self._templates = np.vstack([self._templates, template[None, :]])
+        self._labels = np.append(self._labels, label)
+
+    @staticmethod
+    def _key(image):
+        return image.mode, image.size, hashlib.sha1(image.tobytes()).digest()
+
+    def _remember(self, key, result):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+_default_recognizer = None
+
+
+def default_recognizer() -> DigitRecognizer:
+    """captcha_recognize 使用的识别器，进程内共享"""
+    global _default_recognizer
+    if _default_recognizer is None:
+        recognizer = DigitRecognizer()
+        path = CAPTCHA_TEMPLATES_PATH
+        if path and os.path.exists(path):
+            try:
+                recognizer.load(path)
+            # pylint: disable=broad-except
+            except Exception as e:
+                logger.warning("加载验证码模板 %s 失败: %s", path, e)
+        _default_recognizer = recognizer
+    return _default_recognizer
+
+
+def captcha_recognize(img):
+    """
+    识别客户端的 4 位数字验证码
+    :param img: PIL 图片，例如 capture_as_image() 的结果，也可以是图片路径
+    :return: 识别结果
+    """
+    if isinstance(img, str):
+        img = Image.open(img)
+    return default_recognizer().recognize(img)
+
+
+def confirm_captcha(img, captcha_num):
+    """
+    验证码输入成功后调用，使用识别结果学习模板并保存到 CAPTCHA_TEMPLATES_PATH，
+    之后相同字体的验证码不再需要 tesseract
+    """
+    try:
+        recognizer = default_recognizer()
+        path = CAPTCHA_TEMPLATES_PATH
+        if recognizer.train(img, captcha_num) and path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            recognizer.save(path)
+    # pylint: disable=broad-except
+    except Exception as e:
+        logger.debug("学习验证码模板失败: %s", e)
+
+
+def tesseract_digits(img):
+    """使用 tesseract 识别验证码图片中的数字"""
     import pytesseract
 
-    im = Image.open(img_path).convert("L")
-    # 1. threshold the image
-    threshold = 200
-    table = []
-    for i in range(256):
-        if i < threshold:
-            table.append(0)
-        else:
-            table.append(1)
-
-    out = im.point(table, "1")
-    # 2. recognize with tesseract
+    out = Image.fromarray(PROFILES["ths"](img) > 0)
     num = pytesseract.image_to_string(out, config='--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789')
-    return num
+    return "".join(num.split())
 
 
 def recognize_verify_code(image_path, broker="ht"):
     """识别验证码，返回识别后的字符串，使用 tesseract 实现
-    :param image_path: 图片路径
+    :param image_path: 图片路径或 PIL 图片
     :param broker: 券商 ['ht', 'yjb', 'gf', 'yh']
     :return recognized: verify code string"""
 
@@ -43,8 +445,13 @@ def detect_yh_client_result(image_path):
     """封装了tesseract的识别，部署在阿里云上，
     服务端源码地址为： https://github.com/shidenggui/yh_verify_code_docker"""
     api = "http://yh.ez.shidenggui.com:5000/yh_client"
-    with open(image_path, "rb") as f:
-        rep = requests.post(api, files={"image": f})
+    if isinstance(image_path, str):
+        with open(image_path, "rb") as f:
+            rep = requests.post(api, files={"image": f})
+    else:
+        buffer = io.BytesIO()
+        preprocess(image_path, "yh_client").save(buffer, "jpeg")
+        rep = requests.post(api, files={"image": buffer.getvalue()})
     if rep.status_code != 201:
         error = rep.json()["message"]
         raise exceptions.TradeError("request {} error: {}".format(api, error))
@@ -52,9 +459,7 @@ def detect_yh_client_result(image_path):
 
 
 def input_verify_code_manual(image_path):
-    from PIL import Image
-
-    image = Image.open(image_path)
+    image = _open(image_path)
     image.show()
     code = input(
         "image path: {}, input verify code answer:".format(image_path)
@@ -63,31 +468,11 @@ def input_verify_code_manual(image_path):
 
 
 def default_verify_code_detect(image_path):
-    from PIL import Image
-
-    img = Image.open(image_path)
-    return invoke_tesseract_to_recognize(img)
+    return invoke_tesseract_to_recognize(_open(image_path))
 
 
 def detect_gf_result(image_path):
-    from PIL import ImageFilter, Image
-
-    img = Image.open(image_path)
-    if hasattr(img, "width"):
-        width, height = img.width, img.height
-    else:
-        width, height = img.size
-    for x in range(width):
-        for y in range(height):
-            if img.getpixel((x, y)) < (100, 100, 100):
-                img.putpixel((x, y), (256, 256, 256))
-    gray = img.convert("L")
-    two = gray.point(lambda p: 0 if 68 < p < 90 else 256)
-    min_res = two.filter(ImageFilter.MinFilter)
-    med_res = min_res.filter(ImageFilter.MedianFilter)
-    for _ in range(2):
-        med_res = med_res.filter(ImageFilter.MedianFilter)
-    return invoke_tesseract_to_recognize(med_res)
+    return invoke_tesseract_to_recognize(preprocess(image_path, "gf"))
 
 
 def invoke_tesseract_to_recognize(img):
@@ -0,0 +1,268 @@
+# coding:utf-8
+import io
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# 按列匹配整列数据，与 pandas C 解析器的类型推断规则一致:
+# 前后允许空格，不接受 1_000 / 0x10 / nan 等 Python 可以转换的写法
+_INT = r" *[+-]?[0-9]+ *"
+_FLOAT = r" *[+-]?(?:(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[iI][nN][fF](?:[iI][nN][iI][tT][yY])?) *"
+_INT_COLUMN = re.compile(r"(?:{0}\n)*{0}".format(_INT))
+_FLOAT_COLUMN = re.compile(r"(?:{0}\n)*{0}".format(_FLOAT))
+# pandas 与 Python 的数值转换不一致的情况整列交给 pandas 解析:
+# 超过 17 位数字的整数（溢出后的处理不同），超过 15 位有效数字或带指数的小数（pandas 可能相差 1 ulp）
+_LONG_INTEGER = re.compile(r"[0-9]{18}")
+_LONG_DECIMAL = re.compile(r"(?:[0-9]\.?){16}")
+_NUMBER_PUNCTUATION = str.maketrans("", "", "\n+-.")
+_TRUE_VALUES = frozenset(["True", "TRUE", "true"])
+_BOOL_VALUES = _TRUE_VALUES | frozenset(["False", "FALSE", "false"])
+
+# dtype 中可以直接处理的类型，其余类型交给 pandas
+_CONVERTERS = {
+    str: None,
+    "str": None,
+    object: None,
+    "object": None,
+    int: int,
+    "int": int,
+    float: float,
+    "float": float,
+}
+
+
+class _Fallback(Exception):
+    """需要交给 pandas 解析的内容"""
+
+
+def parse_grid(text: str, dtype: Optional[Dict] = None) -> List[Dict]:
+    """
+    解析客户端复制或另存得到的 tab 分隔表格，不依赖 pandas，结果与
+    pd.read_csv(StringIO(text), delimiter="\\t", dtype=dtype, na_filter=False).to_dict("records") 一致
+
+    - 空列名命名为 Unnamed: 列号，重复列名依次加 .1 .2 后缀
+    - dtype 未指定的列按整列推断为 int / float / bool，否则保留字符串
+    - 包含引号、单独的 \\r、行的列数多于表头等需要特殊处理的内容交给 pandas 解析
+
+    :param text: 表格内容，第一行为表头
+    :param dtype: {列名: 类型}，例如客户端配置的 GRID_DTYPE
+    :return: 每行一个 dict
+    """
+    try:
+        return _parse(text, dtype)
+    except _Fallback:
+        return read_dataframe(text, dtype).to_dict("records")
+
+
+def read_dataframe(text: str, dtype: Optional[Dict] = None):
+    """使用 pandas 解析表格，只在调用时导入 pandas"""
+    import pandas as pd
+
+    return pd.read_csv(
+        io.StringIO(text), delimiter="\t", dtype=dtype, na_filter=False
+    )
+
+
+def _parse(text, dtype):
+    if '"' in text:
+        raise _Fallback
+    lines = text.split("\n")
+    if "\r" in text:
+        lines = [line[:-1] if line.endswith("\r") else line for line in lines]
+        if any("\r" in line for line in lines):
+            raise _Fallback
+    # 只有空格的行视为空行
+    lines = [line for line in lines if line.strip(" ")]
+    if not lines:
+        raise _Fallback
+
+    names, converters = _compile(lines[0], _freeze(dtype))
+    width = len(names)
+    rows = [line.split("\t") for line in lines[1:]]
+    if not rows:
+        return []
+    for row in rows:
+        if len(row) != width:
+            if len(row) > width:
+                raise _Fallback
+            row.extend([""] * (width - len(row)))
+
+    columns = [
+        _convert(column, converter)
+        for column, converter in zip(zip(*rows), converters)
+    ]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def _freeze(dtype):
+    if not dtype:
+        return ()
+    try:
+        return tuple(sorted(dtype.items(), key=lambda item: item[0]))
+    except TypeError:
+        raise _Fallback
+
+
+@lru_cache(maxsize=64)
+def _compile(header: str, dtype: Tuple) -> Tuple[Tuple[str, ...], Tuple]:
+    """
+    按表头和 dtype 生成列名和每列的转换方式，相同表头只计算一次
+    :return: (列名, 转换方式)，转换方式为 None 表示保留字符串，"infer" 表示推断类型
+    """
+    dtypes = dict(dtype)
+    columns = header.split("\t")
+    unnamed = [i for i, name in enumerate(columns) if name == ""]
+    for i in unnamed:
+        columns[i] = "Unnamed: {}".format(i)
+
+    # 与 pandas 相同的重复列名处理，先处理有列名的列
+    counts: Dict[str, int] = {}
+    for i in [i for i in range(len(columns)) if i not in unnamed] + unnamed:
+        name = old_name = columns[i]
+        count = counts.get(name, 0)
+        if count > 0:
+            while count > 0:
+                counts[old_name] = count + 1
+                name = "{}.{}".format(old_name, count)
+                count = count + 1 if name in columns else counts.get(name, 0)
+            if dtypes.get(old_name) is not None and dtypes.get(name) is None:
+                dtypes[name] = dtypes[old_name]
+        columns[i] = name
+        counts[name] = count + 1
+
+    converters: List[Any] = []
+    for name in columns:
+        if name not in dtypes:
+            converters.append("infer")
+            continue
+        try:
+            converters.append(_CONVERTERS[dtypes[name]])
+        except (KeyError, TypeError):
+            raise _Fallback
+    return tuple(columns), tuple(converters)
+
+
+def _convert(column, converter):
+    if converter is None:
+        return column
+    if converter != "infer":
+        try:
+            return list(map(converter, column))
+        except ValueError:
+            raise _Fallback
+    joined = "\n".join(column)
+    # 快速路径: 只包含数字、正负号、小数点的列直接转换，格式错误时 int/float 抛出 ValueError
+    digits = joined.translate(_NUMBER_PUNCTUATION)
+    if digits.isdigit() and digits.isascii() and "" not in column:
+        longest = max(map(len, column))
+        try:
+            if "." not in joined and longest < 18:
+                return list(map(int, column))
+            if "." in joined and longest <= 15:
+                return list(map(float, column))
+        except ValueError:
+            pass
+    if _LONG_INTEGER.search(joined):
+        raise _Fallback
+    if _INT_COLUMN.fullmatch(joined):
+        converter = int
+    elif _FLOAT_COLUMN.fullmatch(joined):
+        if (
+            "e" in joined
+            or "E" in joined
+            or (max(map(len, column)) > 15 and _LONG_DECIMAL.search(joined))
+        ):
+            raise _Fallback
+        converter = float
+    elif _BOOL_VALUES.issuperset(column):
+        return [value in _TRUE_VALUES for value in column]
+    else:
+        return column
+    return list(map(converter, column))
+
+
+RESULT_FORMATS = ("records", "dataframe", "numpy")
+
+
+def convert(
+    records: Optional[List[Dict]],
+    result_format: str = "records",
+    numpy_dtype: Optional[Dict] = None,
+):
+    """
+    转换表格数据的格式
+    :param records: parse_grid 的结果，为 None（例如未能读取表格）时任何格式都返回 None
+    :param result_format: records 返回原数据，dataframe 返回 pandas.DataFrame，
+        numpy 返回结构化数组，见 to_numpy
+    :param numpy_dtype: numpy 格式下已知列的类型，例如客户端配置的 GRID_NUMPY_DTYPE
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            "不支持的数据格式: {}, 可选 {}".format(result_format, RESULT_FORMATS)
+        )
+    if records is None or result_format == "records":
+        return records
+    if result_format == "dataframe":
+        import pandas as pd
+
+        return pd.DataFrame.from_records(records)
+    return to_numpy(records, numpy_dtype)
+
+
+def to_numpy(records: Optional[List[Dict]], numpy_dtype: Optional[Dict] = None):
+    """
+    转换为结构化数组，字段名与列名相同，records 为 None 时返回 None
+    已知列使用 numpy_dtype 中的类型（字符串超出长度时加宽），数据无法转换或未知的列按数据推断:
+    全部为整数时为 int64，全部为数值时为 float64，否则为按最长值确定长度的 unicode 字符串
+    :param numpy_dtype: {列名: numpy 类型}
+    """
+    if records is None:
+        return None
+    import numpy as np
+
+    numpy_dtype = numpy_dtype or {}
+    names = list(records[0]) if records else []
+    fields = []
+    arrays = []
+    for name in names:
+        column = [row[name] for row in records]
+        array = None
+        known = numpy_dtype.get(name)
+        if known is not None:
+            known = np.dtype(known)
+            if known.kind == "U":
+                # 字符串列按实际长度加宽，避免截断
+                width = max([len(str(value)) for value in column] + [known.itemsize // 4])
+                known = np.dtype("U{}".format(width))
+            source = np.array(column)
+            try:
+                array = source.astype(known)
+            except (TypeError, ValueError):
+                array = None
+            # 整数列中出现小数时不截断
+            if (
+                array is not None
+                and known.kind in "iu"
+                and source.dtype.kind == "f"
+                and not np.array_equal(source, array)
+            ):
+                array = None
+        if array is None:
+            array = np.array(column, dtype=_infer_numpy_dtype(column))
+        fields.append((name, array.dtype))
+        arrays.append(array)
+
+    result = np.empty(len(records), dtype=fields)
+    for (name, _), array in zip(fields, arrays):
+        result[name] = array
+    return result
+
+
+def _infer_numpy_dtype(column):
+    if all(type(value) is int for value in column):
+        return "i8"
+    if all(type(value) in (int, float) for value in column):
+        return "f8"
+    if all(type(value) is bool for value in column):
+        return "?"
+    return "U{}".format(max([len(str(value)) for value in column] + [1]))
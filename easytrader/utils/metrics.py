@@ -0,0 +1,186 @@
+# coding:utf-8
+import bisect
+import threading
+from typing import Dict, Optional, Sequence
+
+# 直方图桶上界，单位为秒，最后一个桶收集超过 30 秒的耗时
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Histogram:
+    """
+    固定桶的耗时直方图，记录时只更新计数，不分配新对象
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        在命中的桶内线性插值估算分位数
+        :param q: 0 ~ 100
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * q / 100.0
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if n and seen + n >= rank:
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(value, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class OperationMetrics:
+    """单个操作的墙钟耗时、CPU 耗时和异常次数"""
+
+    __slots__ = ("wall", "cpu", "errors", "_lock")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.wall = Histogram(buckets)
+        self.cpu = Histogram(buckets)
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, wall: float, cpu: float, error: bool = False):
+        with self._lock:
+            self.wall.record(wall)
+            self.cpu.record(cpu)
+            if error:
+                self.errors += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            result = self.wall.summary()
+            result["errors"] = self.errors
+            result["cpu"] = self.cpu.summary()
+        return result
+
+
+class MetricsRegistry:
+    """
+    按操作名汇总耗时直方图
+
+    Usage::
+
+        >>> from easytrader.utils.metrics import registry
+        >>> registry.dump()
+        >>> print(registry.report())
+        >>> registry.reset()
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._operations: Dict[str, OperationMetrics] = {}
+        self._lock = threading.Lock()
+
+    def operation(self, name: str) -> OperationMetrics:
+        metrics = self._operations.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._operations.get(name)
+                if metrics is None:
+                    metrics = self._operations[name] = OperationMetrics(self.buckets)
+        return metrics
+
+    def record(self, name: str, wall: float, cpu: float, error: bool = False):
+        """
+        :param name: 操作名
+        :param wall: 墙钟耗时，单位为秒
+        :param cpu: CPU 耗时，单位为秒
+        :param error: 操作是否抛出异常
+        """
+        self.operation(name).record(wall, cpu, error)
+
+    def dump(self, names: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
+        """
+        :param names: 需要导出的操作名，默认导出全部
+        :return: {操作名: {count, mean, p50, p95, p99, max, errors, cpu: {...}}}
+        """
+        operations = dict(self._operations)
+        if names is not None:
+            operations = {k: v for k, v in operations.items() if k in names}
+        return {name: metrics.summary() for name, metrics in sorted(operations.items())}
+
+    def report(self) -> str:
+        """按总耗时从高到低输出的文本表格，单位为毫秒"""
+        rows = sorted(
+            self.dump().items(), key=lambda item: item[1]["mean"] * item[1]["count"],
+            reverse=True,
+        )
+        lines = [
+            "{:<40} {:>7} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+                "operation", "count", "errors", "p50", "p95", "p99", "max", "cpu_p50"
+            )
+        ]
+        for name, s in rows:
+            lines.append(
+                "{:<40} {:>7} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                    name,
+                    s["count"],
+                    s["errors"],
+                    s["p50"] * 1000,
+                    s["p95"] * 1000,
+                    s["p99"] * 1000,
+                    s["max"] * 1000,
+                    s["cpu"]["p50"] * 1000,
+                )
+            )
+        return "\n".join(lines)
+
+    def reset(self, name: Optional[str] = None):
+        """清空全部或指定操作的统计"""
+        with self._lock:
+            if name is None:
+                self._operations = {}
+            else:
+                self._operations.pop(name, None)
+
+
+registry = MetricsRegistry()
@@ -1,5 +1,7 @@
 # coding:utf-8
+import datetime
 import json
+import re
 
 
 def parse_cookies_str(cookies):
@@ -29,3 +31,30 @@ def grep_comma(num_str):
 def str2num(num_str, convert_type="float"):
     num = float(grep_comma(num_str))
     return num if convert_type == "float" else int(num)
+
+
+def str2time(time_str):
+    """
+    解析客户端表格中的时间
+    :param time_str: 例如 '09:30:15', '09:30:15.120', '93015', '093015', '093015120'
+    :return: datetime.time，无法解析时返回 None
+    """
+    text = str(time_str).strip()
+    matched = re.match(r"^(\d{1,2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?$", text)
+    if matched:
+        hour, minute, second, fraction = matched.groups()
+    else:
+        matched = re.match(r"^(\d{5,6}|\d{8,9})(?:\.(\d{1,6}))?$", text)
+        if not matched:
+            return None
+        digits, fraction = matched.groups()
+        if len(digits) > 6:
+            # HHMMSSmmm 格式，末三位为毫秒
+            digits, fraction = digits[:-3], digits[-3:]
+        digits = digits.zfill(6)
+        hour, minute, second = digits[:2], digits[2:4], digits[4:]
+    microsecond = int((fraction or "0").ljust(6, "0"))
+    try:
+        return datetime.time(int(hour), int(minute), int(second), microsecond)
+    except ValueError:
+        return None
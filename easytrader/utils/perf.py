@@ -4,43 +4,47 @@ import logging
 import timeit
 
 from ..log import logger
+from .metrics import registry
 
 try:
     from time import process_time
 except:
     from time import clock as process_time
 
+# 逐次调用的耗时日志，默认关闭（easytrader 日志级别为 DEBUG 时也不输出），
+# 需要时 perf_logger.setLevel(logging.DEBUG)
+perf_logger = logger.getChild("perf")
+perf_logger.setLevel(logging.INFO)
+
 
 def perf_clock(f):
+    """
+    统计函数的墙钟耗时和 CPU 耗时，写入 metrics.registry，操作名为函数的 __qualname__
+    """
+    name = getattr(f, "__qualname__", f.__name__)
+    record = registry.record
+
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
-        if not logger.isEnabledFor(logging.DEBUG):
-            return f(*args, **kwargs)
-
         ts = timeit.default_timer()
         cs = process_time()
-        ex = None
-        result = None
-
+        error = True
         try:
             result = f(*args, **kwargs)
-        except Exception as ex1:
-            ex = ex1
-
-        te = timeit.default_timer()
-        ce = process_time()
-        logger.debug(
-            "%r consume %2.4f sec, cpu %2.4f sec. args %s, extra args %s"
-            % (
-                f.__name__,
-                te - ts,
-                ce - cs,
-                args[1:],
-                kwargs,
-            )
-        )
-        if ex is not None:
-            raise ex
-        return result
+            error = False
+            return result
+        finally:
+            wall = timeit.default_timer() - ts
+            cpu = process_time() - cs
+            record(name, wall, cpu, error)
+            if perf_logger.isEnabledFor(logging.DEBUG):
+                perf_logger.debug(
+                    "%r consume %2.4f sec, cpu %2.4f sec. args %s, extra args %s",
+                    name,
+                    wall,
+                    cpu,
+                    args[1:],
+                    kwargs,
+                )
 
     return wrapper
@@ -106,11 +106,11 @@ class YHClientTrader(clienttrader.BaseLoginClientTrader):
         verify_code = recognize_verify_code(file_path, "yh_client")
         return "".join(re.findall(r"\d+", verify_code))
 
-    @property
-    def balance(self):
+    def _query_balance(self):
         self._switch_left_menus(self._config.BALANCE_MENU_PATH)
         return self._get_grid_data(self._config.BALANCE_GRID_CONTROL_ID)
 
+    @clienttrader.invalidate_data_cache
     def auto_ipo(self):
         self._switch_left_menus(self._config.AUTO_IPO_MENU_PATH)
         stock_list = self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
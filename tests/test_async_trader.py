@@ -0,0 +1,74 @@
+# coding: utf-8
+import asyncio
+import threading
+import unittest
+
+from easytrader import gui_executor
+from easytrader.async_trader import AsyncClientTrader
+
+
+class FakeTrader:
+    def __init__(self):
+        self.executor = gui_executor.GuiExecutor()
+        self.release = threading.Event()
+        self.calls = []
+
+    def submit(self, name, *args, **kwargs):
+        return self.executor.submit(getattr(self, "_" + name), *args, **kwargs)
+
+    def _position(self):
+        self.calls.append("position")
+        return [{"证券代码": "162411"}]
+
+    def _connect(self, exe_path=None):
+        self.calls.append(("connect", exe_path, self.executor.is_executor_thread()))
+
+    def wait_for_fill(self, entrust_no, timeout=None):
+        return {"合同编号": entrust_no, "备注": "已成"}
+
+    def _buy(self, security, price, amount):
+        self.release.wait(1)
+        self.calls.append("buy")
+        return {"entrust_no": "1"}
+
+
+class TestAsyncClientTrader(unittest.TestCase):
+    def setUp(self):
+        self.trader = FakeTrader()
+        self.addCleanup(self.trader.executor.shutdown)
+        self.user = AsyncClientTrader(self.trader)
+
+    def test_rejects_non_client_trader(self):
+        with self.assertRaises(TypeError):
+            AsyncClientTrader(object())
+
+    def test_await_property_and_method(self):
+        async def run():
+            self.trader.release.set()
+            position = await self.user.position
+            result = await self.user.buy("162411", 0.55, 100)
+            return position, result
+
+        position, result = asyncio.run(run())
+        self.assertEqual(position, [{"证券代码": "162411"}])
+        self.assertEqual(result, {"entrust_no": "1"})
+
+    def test_wait_for_cancels_queued_operation(self):
+        async def run():
+            running = asyncio.ensure_future(self.user.buy("162411", 0.55, 100))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.user.position, 0.01)
+            self.trader.release.set()
+            await running
+
+        asyncio.run(run())
+        self.assertEqual(self.trader.calls, ["buy"])
+
+    def test_connect_runs_on_executor(self):
+        asyncio.run(self.user.connect("xiadan.exe"))
+        self.assertEqual(self.trader.calls, [("connect", "xiadan.exe", True)])
+
+    def test_wait_for_fill(self):
+        result = asyncio.run(self.user.wait_for_fill("1", timeout=1))
+        self.assertEqual(result["备注"], "已成")
@@ -0,0 +1,183 @@
+# coding: utf-8
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from easytrader.utils import captcha
+from easytrader.utils.captcha import DigitRecognizer, captcha_recognize
+
+FONT = ImageFont.load_default(size=14)
+
+
+def make_captcha(text, seed=0):
+    """浅色噪点背景上的深色数字，与客户端验证码类似"""
+    rnd = random.Random(seed)
+    image = Image.new("RGB", (72, 24), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        draw.point(
+            (rnd.randrange(72), rnd.randrange(24)),
+            fill=tuple(rnd.randrange(210, 256) for _ in range(3)),
+        )
+    x = 4
+    for char in text:
+        color = tuple(rnd.randrange(40) for _ in range(3))
+        draw.text((x, 2 + rnd.randrange(3)), char, fill=color, font=FONT)
+        x += 15 + rnd.randrange(2)
+    return image
+
+
+def trained_recognizer():
+    recognizer = DigitRecognizer()
+    for seed, text in enumerate(["0123", "4567", "8901"]):
+        assert recognizer.train(make_captcha(text, seed), text)
+    return recognizer
+
+
+class TestDigitRecognizer(unittest.TestCase):
+    def setUp(self):
+        self.tesseract = mock.Mock()
+        self.tesseract.image_to_string.return_value = " 98 76\n"
+        patcher = mock.patch.dict(sys.modules, {"pytesseract": self.tesseract})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_template_matching(self):
+        recognizer = trained_recognizer()
+        rnd = random.Random(1)
+        for seed in range(50):
+            text = "".join(rnd.choice("0123456789") for _ in range(4))
+            self.assertEqual(recognizer.recognize(make_captcha(text, 100 + seed)), text)
+        self.tesseract.image_to_string.assert_not_called()
+
+    def test_tesseract_fallback(self):
+        recognizer = DigitRecognizer()
+        self.assertEqual(recognizer.recognize(make_captcha("1234")), "9876")
+        # 无法切分出 4 个数字时同样使用 tesseract
+        recognizer = trained_recognizer()
+        self.assertEqual(recognizer.recognize(Image.new("L", (72, 24), 255)), "9876")
+        self.assertEqual(self.tesseract.image_to_string.call_count, 2)
+
+    def test_cached_by_image_content(self):
+        recognizer = trained_recognizer()
+        with mock.patch.object(recognizer, "match", wraps=recognizer.match) as match:
+            self.assertEqual(recognizer.recognize(make_captcha("5802", 7)), "5802")
+            self.assertEqual(recognizer.recognize(make_captcha("5802", 7)), "5802")
+            self.assertEqual(recognizer.recognize(make_captcha("5802", 8)), "5802")
+        self.assertEqual(match.call_count, 2)
+
+    def test_train_rejects_bad_labels(self):
+        recognizer = DigitRecognizer()
+        self.assertFalse(recognizer.train(make_captcha("123"), "123"))
+        self.assertFalse(recognizer.train(make_captcha("12a4"), "12a4"))
+        self.assertEqual(recognizer.template_count, 0)
+
+    def test_save_and_load(self):
+        fd, path = tempfile.mkstemp(suffix=".npz")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        trained_recognizer().save(path)
+        recognizer = DigitRecognizer(templates_path=path)
+        self.assertEqual(recognizer.recognize(make_captcha("7395", 3)), "7395")
+
+    def test_captcha_recognize_accepts_path(self):
+        fd, path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        make_captcha("1234").save(path)
+        with mock.patch(
+            "easytrader.utils.captcha._default_recognizer", trained_recognizer()
+        ):
+            self.assertEqual(captcha_recognize(path), "1234")
+
+    def test_confirmed_templates_survive_restart(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "templates", "captcha.npz")
+        self.addCleanup(shutil.rmtree, directory)
+        with mock.patch.object(captcha, "CAPTCHA_TEMPLATES_PATH", path), mock.patch.object(
+            captcha, "_default_recognizer", None
+        ):
+            self.assertEqual(captcha.default_recognizer().template_count, 0)
+            for seed, text in enumerate(["0123", "4567", "8901"]):
+                captcha.confirm_captcha(make_captcha(text, seed), text)
+            self.assertTrue(os.path.exists(path))
+
+            # 模拟重启后重新创建识别器
+            captcha._default_recognizer = None
+            recognizer = captcha.default_recognizer()
+            self.assertGreater(recognizer.template_count, 0)
+            with mock.patch.object(captcha, "tesseract_digits") as tesseract:
+                self.assertEqual(captcha_recognize(make_captcha("7395", 3)), "7395")
+            tesseract.assert_not_called()
+
+
+def legacy_gf(img):
+    """逐像素处理的原实现"""
+    img = img.copy()
+    width, height = img.size
+    for x in range(width):
+        for y in range(height):
+            if img.getpixel((x, y)) < (100, 100, 100):
+                img.putpixel((x, y), (256, 256, 256))
+    gray = img.convert("L")
+    two = gray.point(lambda p: 0 if 68 < p < 90 else 256)
+    min_res = two.filter(ImageFilter.MinFilter)
+    med_res = min_res.filter(ImageFilter.MedianFilter)
+    for _ in range(2):
+        med_res = med_res.filter(ImageFilter.MedianFilter)
+    return med_res
+
+
+def random_images(mode, count=5, size=(40, 15)):
+    rng = np.random.default_rng(0)
+    channels = len(mode)
+    for _ in range(count):
+        # 取值集中在阈值附近，覆盖相等的边界情况
+        array = rng.choice([0, 68, 69, 89, 90, 99, 100, 101, 199, 200, 255], size=(size[1], size[0], channels))
+        array = array.astype(np.uint8)
+        yield Image.fromarray(array[:, :, 0] if mode == "L" else array, mode)
+
+
+class TestCaptchaPipeline(unittest.TestCase):
+    def assertSameImage(self, image, expected):
+        self.assertEqual(image.size, expected.size)
+        np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+
+    def test_gf_same_as_pil(self):
+        for mode in ("RGB", "RGBA"):
+            for image in random_images(mode):
+                self.assertSameImage(captcha.preprocess(image, "gf"), legacy_gf(image))
+
+    def test_ths_same_as_point_table(self):
+        table = [0] * 200 + [1] * 56
+        for mode in ("L", "RGB", "RGBA"):
+            for image in random_images(mode):
+                expected = image.convert("L").point(table, "1")
+                result = Image.fromarray(captcha.PROFILES["ths"](image) > 0)
+                self.assertSameImage(result, expected)
+
+    def test_steps_same_as_pil(self):
+        for image in random_images("RGB", size=(31, 17)):
+            gray = image.convert("L")
+            self.assertSameImage(
+                Image.fromarray(captcha.grayscale(np.asarray(image))), gray
+            )
+            for step, pil_filter in [
+                (captcha.min_filter(3), ImageFilter.MinFilter(3)),
+                (captcha.median_filter(3), ImageFilter.MedianFilter(3)),
+                (captcha.median_filter(5), ImageFilter.MedianFilter(5)),
+            ]:
+                self.assertSameImage(
+                    Image.fromarray(step(np.asarray(gray))), gray.filter(pil_filter)
+                )
+
+    def test_yh_client_is_rgb(self):
+        image = Image.new("RGBA", (10, 5), (1, 2, 3, 4))
+        self.assertEqual(captcha.preprocess(image, "yh_client").mode, "RGB")
@@ -0,0 +1,129 @@
+# coding: utf-8
+import time
+import unittest
+from unittest import mock
+
+from easytrader.data_cache import AccountDataCache
+from easytrader.gui_executor import GuiExecutor
+
+
+class TestAccountDataCache(unittest.TestCase):
+    def test_get_within_ttl_reads_once(self):
+        cache = AccountDataCache(ttl=10)
+        loader = mock.MagicMock(return_value=[{"证券代码": "000001"}])
+        cache.register("position", loader)
+
+        self.assertEqual(cache.get("position"), [{"证券代码": "000001"}])
+        cache.get("position")
+        self.assertEqual(loader.call_count, 1)
+
+    def test_max_age_overrides_ttl(self):
+        cache = AccountDataCache(ttl=10)
+        loader = mock.MagicMock(return_value={})
+        cache.register("balance", loader)
+
+        cache.get("balance")
+        cache.get("balance", max_age=0)
+        self.assertEqual(loader.call_count, 2)
+
+    def test_per_name_ttl(self):
+        cache = AccountDataCache(ttl={"balance": 10})
+        loader = mock.MagicMock(return_value=[])
+        cache.register("position", loader)
+
+        cache.get("position")
+        cache.get("position")
+        self.assertEqual(loader.call_count, 2)
+
+    def test_mutation_invalidates(self):
+        cache = AccountDataCache(ttl=10)
+        loader = mock.MagicMock(return_value=[])
+        cache.register("today_trades", loader)
+
+        cache.get("today_trades")
+        with cache.mutation():
+            pass
+        cache.get("today_trades")
+        self.assertEqual(loader.call_count, 2)
+
+    def test_stale_value_served_while_revalidating(self):
+        cache = AccountDataCache(ttl=0.01, stale_ttl=10)
+        loader = mock.MagicMock(side_effect=["old", "new"])
+        cache.register("position", loader)
+
+        self.assertEqual(cache.get("position"), "old")
+        time.sleep(0.02)
+        self.assertEqual(cache.get("position"), "old")
+
+        for _ in range(100):
+            if loader.call_count == 2 and not cache._revalidating:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("position", max_age=10), "new")
+
+    def test_background_loads_run_on_submit(self):
+        executor = GuiExecutor()
+        self.addCleanup(executor.shutdown)
+        threads = []
+
+        def loader():
+            threads.append(executor.is_executor_thread())
+            return len(threads)
+
+        cache = AccountDataCache(ttl=0.01, stale_ttl=10, submit=executor.post)
+        cache.register("position", loader)
+        cache.get("position")
+        time.sleep(0.02)
+        cache.get("position")
+        cache.start_refresh_ahead(0.01)
+        self.addCleanup(cache.stop_refresh_ahead)
+
+        for _ in range(100):
+            if len(threads) >= 3:
+                break
+            time.sleep(0.01)
+        # 首次读取在调用线程中执行，过期刷新和提前刷新都在执行线程中执行
+        self.assertEqual(threads[0], False)
+        self.assertTrue(all(threads[1:3]), threads)
+
+    def test_stale_get_on_executor_thread_not_run_inline(self):
+        executor = GuiExecutor()
+        self.addCleanup(executor.shutdown)
+        loader = mock.MagicMock(side_effect=["old", "new"])
+        cache = AccountDataCache(ttl=0.01, stale_ttl=10, submit=executor.post)
+        cache.register("position", loader)
+        cache.get("position")
+        time.sleep(0.02)
+
+        def read():
+            value = cache.get("position")
+            return value, loader.call_count
+
+        # 执行线程内的读取立即返回旧数据，刷新放入队列在本次请求结束后执行
+        self.assertEqual(executor.submit(read).result(1), ("old", 1))
+        executor.submit(lambda: None).result(1)
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(cache.get("position", max_age=10), "new")
+
+    def test_refresh_ahead_submits_one_item_per_entry(self):
+        submitted = []
+        executor = GuiExecutor()
+        self.addCleanup(executor.shutdown)
+
+        def submit(fn, *args):
+            submitted.append(args)
+            return executor.post(fn, *args)
+
+        cache = AccountDataCache(ttl=0.01, submit=submit)
+        cache.register("position", mock.MagicMock(return_value=[]))
+        cache.register("balance", mock.MagicMock(return_value={}))
+        cache.get("position")
+        cache.get("balance")
+        cache.start_refresh_ahead(0.02)
+        self.addCleanup(cache.stop_refresh_ahead)
+
+        for _ in range(100):
+            if len(submitted) >= 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(set(submitted[:2]), {("position",), ("balance",)})
@@ -0,0 +1,374 @@
+# coding: utf-8
+import datetime
+import time
+import unittest
+from unittest import mock
+
+from easytrader import exceptions, fake_client
+from easytrader.utils.misc import str2time
+
+
+class TestFakeClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.client = fake_client.install(exe_path=r"C:\fake_test\xiadan.exe")
+        except RuntimeError as e:
+            raise unittest.SkipTest(str(e))
+        cls.client.set_position("162411", 1000, cost=0.5)
+
+        from easytrader.clienttrader import ClientTrader
+
+        cls.user = ClientTrader()
+        cls.user.connect(cls.client.exe_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        fake_client.uninstall(cls.client)
+
+    def test_balance(self):
+        self.assertEqual(self.user.balance["资金余额"], self.client.cash)
+
+    def test_buy_and_fill(self):
+        result = self.user.buy("162411", 0.55, 100)
+        entrust = self.client.entrust(result["entrust_no"])
+        self.assertEqual(entrust["操作"], "买入")
+        self.assertEqual(entrust["委托数量"], 100)
+
+        self.client.fill(result["entrust_no"])
+        trades = self.user.today_trades
+        self.assertIn(result["entrust_no"], [t["合同编号"] for t in trades])
+
+    def test_security_name_control_fallback(self):
+        self.assertIsNone(self.user.config.TRADE_SECURITY_NAME_CONTROL_ID)
+        self.assertIsNone(self.user._get_security_name())
+        with mock.patch.object(self.user, "wait") as wait:
+            result = self.user.buy("162411", 0.55, 100)
+        wait.assert_any_call(0.1)
+        self.assertEqual(self.client.entrust(result["entrust_no"])["委托数量"], 100)
+
+    def test_security_name_control_wait(self):
+        with mock.patch.object(
+            self.user.config,
+            "TRADE_SECURITY_NAME_CONTROL_ID",
+            fake_client.SECURITY_NAME_CONTROL_ID,
+        ):
+            self.user._switch_left_menus(["买入[F1]"])
+            self.user._type_edit_control_keys(self.user.config.TRADE_SECURITY_CONTROL_ID, "162411")
+            self.assertEqual(self.user._get_security_name(), "证券162411")
+
+            # 名称显示前等待
+            self.client.latency["security_name"] = 0.05
+            self.addCleanup(self.client.latency.pop, "security_name", None)
+            started_at = time.monotonic()
+            self.user.buy("000001", 10.0, 100)
+            self.assertGreaterEqual(time.monotonic() - started_at, 0.05)
+
+            # 连续委托同一证券，名称已显示时只读取一次
+            self.client.latency.pop("security_name")
+            with mock.patch.object(
+                self.user, "_get_security_name", wraps=self.user._get_security_name
+            ) as get_name:
+                self.user.buy("000001", 10.0, 100)
+                self.user.buy("000001", 10.0, 100)
+            self.assertEqual(get_name.call_count, 2)
+
+    def test_trade_trace_keeps_order_kwargs(self):
+        from easytrader import trade_trace
+
+        collector = trade_trace.TraceCollector()
+        self.user.enable_trade_trace(collector)
+        self.addCleanup(self.user.enable_trade_trace, None)
+        # 与 trade_trace.record 参数同名的关键字参数
+        self.user.buy("162411", 0.55, 100, action="open", sink="x", args=1)
+        order = collector.traces[-1].to_dict()["order"]
+        self.assertEqual(order["args"], ("162411", 0.55, 100))
+        self.assertEqual(order["kwargs"], {"action": "open", "sink": "x", "args": 1})
+
+    def test_rejected_order_raises_trade_error(self):
+        self.client.reject_next_order("可用资金不足")
+        with self.assertRaises(exceptions.TradeError):
+            self.user.buy("162411", 0.55, 100)
+
+    def test_unknown_warning_closed_and_raised(self):
+        self.client.warn_next_order("该证券为风险警示证券，是否继续委托？")
+        count = len(self.client.entrusts)
+        with self.assertRaises(exceptions.TradeError):
+            self.user.buy("162411", 0.55, 100)
+        self.assertEqual(len(self.client.entrusts), count)
+        self.assertIsNone(self.user.watch_pop_dialog(timeout=0))
+
+    def test_known_warning_confirmed(self):
+        self.client.warn_next_order("委托价格超出涨跌停限制，是否继续？")
+        result = self.user.buy("162411", 0.55, 100)
+        self.assertEqual(self.client.entrust(result["entrust_no"])["委托数量"], 100)
+
+    def test_submit_orders(self):
+        self.user._switch_left_menus(["查询[F4]", "资金股票"])
+        switches = self.client.counters.get("switch_menu", 0)
+        self.client.reject_next_order("可用资金不足")
+        results = self.user.submit_orders(
+            [
+                ("buy", "162411", 0.55, 100),
+                ("sell", "162411", 0.6, 100),
+                ("buy", "162411", 0.56, 200),
+                ("short", "162411", 0.6, 100),
+            ]
+        )
+
+        # 同一方向的委托只切换一次菜单
+        self.assertEqual(self.client.counters["switch_menu"] - switches, 2)
+        # 结果与委托顺序一致，单笔失败不影响其余委托
+        self.assertIn("TradeError", results[0]["error"])
+        sell = self.client.entrust(results[1]["entrust_no"])
+        self.assertEqual((sell["操作"], sell["委托数量"]), ("卖出", 100))
+        buy = self.client.entrust(results[2]["entrust_no"])
+        self.assertEqual((buy["操作"], buy["委托数量"]), ("买入", 200))
+        self.assertIn("不支持的交易方向", results[3]["error"])
+
+    def test_cancel_entrust(self):
+        entrust_no = self.user.sell("162411", 0.6, 100)["entrust_no"]
+        result = self.user.cancel_entrust(entrust_no)
+        self.assertIn("成功", result["message"])
+        self.assertEqual(self.client.entrust(entrust_no)["备注"], "已撤")
+
+    def test_cancel_entrust_error_raised(self):
+        first = self.client.place_order("买入", "000001", 10.0, 100)
+        second = self.client.place_order("买入", "000001", 10.1, 100)
+        error = RuntimeError("double click failed")
+        with mock.patch.object(
+            self.user, "_cancel_entrust_by_double_click", side_effect=error
+        ):
+            with self.assertRaises(RuntimeError):
+                self.user.cancel_entrust(first)
+            # 批量撤单记录错误后继续
+            results = self.user.cancel_entrusts_by_id([first, second])
+        self.assertIn("double click failed", results[first]["error"])
+        self.assertIn("double click failed", results[second]["error"])
+
+    def test_menu_skipped_when_already_active(self):
+        path = ["查询[F4]", "资金股票"]
+        self.user._switch_left_menus(path)
+        switches = self.client.counters.get("switch_menu", 0)
+        refreshes = self.client.counters.get("refresh", 0)
+
+        self.client.latency["refresh"] = 0.05
+        self.addCleanup(self.client.latency.pop, "refresh")
+        started_at = time.monotonic()
+        self.user._switch_left_menus(path)
+        self.assertEqual(self.client.counters.get("switch_menu", 0), switches)
+        self.assertEqual(self.client.counters["refresh"], refreshes + 1)
+        # F5 后等待 grid 刷新完成，等待上限为 sleep
+        self.assertFalse(self.client.is_refreshing())
+        self.assertLess(time.monotonic() - started_at, 0.2)
+
+    def test_wait_until(self):
+        self.assertEqual(self.user.wait_until(lambda: "ok", 1), "ok")
+
+        calls = []
+
+        def ready():
+            calls.append(None)
+            if len(calls) < 3:
+                raise RuntimeError("not ready")
+            return True
+
+        self.assertTrue(self.user.wait_until(ready, 1, poll=0.001))
+        self.assertEqual(len(calls), 3)
+
+        started_at = time.monotonic()
+        self.assertFalse(self.user.wait_until(lambda: False, 0.05))
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.05)
+
+        # deadline 早于 timeout 时以 deadline 为准
+        started_at = time.monotonic()
+        self.assertFalse(
+            self.user.wait_until(lambda: False, 5, deadline=time.monotonic() + 0.05)
+        )
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_watch_pop_dialog(self):
+        self.assertIsNone(self.user.watch_pop_dialog(timeout=0.01))
+
+        self.client.latency["dialog"] = 0.05
+        self.addCleanup(self.client.latency.pop, "dialog")
+        dialog = self.client.open_dialog("提示", "委托已提交")
+        self.addCleanup(self.client.close_window, dialog)
+        self.assertIsNone(self.user.watch_pop_dialog(timeout=0))
+
+        shown = self.user.watch_pop_dialog(timeout=1)
+        self.assertEqual(shown.title, "提示")
+        self.assertIs(shown.window, dialog)
+        self.assertGreater(shown.waited, 0)
+
+        # 已处理的弹窗不再返回
+        self.assertIsNone(
+            self.user.watch_pop_dialog(timeout=0.01, ignore={dialog.handle})
+        )
+
+    def test_control_cache(self):
+        control_id = self.user.config.TRADE_PRICE_CONTROL_ID
+        self.user._switch_left_menus(["买入[F1]"])
+        self.user._clear_control_cache()
+        with mock.patch.object(
+            self.user._main, "child_window", wraps=self.user._main.child_window
+        ) as child_window:
+
+            def lookups():
+                return [
+                    c for c in child_window.call_args_list
+                    if c.kwargs.get("control_id") == control_id
+                ]
+
+            edit = self.user._get_control(control_id, "Edit")
+            self.assertIs(self.user._get_control(control_id, "Edit"), edit)
+            self.assertEqual(len(lookups()), 1)
+
+            # 切换到没有该控件的页面后缓存的控件不可见，重新查找
+            self.user._switch_left_menus(["查询[F4]", "资金股票"])
+            with self.assertRaises(Exception):
+                self.user._get_control(control_id, "Edit")
+            self.assertEqual(len(lookups()), 2)
+            # 回到买入页面后原控件重新可见，继续使用缓存
+            self.user._switch_left_menus(["买入[F1]"])
+            self.assertIs(self.user._get_control(control_id, "Edit"), edit)
+            self.assertEqual(len(lookups()), 2)
+
+    def test_click_uses_top_window(self):
+        dialog = self.client.open_dialog("提示", "请确认", ("确定",))
+        button = [c for c in dialog.children if c.class_name == "Button"][0]
+        self.user._click(button.control_id)
+        self.assertIsNone(self.user.watch_pop_dialog(timeout=0))
+
+    def test_cancel_entrusts_by_id(self):
+        first = self.client.place_order("买入", "000001", 10.0, 100)
+        second = self.client.place_order("买入", "000001", 10.1, 100)
+        kept = self.client.place_order("买入", "000001", 10.2, 100)
+
+        results = self.user.cancel_entrusts_by_id([first, second, "999999"])
+        self.assertEqual(list(results), [first, second, "999999"])
+        self.assertIn("成功", results[first]["message"])
+        self.assertIn("成功", results[second]["message"])
+        self.assertIn("不能撤单", results["999999"]["message"])
+        self.assertEqual(self.client.entrust(first)["备注"], "已撤")
+        self.assertEqual(self.client.entrust(second)["备注"], "已撤")
+        self.assertEqual(self.client.entrust(kept)["备注"], "已报")
+
+    def test_cancel_entrusts_by_security_and_side(self):
+        buy = self.client.place_order("买入", "000002", 10.0, 100)
+        other = self.client.place_order("买入", "000003", 10.0, 100)
+        self.client.set_position("000002", 1000, cost=10.0)
+        sell = self.client.place_order("卖出", "000002", 11.0, 100)
+
+        results = self.user.cancel_entrusts_by(security="sz000002", side="buy")
+        self.assertEqual(list(results), [buy])
+        self.assertEqual(self.client.entrust(buy)["备注"], "已撤")
+        self.assertEqual(self.client.entrust(other)["备注"], "已报")
+        self.assertEqual(self.client.entrust(sell)["备注"], "已报")
+
+        with self.assertRaises(ValueError):
+            self.user.cancel_entrusts_by(side="short")
+
+    def test_cancel_entrusts_by_age(self):
+        compact = self.client.place_order("买入", "000004", 10.0, 100)
+        millis = self.client.place_order("买入", "000004", 10.0, 100)
+        recent = self.client.place_order("买入", "000004", 10.0, 100)
+        broken = self.client.place_order("买入", "000004", 10.0, 100)
+        self.client.entrust(compact)["委托时间"] = "000100"
+        self.client.entrust(millis)["委托时间"] = "000100120"
+        self.client.entrust(broken)["委托时间"] = "--"
+
+        results = self.user.cancel_entrusts_by(security="000004", older_than=60)
+        self.assertEqual(sorted(results), sorted([compact, millis]))
+        self.assertEqual(self.client.entrust(recent)["备注"], "已报")
+        # 委托时间无法解析的委托不撤销
+        self.assertEqual(self.client.entrust(broken)["备注"], "已报")
+
+    def test_snapshot(self):
+        self.user._switch_left_menus(["买入[F1]"])
+        switches = self.client.counters.get("switch_menu", 0)
+        snapshot = self.user.snapshot(("today_trades", "position", "balance"))
+
+        self.assertEqual(list(snapshot), ["today_trades", "position", "balance"])
+        # balance 与 position 位于同一页面，只切换一次菜单
+        self.assertEqual(self.client.counters["switch_menu"] - switches, 2)
+        self.assertEqual(snapshot["balance"]["data"]["资金余额"], self.client.cash)
+        self.assertIn("162411", [p["证券代码"] for p in snapshot["position"]["data"]])
+        for part in snapshot.values():
+            self.assertGreaterEqual(part["elapsed"], 0)
+            self.assertIsNotNone(part["timestamp"])
+
+        with self.assertRaises(ValueError):
+            self.user.snapshot(("balance", "orders"))
+
+    def test_position_from_grid(self):
+        position = [p for p in self.user.position if p["证券代码"] == "162411"][0]
+        self.assertEqual(position["证券名称"], "证券162411")
+
+    def test_position_result_format(self):
+        array = self.user.query("position", result_format="numpy")
+        self.assertIn("162411", array["证券代码"].tolist())
+        df = self.user.query("position", result_format="dataframe")
+        self.assertIn("162411", df["证券代码"].tolist())
+        with self.assertRaises(ValueError):
+            self.user.query("position", result_format="json")
+
+    def test_captcha_probe_only_when_copy_fails(self):
+        from easytrader import grid_strategies
+
+        strategy = self.user.grid_strategy_instance
+        strategy.captcha_state = grid_strategies.CAPTCHA_UNKNOWN
+        with mock.patch.object(strategy, "_handle_captcha", return_value=False) as probe:
+            self.assertTrue(self.user.position)
+            probe.assert_not_called()
+            self.assertEqual(strategy.captcha_state, grid_strategies.CAPTCHA_ABSENT)
+
+            # 复制失败时剪切板中残留的旧内容已被清空，只检查已存在的验证码窗口后重新复制
+            with mock.patch.object(self.client, "copy_grid") as copy_grid:
+                self.assertIsNone(self.user.position)
+            probe.assert_called_once_with(timeout=0)
+            self.assertEqual(copy_grid.call_count, 2)
+
+    def test_copy_retried_when_captcha_absent(self):
+        from easytrader import grid_strategies
+
+        strategy = self.user.grid_strategy_instance
+        strategy.captcha_state = grid_strategies.CAPTCHA_ABSENT
+        copy_grid = self.client.copy_grid
+        calls = []
+
+        def flaky_copy(*args, **kwargs):
+            calls.append(args)
+            if len(calls) > 1:
+                copy_grid(*args, **kwargs)
+
+        with mock.patch.object(self.client, "copy_grid", side_effect=flaky_copy):
+            position = self.user.position
+        self.assertIn("162411", [p["证券代码"] for p in position])
+        self.assertEqual(len(calls), 2)
+
+    def test_captcha_solved_then_read(self):
+        from easytrader import grid_strategies
+
+        strategy = self.user.grid_strategy_instance
+        strategy.captcha_state = grid_strategies.CAPTCHA_UNKNOWN
+
+        def solve(timeout):
+            self.client.clipboard = self.client.grid_text()
+            return True
+
+        with mock.patch.object(self.client, "copy_grid"):
+            with mock.patch.object(strategy, "_handle_captcha", side_effect=solve):
+                position = self.user.position
+        self.assertIn("162411", [p["证券代码"] for p in position])
+
+
+class TestStr2Time(unittest.TestCase):
+    def test_formats(self):
+        expected = datetime.time(9, 30, 15)
+        for text in ("09:30:15", "9:30:15", "93015", "093015", 93015):
+            self.assertEqual(str2time(text), expected)
+        self.assertEqual(str2time("093015120"), datetime.time(9, 30, 15, 120000))
+        self.assertEqual(str2time("09:30:15.120"), datetime.time(9, 30, 15, 120000))
+        for text in ("", "--", "25:00:00", "2024-01-01 09:30:15"):
+            self.assertIsNone(str2time(text))
@@ -0,0 +1,29 @@
+# coding: utf-8
+import unittest
+
+from easytrader.grid_diff import GridDiff
+
+
+class TestGridDiff(unittest.TestCase):
+    def test_update_returns_added_and_changed_rows(self):
+        diff = GridDiff("合同编号")
+        first = [
+            {"合同编号": "1", "备注": "未成交"},
+            {"合同编号": "2", "备注": "未成交"},
+        ]
+        added, changed = diff.update(first)
+        self.assertEqual(added, first)
+        self.assertEqual(changed, [])
+
+        second = [
+            {"合同编号": "1", "备注": "未成交"},
+            {"合同编号": "2", "备注": "已成"},
+            {"合同编号": "3", "备注": "未成交"},
+        ]
+        added, changed = diff.update(second)
+        self.assertEqual(added, [second[2]])
+        self.assertEqual(changed, [second[1]])
+
+        added, changed = diff.update(second)
+        self.assertEqual((added, changed), ([], []))
+        self.assertEqual(diff.get("2"), second[1])
@@ -0,0 +1,114 @@
+# coding: utf-8
+import io
+import sys
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from easytrader.config import client
+from easytrader.utils import grid_parser
+from easytrader.utils.grid_parser import parse_grid
+
+POSITION = (
+    "证券代码\t证券名称\t股票余额\t可用余额\t成本价\t市价\t盈亏比例(%)\t股东代码\t\n"
+    "000001\t平安银行\t1000\t800\t10.123\t11.2\t-1.05\tA123456789\t\n"
+    "600000\t浦发银行\t500\t500\t8.5\t8\t0\t0012345678\t\n"
+)
+
+
+def read_csv(text, dtype):
+    return pd.read_csv(
+        io.StringIO(text), delimiter="\t", dtype=dtype, na_filter=False
+    ).to_dict("records")
+
+
+class TestGridParser(unittest.TestCase):
+    def assertSameAsPandas(self, text, dtype=client.CommonConfig.GRID_DTYPE):
+        result = parse_grid(text, dtype)
+        expected = read_csv(text, dtype)
+        self.assertEqual(result, expected)
+        for row, expected_row in zip(result, expected):
+            self.assertEqual(list(row), list(expected_row))
+            for key, value in row.items():
+                expected_value = expected_row[key]
+                if hasattr(expected_value, "item"):
+                    expected_value = expected_value.item()
+                self.assertIs(type(value), type(expected_value), key)
+        return result
+
+    def test_same_as_pandas(self):
+        result = self.assertSameAsPandas(POSITION)
+        self.assertEqual(result[0]["证券代码"], "000001")
+        self.assertEqual(result[1]["股东代码"], "0012345678")
+        self.assertEqual(result[1]["市价"], 8.0)
+        self.assertEqual(result[0]["Unnamed: 8"], "")
+
+    def test_type_inference(self):
+        self.assertSameAsPandas("a\tb\tc\td\te\n 1\t1.5\tTrue\t\t1_0\n-2\t3\tfalse\tx\t2\n")
+        self.assertSameAsPandas("a\tb\r\n1\tinf\r\n\r\n  \r\n2\t-Infinity\r\n")
+        self.assertSameAsPandas("a\tb\n1\n2\t3")
+        self.assertSameAsPandas("a\tb\n")
+
+    def test_duplicate_columns(self):
+        result = self.assertSameAsPandas("a\ta\ta.1\t\t证券代码\t证券代码\n1\t2\t3\t4\t5\t6")
+        self.assertEqual(list(result[0]), ["a", "a.2", "a.1", "Unnamed: 3", "证券代码", "证券代码.1"])
+        self.assertEqual(result[0]["证券代码.1"], "6")
+
+    def test_fallback_to_pandas(self):
+        # 引号、数字过长、行比表头多一列（首列作为索引）
+        for text in ['a\tb\n"1\t2"\t3', "a\n12345678901234567890\n1", "a\n1.5e-30", "a\tb\n0\t1\t2"]:
+            self.assertSameAsPandas(text)
+        with self.assertRaises(pd.errors.EmptyDataError):
+            parse_grid("", {})
+
+    def test_header_compiled_once(self):
+        grid_parser._compile.cache_clear()
+        for _ in range(3):
+            parse_grid(POSITION, client.CommonConfig.GRID_DTYPE)
+        self.assertEqual(grid_parser._compile.cache_info().misses, 1)
+
+    def test_pandas_not_imported(self):
+        with mock.patch.dict(sys.modules, {"pandas": None}):
+            self.assertEqual(len(parse_grid(POSITION, client.CommonConfig.GRID_DTYPE)), 2)
+
+
+class TestResultFormat(unittest.TestCase):
+    def setUp(self):
+        self.records = parse_grid(POSITION, client.CommonConfig.GRID_DTYPE)
+
+    def test_records_unchanged(self):
+        self.assertIs(grid_parser.convert(self.records), self.records)
+
+    def test_dataframe(self):
+        df = grid_parser.convert(self.records, "dataframe")
+        self.assertEqual(list(df.columns), list(self.records[0]))
+        self.assertEqual(df["证券代码"].tolist(), ["000001", "600000"])
+
+    def test_numpy(self):
+        array = grid_parser.convert(
+            self.records, "numpy", client.CommonConfig.GRID_NUMPY_DTYPE
+        )
+        self.assertEqual(array.dtype.names, tuple(self.records[0]))
+        self.assertEqual(array["证券代码"].tolist(), ["000001", "600000"])
+        self.assertEqual(array.dtype["股票余额"].kind, "i")
+        self.assertEqual(array["成本价"].tolist(), [10.123, 8.5])
+        self.assertEqual(array.dtype["盈亏比例(%)"].kind, "f")
+
+    def test_numpy_keeps_values_outside_known_dtype(self):
+        records = [{"证券代码": "1234567890", "股票余额": 1.5}]
+        array = grid_parser.to_numpy(records, {"证券代码": "U6", "股票余额": "i8"})
+        self.assertEqual(array["证券代码"][0], "1234567890")
+        self.assertEqual(array["股票余额"][0], 1.5)
+        self.assertEqual(len(grid_parser.to_numpy([], {"证券代码": "U6"})), 0)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            grid_parser.convert(self.records, "json")
+
+    def test_none_in_every_format(self):
+        for result_format in grid_parser.RESULT_FORMATS:
+            self.assertIsNone(grid_parser.convert(None, result_format))
+        self.assertIsNone(grid_parser.to_numpy(None))
+        with self.assertRaises(ValueError):
+            grid_parser.convert(None, "json")
@@ -0,0 +1,89 @@
+# coding: utf-8
+import threading
+import time
+import unittest
+from unittest import mock
+
+from easytrader import exceptions, gui_executor
+
+
+class TestGuiExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = gui_executor.GuiExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def _block(self):
+        started, release = threading.Event(), threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(1)
+
+        self.executor.submit(blocker)
+        started.wait(1)
+        return release
+
+    def test_runs_by_priority(self):
+        release = self._block()
+        calls = []
+        futures = [
+            self.executor.submit(calls.append, "query", priority=gui_executor.PRIORITY_QUERY),
+            self.executor.submit(calls.append, "order", priority=gui_executor.PRIORITY_ORDER),
+            self.executor.submit(calls.append, "cancel", priority=gui_executor.PRIORITY_CANCEL),
+        ]
+        release.set()
+        for future in futures:
+            future.result(1)
+        self.assertEqual(calls, ["cancel", "order", "query"])
+
+    def test_expired_request_is_dropped(self):
+        release = self._block()
+        calls = []
+        future = self.executor.submit(calls.append, "query", timeout=0.01)
+        time.sleep(0.02)
+        release.set()
+        with self.assertRaises(exceptions.RequestExpiredError):
+            future.result(1)
+        self.assertEqual(calls, [])
+
+    def test_nested_submit_runs_inline(self):
+        future = self.executor.submit(
+            lambda: self.executor.submit(lambda: "inner").result(1)
+        )
+        self.assertEqual(future.result(1), "inner")
+
+    def test_nested_post_is_queued(self):
+        calls = []
+
+        def outer():
+            self.executor.post(calls.append, "inner")
+            calls.append("outer")
+
+        self.executor.submit(outer).result(1)
+        self.executor.submit(lambda: None).result(1)
+        self.assertEqual(calls, ["outer", "inner"])
+
+    def test_call_focused_runs_on_executor(self):
+        executor = self.executor
+        calls = []
+
+        class User:
+            OPERATION_PRIORITIES = {}
+
+            def __init__(self):
+                self.executor = executor
+                self._main = mock.Mock()
+                self._main.set_focus.side_effect = lambda: calls.append(
+                    ("focus", executor.is_executor_thread())
+                )
+
+            def submit(self, name, *args, **kwargs):
+                raise AssertionError("set_focus 与操作应在同一个请求中执行")
+
+            @property
+            def balance(self):
+                calls.append(("balance", executor.is_executor_thread()))
+                return {}
+
+        self.assertEqual(gui_executor.call_focused(User(), "balance"), {})
+        self.assertEqual(calls, [("focus", True), ("balance", True)])
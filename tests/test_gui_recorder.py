@@ -0,0 +1,47 @@
+# coding: utf-8
+import os
+import tempfile
+import unittest
+
+from easytrader import exceptions, fake_client
+from easytrader.gui_recorder import GuiRecorder, GuiReplayer, ReplayError
+
+
+class TestGuiRecorder(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.client = fake_client.install(exe_path=r"C:\fake_record\xiadan.exe")
+        except RuntimeError as e:
+            raise unittest.SkipTest(str(e))
+        self.client.set_position("162411", 1000, cost=0.5)
+        self.path = os.path.join(tempfile.mkdtemp(), "session.jsonl.gz")
+
+    def tearDown(self):
+        fake_client.uninstall(self.client)
+
+    def _session(self, user):
+        results = [user.position, user.buy("162411", 0.55, 100), user.today_entrusts]
+        with self.assertRaises(exceptions.TradeError):
+            user.buy("162411", 0.55, 150)
+        return results
+
+    def test_replay_returns_recorded_results(self):
+        from easytrader.clienttrader import ClientTrader
+
+        user = ClientTrader()
+        user.connect(self.client.exe_path)
+        recorder = GuiRecorder().attach(user)
+        recorded = self._session(user)
+        recorder.detach()
+        recorder.save(self.path)
+
+        # 回放不再访问模拟客户端
+        fake_client.uninstall(self.client)
+        replayed_user = ClientTrader()
+        player = GuiReplayer(self.path).attach(replayed_user)
+        try:
+            self.assertEqual(self._session(replayed_user), recorded)
+            with self.assertRaises(ReplayError):
+                replayed_user.auto_ipo()
+        finally:
+            player.detach()
@@ -0,0 +1,65 @@
+# coding: utf-8
+import logging
+import unittest
+
+from easytrader.log import logger
+from easytrader.utils.metrics import Histogram, MetricsRegistry, registry
+from easytrader.utils.perf import perf_clock, perf_logger
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.record(0.001)
+        for _ in range(10):
+            histogram.record(0.3)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertLessEqual(histogram.percentile(50), 0.001)
+        self.assertGreater(histogram.percentile(95), 0.2)
+        self.assertLessEqual(histogram.percentile(99), 0.3)
+        self.assertEqual(histogram.max, 0.3)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_dump_and_reset(self):
+        metrics = MetricsRegistry()
+        metrics.record("buy", 0.1, 0.01)
+        metrics.record("buy", 0.2, 0.01, error=True)
+
+        summary = metrics.dump()["buy"]
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["errors"], 1)
+        self.assertIn("buy", metrics.report())
+
+        metrics.reset()
+        self.assertEqual(metrics.dump(), {})
+
+    def test_perf_clock_records_errors(self):
+        @perf_clock
+        def fail():
+            raise ValueError()
+
+        name = fail.__qualname__
+        registry.reset(name)
+        with self.assertRaises(ValueError):
+            fail()
+        self.assertEqual(registry.dump([name])[name]["errors"], 1)
+
+    def test_perf_log_off_by_default(self):
+        @perf_clock
+        def work():
+            return 1
+
+        level = logger.level
+        self.addCleanup(logger.setLevel, level)
+        logger.setLevel(logging.DEBUG)
+        with self.assertNoLogs(logger, logging.DEBUG):
+            work()
+
+        self.addCleanup(perf_logger.setLevel, perf_logger.level)
+        perf_logger.setLevel(logging.DEBUG)
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            work()
+        self.assertIn("consume", logs.output[0])
@@ -0,0 +1,35 @@
+# coding: utf-8
+import unittest
+from unittest import mock
+
+from easytrader.config.client import CommonConfig
+from easytrader.order_tracker import OrderTracker
+
+
+class TestOrderTracker(unittest.TestCase):
+    def setUp(self):
+        self.trader = mock.MagicMock()
+        self.trader.config = CommonConfig
+        self.trader.last_entrust.return_value = None
+        self.tracker = OrderTracker(self.trader)
+        self.on_change = self.trader.add_change_listener.call_args[0][0]
+
+    def test_wait_for_fill_returns_final_entrust(self):
+        callback = mock.MagicMock()
+        self.tracker.on_status_change(callback)
+        self.tracker.track_result({"entrust_no": "123"})
+
+        self.on_change("today_entrusts", [{"合同编号": "123", "备注": "未成交"}])
+        self.assertIsNone(self.tracker.wait_for_fill("123", timeout=0))
+
+        filled = {"合同编号": "123", "备注": "已成"}
+        self.on_change("today_entrusts", [filled, {"合同编号": "456", "备注": "已成"}])
+        self.assertEqual(self.tracker.wait_for_fill("123", timeout=0), filled)
+        self.assertTrue(self.tracker.is_filled(filled))
+        self.assertEqual(callback.call_count, 2)
+
+    def test_track_uses_previously_read_entrust(self):
+        cancelled = {"合同编号": "789", "备注": "已撤"}
+        self.trader.last_entrust.return_value = cancelled
+        self.assertEqual(self.tracker.wait_for_fill("789", timeout=0), cancelled)
+        self.assertFalse(self.tracker.is_filled(cancelled))
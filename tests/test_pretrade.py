@@ -0,0 +1,202 @@
+# coding: utf-8
+import datetime
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from easytrader import exceptions, fake_client, pretrade
+from easytrader.follower import BaseFollower
+
+
+def make_checker(cash=10000.0, position=None, **kwargs):
+    checker = pretrade.PreTradeChecker(**kwargs)
+    checker.load_snapshot(
+        {"可用金额": cash},
+        [
+            {"证券代码": code, "可用余额": amount}
+            for code, amount in (position or {"600000": 1050}).items()
+        ],
+    )
+    return checker
+
+
+class TestPreTradeChecker(unittest.TestCase):
+    def test_rejects_bad_orders(self):
+        checker = make_checker(reference_prices={"600000": 10.0})
+        cases = [
+            (("buy", "600000", 10, 150), pretrade.BAD_LOT),
+            (("buy", "600000", 11.01, 100), pretrade.OUT_OF_BAND),
+            (("buy", "600000", 0, 100), pretrade.INVALID_ORDER),
+            (("buy", "600000", 10, 1100), pretrade.NO_CASH),
+            (("sell", "600000", 10, 1100), pretrade.NO_SHARES),
+            (("sell", "600000", 10, 150), pretrade.BAD_LOT),
+            (("sell", "000001", 10, 100), pretrade.NO_SHARES),
+        ]
+        for order, reason in cases:
+            with self.assertRaises(exceptions.PreTradeRejected) as cm:
+                checker.check(*order)
+            self.assertEqual(cm.exception.decision.reason, reason, order)
+
+    def test_accepts_valid_orders(self):
+        checker = make_checker(reference_prices={"600000": 10.0})
+        self.assertEqual(checker.check("buy", "600000", 11.0, 900).amount, 900)
+        # 卖出全部可用余额时允许零股
+        self.assertEqual(checker.check("sell", "sh600000", 10, 1050).amount, 1050)
+        # 科创板以 1 股递增
+        self.assertEqual(checker.check("buy", "688001", 10, 201).amount, 201)
+
+    def test_clip(self):
+        checker = make_checker(clip=True)
+        self.assertEqual(checker.check("buy", "600000", 30, 1000).amount, 300)
+        self.assertEqual(checker.check("buy", "600000", 10, 150).amount, 100)
+        self.assertEqual(checker.check("sell", "600000", 10, 2000).amount, 1050)
+        self.assertEqual(checker.check("sell", "600000", 10, 250).amount, 200)
+
+    def test_reserve_and_release(self):
+        checker = make_checker()
+        decision = checker.check("buy", "600000", 10, 600, reserve=True)
+        self.assertEqual(checker.available_cash, 4000)
+        with self.assertRaises(exceptions.PreTradeRejected):
+            checker.check("buy", "600000", 10, 600)
+        checker.release(decision)
+        self.assertEqual(checker.available_cash, 10000)
+
+        checker.check("sell", "600000", 10, 1000, reserve=True)
+        self.assertEqual(checker.available_shares("600000"), 50)
+        # 重新读取账户数据后清空预留
+        checker.load_snapshot({"可用金额": 4000.0}, [{"证券代码": "600000", "可用余额": 50}])
+        self.assertEqual(checker.available_cash, 4000)
+        self.assertEqual(checker.available_shares("600000"), 50)
+
+    def test_refresh_uses_loader_after_ttl(self):
+        loader = mock.Mock(return_value=({"可用金额": 500.0}, []))
+        checker = pretrade.PreTradeChecker(loader=loader, snapshot_ttl=60)
+        checker.check("buy", "600000", 1, 500)
+        checker.check("buy", "600000", 1, 100, refresh=False)
+        self.assertEqual(loader.call_count, 1)
+        checker.invalidate()
+        checker.check("buy", "600000", 1, 100)
+        self.assertEqual(loader.call_count, 2)
+
+    def test_basket_matches_single_checks(self):
+        orders = [
+            ("buy", "600000", 10, 150),
+            ("buy", "600000", 11.5, 100),
+            ("sell", "600000", 10, 1050),
+            ("sell", "688001", 10, 100),
+            ("buy", "300750", 10, 200),
+            ("sell", "000001", 10, 100),
+            ("hold", "600000", 10, 100),
+        ]
+        for clip in (False, True):
+            checker = make_checker(
+                clip=clip, reference_prices={"600000": 10.0}, position={"600000": 1050}
+            )
+            decisions = checker.check_basket(orders)
+            for order, decision in zip(orders, decisions):
+                try:
+                    expected = checker.check(*order)
+                except exceptions.PreTradeRejected as e:
+                    expected = e.decision
+                self.assertEqual(decision, expected, (clip, order))
+
+    def test_basket_consumes_cash_and_shares_in_order(self):
+        orders = [
+            ("buy", "600000", 10, 500),
+            ("buy", "000001", 10, 400),
+            ("buy", "000002", 10, 300),
+            ("sell", "600000", 10, 600),
+            ("sell", "600000", 10, 600),
+            ("sell", "600000", 10, 100),
+        ]
+        decisions = make_checker().check_basket(orders)
+        self.assertEqual(
+            [d.reason for d in decisions],
+            [None, None, pretrade.NO_CASH, None, pretrade.NO_SHARES, pretrade.NO_SHARES],
+        )
+
+        checker = make_checker(clip=True)
+        decisions = checker.check_basket(orders, reserve=True)
+        self.assertEqual([d.amount for d in decisions[:2]], [500, 400])
+        self.assertEqual(decisions[2].amount, 100)
+        self.assertEqual(decisions[4].amount, 450)
+        self.assertEqual(decisions[5].reason, pretrade.NO_SHARES)
+        self.assertEqual(checker.available_cash, 0)
+        self.assertEqual(checker.available_shares("600000"), 0)
+
+
+class TestClientTraderPreTrade(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.client = fake_client.install(
+                exe_path=r"C:\fake_pretrade\xiadan.exe", cash=10000.0
+            )
+        except RuntimeError as e:
+            raise unittest.SkipTest(str(e))
+        cls.client.set_position("600000", 1000, cost=10)
+
+        from easytrader.clienttrader import ClientTrader
+
+        cls.user = ClientTrader()
+        cls.user.connect(cls.client.exe_path)
+        cls.user.enable_pretrade(snapshot_ttl=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        fake_client.uninstall(cls.client)
+
+    def test_rejected_before_gui(self):
+        with mock.patch.object(self.user, "trade") as trade:
+            with self.assertRaises(exceptions.PreTradeRejected):
+                self.user.buy("600000", 10, 5000)
+            with self.assertRaises(exceptions.TradeError):
+                self.user.sell("600000", 10, 2000)
+        trade.assert_not_called()
+
+    def test_submit_orders(self):
+        results = self.user.submit_orders(
+            [("buy", "600000", 10, 100), ("buy", "600000", 10, 50000)]
+        )
+        self.assertIn("entrust_no", results[0])
+        self.assertIn("PreTradeRejected", results[1]["error"])
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_clienttrader_does_not_import_numpy(self):
+        code = (
+            "import sys\n"
+            "from easytrader import fake_client\n"
+            "try:\n"
+            "    fake_client.install()\n"
+            "except RuntimeError:\n"
+            "    pass\n"
+            "import easytrader.clienttrader\n"
+            "print('numpy' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+class TestFollowerPreTrade(unittest.TestCase):
+    def test_rejected_command_skips_user(self):
+        user = mock.Mock(spec=["buy", "pretrade"])
+        user.pretrade = make_checker(cash=1000.0)
+        follower = BaseFollower()
+        cmd = {
+            "strategy_name": "test",
+            "stock_code": "600000",
+            "action": "buy",
+            "amount": 1000,
+            "price": 10.0,
+            "datetime": datetime.datetime.now(),
+        }
+        follower._execute_trade_cmd(cmd, [user], 120, "limit", 0)
+        user.buy.assert_not_called()
+
+        user.pretrade.clip = True
+        follower._execute_trade_cmd(cmd, [user], 120, "limit", 0)
+        self.assertEqual(user.buy.call_args[1]["amount"], 100)
@@ -0,0 +1,47 @@
+# coding: utf-8
+import unittest
+from unittest import mock
+
+from easytrader import server
+
+
+class SubmitTrader:
+    def __init__(self):
+        self.prepare = mock.Mock()
+
+    def submit(self, name, /, *args, **kwargs):
+        future = mock.Mock()
+        future.result.return_value = getattr(self, name)(*args, **kwargs)
+        return future
+
+
+class TestPrepare(unittest.TestCase):
+    def setUp(self):
+        self.client = server.app.test_client()
+        self.addCleanup(server.global_store.clear)
+
+    def _post_prepare(self, user):
+        with mock.patch.object(server.api, "use", return_value=user) as use:
+            response = self.client.post(
+                "/prepare",
+                json={"broker": "ths", "user": "u", "password": "p"},
+            )
+        use.assert_called_once_with("ths", debug=False)
+        return response
+
+    def test_user_field_passed_to_prepare(self):
+        user = mock.Mock()
+        response = self._post_prepare(user)
+        self.assertEqual(response.status_code, 201)
+        user.prepare.assert_called_once_with(user="u", password="p")
+        self.assertIs(server.global_store["user"], user)
+
+    def test_user_field_passed_through_submit(self):
+        user = SubmitTrader()
+        response = self._post_prepare(user)
+        self.assertEqual(response.status_code, 201)
+        user.prepare.assert_called_once_with(user="u", password="p")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# coding: utf-8
+import unittest
+from unittest import mock
+
+from easytrader.supervisor import SupervisedSession
+from easytrader.trader_pool import TraderSession
+
+
+class TestSupervisedSession(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(TraderSession, "start"),
+            mock.patch.object(TraderSession, "stop"),
+            mock.patch.object(TraderSession, "send_request"),
+            mock.patch.object(TraderSession, "is_alive", return_value=True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = SupervisedSession("a", "ths", exe_path="xiadan.exe")
+        self.session.start()
+
+    def test_deadline_passed_to_worker(self):
+        with mock.patch.object(TraderSession, "receive", return_value=[]):
+            self.session.call("position")
+        TraderSession.send_request.assert_called_with("position", (), {}, 15.0)
+
+    def test_idempotent_operation_replayed_after_restart(self):
+        with mock.patch.object(
+            TraderSession, "receive", side_effect=[TimeoutError(), ["ok"]]
+        ):
+            self.assertEqual(self.session.call("position"), ["ok"])
+        self.assertEqual(self.session.restart_count, 1)
+        self.assertEqual(self.session.stuck_operations[0]["name"], "position")
+
+    def test_order_not_replayed(self):
+        with mock.patch.object(TraderSession, "receive", side_effect=TimeoutError()):
+            with self.assertRaises(TimeoutError):
+                self.session.call("buy", "162411", 0.5, 100)
+        self.assertEqual(self.session.restart_count, 1)
+        self.assertEqual(TraderSession.send_request.call_count, 1)
+
+    def test_max_restarts(self):
+        self.session.max_restarts = 0
+        with mock.patch.object(TraderSession, "receive", side_effect=TimeoutError()):
+            with self.assertRaises(RuntimeError):
+                self.session.call("balance")
+
+    def test_start_timeout_recorded(self):
+        TraderSession.start.side_effect = TimeoutError()
+        with self.assertRaises(TimeoutError):
+            self.session.restart()
+        TraderSession.start.assert_called_with(timeout=61.0)
+        self.assertEqual(self.session.stuck_operations[-1]["name"], "start")
@@ -0,0 +1,66 @@
+# coding: utf-8
+import unittest
+
+from easytrader import trade_trace
+
+
+class Trader:
+    @trade_trace.step
+    def _switch_left_menus(self):
+        pass
+
+    @trade_trace.step
+    def _handle_pop_dialogs(self):
+        trade_trace.add_dialog("委托确认")
+
+    def buy(self):
+        self._switch_left_menus()
+        self._handle_pop_dialogs()
+        return {"entrust_no": "1"}
+
+
+class TestTradeTrace(unittest.TestCase):
+    def test_record_spans_and_dialogs(self):
+        collector = trade_trace.TraceCollector()
+        with trade_trace.record("buy", collector, {"security": "162411"}):
+            Trader().buy()
+
+        self.assertIsNone(trade_trace.current())
+        trace = collector.traces[0].to_dict()
+        self.assertEqual(trace["order"], {"security": "162411"})
+        self.assertEqual(
+            [span["name"] for span in trace["spans"]],
+            ["Trader._switch_left_menus", "Trader._handle_pop_dialogs"],
+        )
+        self.assertEqual(trace["spans"][1]["dialogs"], ["委托确认"])
+        self.assertEqual(trace["dialogs"], ["委托确认"])
+
+    def test_nested_record_becomes_span(self):
+        collector = trade_trace.TraceCollector()
+        with trade_trace.record("buy", collector):
+            with trade_trace.record("trade", collector):
+                pass
+        self.assertEqual(len(collector.traces), 1)
+        self.assertEqual(collector.traces[0].spans[0].name, "trade")
+
+    def test_error_recorded(self):
+        collector = trade_trace.TraceCollector()
+        with self.assertRaises(ValueError):
+            with trade_trace.record("sell", collector):
+                raise ValueError("bad")
+        self.assertEqual(collector.traces[0].error, "ValueError: bad")
+
+    def test_step_without_trace(self):
+        Trader().buy()
+        self.assertIsNone(trade_trace.current())
+
+    def test_aggregate(self):
+        collector = trade_trace.TraceCollector()
+        for _ in range(3):
+            with trade_trace.record("buy", collector):
+                Trader().buy()
+
+        table = collector.aggregate()
+        self.assertEqual(table["total"]["count"], 3)
+        self.assertEqual(table["Trader._handle_pop_dialogs"]["dialogs"], {"委托确认": 3})
+        self.assertIn("Trader._switch_left_menus", trade_trace.format_table(table))
@@ -0,0 +1,138 @@
+# coding: utf-8
+import time
+import unittest
+from unittest import mock
+
+from easytrader.trader_pool import TraderPool, TraderSession
+
+
+def hanging_worker(conn, *args):
+    time.sleep(30)
+
+
+class FakeSession:
+    def __init__(self, account, results, delay=0.0):
+        self.account = account
+        self.results = results
+        self.delay = delay
+        self.pending = None
+        self.timeouts = []
+        self.stopped = False
+
+    def start(self):
+        if isinstance(self.results.get("start"), Exception):
+            raise self.results["start"]
+
+    def stop(self):
+        self.stopped = True
+
+    def is_alive(self):
+        return not self.stopped
+
+    def send(self, name, *args, **kwargs):
+        self.pending = name
+
+    def receive(self, name, timeout=None):
+        self.timeouts.append(timeout)
+        if timeout is not None and self.delay > timeout:
+            time.sleep(timeout)
+            self.stop()
+            raise TimeoutError(name)
+        time.sleep(self.delay)
+        result = self.results[self.pending]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def call(self, name, *args, timeout=None, **kwargs):
+        self.send(name, *args, **kwargs)
+        return self.receive(name, timeout)
+
+
+class TestTraderPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = TraderPool()
+        self.pool.add_session(
+            FakeSession(
+                "a",
+                {
+                    "balance": {"总资产": 100.0},
+                    "position": [
+                        {"证券代码": "162411", "股票余额": 100, "成本价": 0.5}
+                    ],
+                },
+            )
+        )
+        self.pool.add_session(
+            FakeSession(
+                "b",
+                {
+                    "balance": {"总资产": 50.0},
+                    "position": [
+                        {"证券代码": "162411", "股票余额": 200, "成本价": 0.6},
+                        {"证券代码": "000001", "股票余额": 300, "成本价": 10.0},
+                    ],
+                },
+            )
+        )
+        self.pool.add_session(FakeSession("c", {"balance": IOError("hang")}))
+
+    def test_map_returns_results_in_account_order(self):
+        results = self.pool.map("balance")
+        self.assertEqual(list(results), ["a", "b", "c"])
+        self.assertIsInstance(results["c"], IOError)
+
+    def test_total_assets_skips_failed_accounts(self):
+        self.assertEqual(self.pool.total_assets(), 150.0)
+
+    def test_aggregate_positions(self):
+        self.pool.session("c").results["position"] = []
+        positions = self.pool.aggregate_positions()
+        self.assertEqual(positions["162411"]["股票余额"], 300)
+        self.assertEqual(positions["162411"]["成本价"], 0.5)
+        self.assertEqual(positions["000001"]["股票余额"], 300)
+
+    def test_map_shares_one_deadline(self):
+        pool = TraderPool()
+        sessions = [FakeSession(account, {"balance": {}}, delay=0.1) for account in "abc"]
+        for session in sessions:
+            pool.add_session(session)
+        started_at = time.monotonic()
+        results = pool.map("balance", timeout=0.15)
+        self.assertLess(time.monotonic() - started_at, 0.3)
+        self.assertEqual(results["a"], {})
+        self.assertIsInstance(results["b"], TimeoutError)
+        self.assertIsInstance(results["c"], TimeoutError)
+        self.assertLess(sessions[2].timeouts[0], 0.15)
+
+    def test_timed_out_sessions_dropped(self):
+        pool = TraderPool()
+        pool.add_session(FakeSession("a", {"balance": {}}))
+        pool.add_session(FakeSession("b", {"balance": {}}, delay=0.1))
+        self.assertIsInstance(pool.map("balance", timeout=0.05)["b"], TimeoutError)
+        self.assertEqual(pool.accounts, ["a"])
+        self.assertEqual(pool.map("balance"), {"a": {}})
+
+        pool.add_session(FakeSession("c", {"submit_orders": []}, delay=0.1))
+        with self.assertRaises(TimeoutError):
+            pool.call("c", "submit_orders", timeout=0.05)
+        self.assertEqual(pool.accounts, ["a"])
+
+    def test_start_drops_failed_sessions(self):
+        session = self.pool.session("b")
+        session.results["start"] = RuntimeError("login failed")
+        failed = self.pool.start()
+        self.assertEqual(list(failed), ["b"])
+        self.assertEqual(self.pool.accounts, ["a", "c"])
+        self.assertTrue(session.stopped)
+
+
+class TestTraderSessionStart(unittest.TestCase):
+    def test_start_timeout_kills_child(self):
+        session = TraderSession("a", "ths", connect=True)
+        with mock.patch("easytrader.trader_pool.session_worker", hanging_worker):
+            started_at = time.time()
+            with self.assertRaises(TimeoutError):
+                session.start(timeout=0.2)
+        self.assertLess(time.time() - started_at, 5)
+        self.assertFalse(session.is_alive())